@@ -1,19 +1,33 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 from flask import Flask
 from flask_babel import Babel
 from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from requests import RequestException
 
+from app.dedup import DetectionDeduplicator
+from app.event_stream import EventBroadcaster, EVENT_DETECTION, EVENT_DECISION, EVENT_DEVICE
+from app.gate_client import GateClient, endpoint_for_role
+from app.outbox import Outbox
+from app.permit_cache import PermitCache, FilePermitSource, MODE_TRUST
 from config import Config
+from detector.AlprDetector import AlprConfiguration, FRAME_SKIP
+from detector.DetectorManager import AddressAndPort
+from detector.RecognitionPool import RecognitionPool
 from device.DeviceContainer import DeviceContainer
 from gpio.leds import LedController
+from ipc_communication.Codec import CODECS
+from ipc_communication.EventBus import EventProxy
 from ipc_communication.Server import AsyncServer
-from ipc_communication.default_configuration import SERVER_PREFIX, DEFAULT_DETECTOR_SERVER_PORT
+from ipc_communication.default_configuration import SERVER_PREFIX, DEFAULT_DETECTOR_SERVER_PORT, CLIENT_PREFIX, \
+    DEFAULT_EVENT_BUS_PUBLISHER_PORT, DEFAULT_EVENT_BUS_SUBSCRIBER_PORT
+from metrics.DetectorMetrics import MetricsCollector, is_metrics_report
+from metrics.Tracing import TraceRecorder, mark, TRACE_KEY, STAGE_RECEIVED, STAGE_DEDUPLICATED, STAGE_DECIDED, \
+    STAGE_SIGNALLED
 
 login_manager = LoginManager()
 login_manager.login_view = 'login'
@@ -24,64 +38,219 @@ migrate = Migrate()
 bootstrap = Bootstrap()
 babel = Babel()
 
-device_container = DeviceContainer()
+# worker processes are started by create_app - importing the package does not spawn them
+recognition_pool = None
+if Config.RECOGNITION_POOL_ENABLED:
+    recognition_pool = RecognitionPool(AlprConfiguration(Config.RECOGNITION_POOL_COUNTRY,
+                                                         Config.RECOGNITION_POOL_CONFIG_FILE,
+                                                         Config.RECOGNITION_POOL_RUNTIME_DATA, FRAME_SKIP),
+                                       workers=Config.RECOGNITION_POOL_WORKERS)
+
+event_bus_proxy = None
+event_bus = None
+if Config.EVENT_BUS_ENABLED:
+    event_bus_proxy = EventProxy(SERVER_PREFIX, DEFAULT_EVENT_BUS_PUBLISHER_PORT, DEFAULT_EVENT_BUS_SUBSCRIBER_PORT)
+    event_bus = AddressAndPort(CLIENT_PREFIX, DEFAULT_EVENT_BUS_PUBLISHER_PORT)
+
+# single in-process source of the live /events stream - fed by IPC handler and device container
+event_broadcaster = EventBroadcaster(queue_size=Config.EVENT_STREAM_QUEUE_SIZE,
+                                     max_clients=Config.EVENT_STREAM_MAX_CLIENTS)
+device_container = DeviceContainer(recognition_pool, codec=Config.IPC_CODEC, event_bus=event_bus,
+                                   state_listener=lambda change: event_broadcaster.publish(EVENT_DEVICE, change))
 
 led_controller = LedController()
 
 
-def prepare_request(message):
+gate_client = GateClient(Config.GATE_BACKEND_URL, Config.GATE_REQUESTER,
+                         connect_timeout=Config.GATE_CONNECT_TIMEOUT,
+                         read_timeout=Config.GATE_READ_TIMEOUT,
+                         retries=Config.GATE_RETRIES,
+                         pool_size=max(1, Config.IPC_SERVER_WORKERS))
+
+
+def prepare_request(message, plates=None):
     request_data = dict()
-    request_data['requester'] = 'Parking-Krk-1'
-    plates = [item[0] for item in message['candidates']]
+    request_data['requester'] = gate_client.requester()
+    if plates is None:
+        plates = [item[0] for item in message['candidates']]
     request_data['plates'] = plates
     return json.dumps(request_data)
 
 
-def message_handler(message):
+# drainer thread is started by create_app
+outbox = None
+if Config.OUTBOX_ENABLED:
+    outbox = Outbox(Config.OUTBOX_PATH, sender=gate_client.validate, max_rows=Config.OUTBOX_MAX_ROWS)
+
+
+# sync thread and executor confirming cached decisions are started by create_app
+permit_cache = None
+confirmation_executor = None
+if Config.PERMIT_CACHE_ENABLED:
+    permit_cache = PermitCache(ttl=Config.PERMIT_CACHE_TTL, max_entries=Config.PERMIT_CACHE_MAX_ENTRIES,
+                               mode=Config.PERMIT_CACHE_MODE, fuzzy_distance=Config.PERMIT_FUZZY_DISTANCE)
+
+
+def start_permit_cache():
+    global confirmation_executor
+    if Config.PERMIT_CACHE_FILE:
+        permit_cache.start_sync(FilePermitSource(Config.PERMIT_CACHE_FILE), Config.PERMIT_CACHE_SYNC_INTERVAL)
+    confirmation_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def outbox_lane(message):
+    """ Detections of one plate seen by one device are delivered in order, other lanes do not wait for them. """
+    return str(message.get('detector')) + '/' + message['candidates'][0][0]
+
+
+def deliver_request(role, lane, post_request_data, trace_id=None):
+    print('sending request to: ', gate_client.url(endpoint_for_role(role)))
+    if outbox is not None:
+        # detection is persisted first - when backend is unavailable the drainer delivers it later
+        entry_id = outbox.append(lane, role, post_request_data, reserve=True)
+        return outbox.send(lane, entry_id, timeout=Config.OUTBOX_SEND_TIMEOUT, trace_id=trace_id)
+    return gate_client.validate(role, post_request_data, trace_id=trace_id)
+
+
+def confirm_permit(role, lane, plate, cached, post_request_data, trace_id=None):
+    permit_cache.confirm(role, plate, cached, deliver_request(role, lane, post_request_data, trace_id))
+
+
+def signal_result(result, trace=None):
+    if result is True:
+        led_controller.success()
+    else:
+        led_controller.failure()
+    mark(trace, STAGE_SIGNALLED)
+
+
+def decide(message):
+    start = time.perf_counter()
     led_controller.progress()
-    post_request_data = prepare_request(message)
+    trace = message.get(TRACE_KEY)
+    trace_id = trace['id'] if trace is not None else None
+    role = message['detector_role']
+    detected_plates = [item[0] for item in message['candidates']]
+    plates = detected_plates
+    match = permit_cache.resolve(role, message['candidates']) if permit_cache is not None else None
+    if match is not None and match.plate not in plates:
+        # possible misread of a permitted plate - backend gets the registered spelling first and decides
+        print('candidate ', match.candidate, ' matched permitted plate ', match.plate)
+        plates = [match.plate] + plates
+    post_request_data = prepare_request(message, plates)
 
-    base_addr = 'https://test-lot.herokuapp.com'
-    endpoint = base_addr + '/gate/'  # 'http://localhost:8080/parking/gate/'
-    if message['detector_role'] == 'ENTRY':
-        endpoint += 'entrance'
+    # only exactly detected plates may be decided from cache - a near match can be a different car
+    cached = permit_cache.lookup(role, detected_plates) if permit_cache is not None else None
+    from_cache = cached is not None
+    if from_cache:
+        # gate reacts to cached decision right away
+        signal_result(cached, trace)
+    if from_cache and MODE_TRUST == permit_cache.mode:
+        # backend learns about the detection in the background
+        confirmation_executor.submit(confirm_permit, role, outbox_lane(message), plates[0], cached,
+                                     post_request_data, trace_id)
+        result = cached
     else:
-        endpoint += 'departure'
-    print("endpoint: ", endpoint)
+        result = deliver_request(role, outbox_lane(message), post_request_data, trace_id)
+        if permit_cache is not None:
+            permit_cache.confirm(role, plates[0], cached, result)
+        if result is None:
+            # backend unavailable - cached decision is the best one available
+            result = cached
+        else:
+            from_cache = False
+    mark(trace, STAGE_DECIDED)
+    print('validation = ', result)
 
-    try:
-        print('sending request to: ', endpoint)
-        headers = {'content-type': 'application/json'}
-        response = requests.post(endpoint, data=post_request_data, headers=headers)
-        result = response.json().get('validation')
-    except (RequestException, ConnectionError) as e:
-        print(e)
-        return False
-    print('response = ', response)
-    from time import sleep
-    sleep(0.1)
-
-    if response.status_code is 200 and result is not None and result is True:
-        led_controller.success()
+    if permit_cache is not None:
+        permit_cache.record_decision(time.perf_counter() - start, cached=from_cache)
+    if cached is None or result != cached:
+        signal_result(result, trace)
+    return result
+
+
+deduplicator = DetectionDeduplicator(Config.DEDUP_WINDOW, Config.DEDUP_MAX_ENTRIES) if Config.DEDUP_WINDOW else None
+
+metrics_collector = MetricsCollector()
+trace_recorder = TraceRecorder(Config.TRACE_BUFFER_SIZE)
+
+
+def record_trace(message, result, duplicate=False):
+    trace = message.get(TRACE_KEY)
+    if trace is not None:
+        trace_recorder.record(message.get('detector'), message['detector_role'], trace,
+                              plate=message['candidates'][0][0], result=result, duplicate=duplicate)
+
+
+def detection_event(message):
+    data = dict()
+    data['detector'] = message.get('detector')
+    data['role'] = message['detector_role']
+    data['candidates'] = message['candidates'][:3]
+    data['timestamp'] = message.get('timestamp')
+    data['trace_id'] = message[TRACE_KEY]['id'] if TRACE_KEY in message else None
+    return data
+
+
+def publish_decision(message, result, duplicate=False):
+    data = detection_event(message)
+    data['result'] = result
+    data['duplicate'] = duplicate
+    event_broadcaster.publish(EVENT_DECISION, data)
+    record_trace(message, result, duplicate)
+
+
+def message_handler(message):
+    if is_metrics_report(message):
+        # periodic report of detector process - exposed at /metrics
+        metrics_collector.update(message)
         return True
 
-    else:
-        led_controller.failure()
-        return False
+    trace = message.get(TRACE_KEY)
+    mark(trace, STAGE_RECEIVED)
+    event_broadcaster.publish(EVENT_DETECTION, detection_event(message))
+    if deduplicator is None:
+        result = decide(message)
+        publish_decision(message, result)
+        return result is True
 
-    # print('response: ', response.status_code)
+    group, duplicate = deduplicator.register(message['detector_role'], message['candidates'], message.get('detector'))
+    mark(trace, STAGE_DEDUPLICATED)
+    if duplicate:
+        result = deduplicator.wait(group)
+        mark(trace, STAGE_DECIDED)
+        print('duplicate detection of ', message['candidates'][0][0], ' suppressed - decision: ', result)
+        publish_decision(message, result, duplicate=True)
+        return result is True
+
+    result = None
+    try:
+        result = decide(message)
+    finally:
+        deduplicator.complete(group, result)
+    publish_decision(message, result)
+    return result is True
 
 
-ipc_server = AsyncServer(message_handler)
+ipc_server = AsyncServer(message_handler, workers=Config.IPC_SERVER_WORKERS, codec=CODECS[Config.IPC_CODEC])
 
 
 def create_app(config_class=Config):
     print('using create_app to create flask app object')
     import zmq.error
+    if permit_cache is not None:
+        # before IPC server runs - trust mode submits confirmations from the first detection
+        start_permit_cache()
     try:
         ipc_server.bind(SERVER_PREFIX, DEFAULT_DETECTOR_SERVER_PORT)
         # ipc_server.bind(SERVER_PREFIX_LOCAL, DEFAULT_DETECTOR_SERVER_PORT)
         ipc_server.run()
+        if recognition_pool is not None:
+            recognition_pool.start()
+        if outbox is not None:
+            outbox.start()
+        if event_bus_proxy is not None:
+            event_bus_proxy.start()
     except zmq.ZMQError as e:
         print('Exception during bind process: ', e, ' - ', e.errno)
         exit(-1)
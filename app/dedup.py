@@ -0,0 +1,108 @@
+import time
+from collections import OrderedDict
+from threading import Lock, Event
+
+from app.plate_index import canonical
+
+DEFAULT_WINDOW = 10.0
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_WAIT_TIMEOUT = 5.0
+
+
+class DetectionGroup:
+    """ Detections of one plate in one lane within the window - first one asks the backend for all of them. """
+
+    def __init__(self, key, candidates, detector, now):
+        self.key = key
+        self.candidates = {plate: confidence for plate, confidence in candidates}
+        self.detectors = {detector}
+        self.first_seen = now
+        self.last_seen = now
+        self.duplicates = 0
+        self.decision = None
+        self.decided = Event()
+
+    def merge(self, candidates, detector, now):
+        for plate, confidence in candidates:
+            if confidence > self.candidates.get(plate, float('-inf')):
+                self.candidates[plate] = confidence
+        self.detectors.add(detector)
+        self.last_seen = now
+        self.duplicates += 1
+
+    def merged_candidates(self):
+        return sorted(([plate, confidence] for plate, confidence in self.candidates.items()),
+                      key=lambda candidate: candidate[1], reverse=True)
+
+
+class DetectionDeduplicator:
+    """
+    Suppresses repeated detections of the same plate in the same lane - overlapping cameras or a car idling
+    in front of the camera. Groups are keyed by role and canonical form of the consolidated plate and expire
+    window seconds after the last sighting. Oldest groups are evicted above max_entries, so every event
+    costs constant time and memory stays bounded.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_entries=DEFAULT_MAX_ENTRIES, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        self.__window = window
+        self.__max_entries = max_entries
+        self.__wait_timeout = wait_timeout
+        self.__groups = OrderedDict()  # {(role, canonical plate): DetectionGroup}, least recently seen first
+        self.__lock = Lock()
+        self.__groups_created = 0
+        self.__suppressed = 0
+        self.__evicted = 0
+
+    def __expire(self, now):
+        while self.__groups:
+            key, group = next(iter(self.__groups.items()))
+            if now - group.last_seen <= self.__window:
+                break
+            del self.__groups[key]
+
+    def register(self, role, candidates, detector):
+        """ Returns (group, is_duplicate). Only the caller getting is_duplicate False asks the backend. """
+        key = (role, canonical(candidates[0][0]))
+        now = time.monotonic()
+        with self.__lock:
+            self.__expire(now)
+            group = self.__groups.get(key)
+            if group is not None:
+                group.merge(candidates, detector, now)
+                self.__groups.move_to_end(key)
+                self.__suppressed += 1
+                return group, True
+            group = DetectionGroup(key, candidates, detector, now)
+            self.__groups[key] = group
+            self.__groups_created += 1
+            if len(self.__groups) > self.__max_entries:
+                self.__groups.popitem(last=False)
+                self.__evicted += 1
+            return group, False
+
+    def complete(self, group, decision):
+        """ Stores decision of the group. Group without decision is forgotten, so next detection asks again. """
+        group.decision = decision
+        if decision is None:
+            with self.__lock:
+                if self.__groups.get(group.key) is group:
+                    del self.__groups[group.key]
+        group.decided.set()
+
+    def wait(self, group):
+        """ Decision of the group for a suppressed duplicate - waits while the first detection is in flight. """
+        group.decided.wait(self.__wait_timeout)
+        return group.decision
+
+    def statistics(self):
+        with self.__lock:
+            data = dict()
+            data['groups'] = len(self.__groups)
+            data['groups_created'] = self.__groups_created
+            data['suppressed'] = self.__suppressed
+            data['evicted'] = self.__evicted
+            data['recent'] = [{'role': group.key[0], 'candidates': group.merged_candidates()[:3],
+                               'detectors': sorted(str(detector) for detector in group.detectors),
+                               'duplicates': group.duplicates, 'decision': group.decision}
+                              for group in list(self.__groups.values())[-10:] if group.duplicates]
+            return data
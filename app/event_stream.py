@@ -0,0 +1,98 @@
+import itertools
+import json
+from collections import deque
+from threading import Lock, Condition
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_MAX_CLIENTS = 50
+DEFAULT_HISTORY = 100
+KEEPALIVE_INTERVAL = 15.0
+
+EVENT_DETECTION = 'detection'
+EVENT_DECISION = 'decision'
+EVENT_DEVICE = 'device'
+
+
+def format_event(event_id, event_type, data):
+    """ Server-sent event frame - data is JSON on a single line. """
+    return 'id: ' + str(event_id) + '\nevent: ' + event_type + '\ndata: ' + json.dumps(data) + '\n\n'
+
+
+class EventSubscription:
+    """ Bounded queue of one stream client. When the client falls behind the oldest events are dropped. """
+
+    def __init__(self, queue_size, frames=()):
+        self.__frames = deque(frames, maxlen=queue_size)
+        self.__condition = Condition()
+        self.dropped = 0
+
+    def put(self, frame):
+        with self.__condition:
+            if len(self.__frames) == self.__frames.maxlen:
+                self.dropped += 1
+            self.__frames.append(frame)
+            self.__condition.notify()
+
+    def take(self, timeout=None):
+        """ Returns all queued frames - empty list when nothing arrived within timeout. """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__frames, timeout)
+            frames = list(self.__frames)
+            self.__frames.clear()
+            return frames
+
+
+class EventBroadcaster:
+    """
+    Fans events out to server-sent event clients. Every event is encoded once and appended to the bounded
+    queue of each client, so publishing never waits for a client - a slow client only loses its oldest events.
+    Recent events are kept in history, so a reconnecting client can resume after Last-Event-ID.
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, max_clients=DEFAULT_MAX_CLIENTS, history=DEFAULT_HISTORY):
+        self.__queue_size = queue_size
+        self.__max_clients = max_clients
+        self.__subscriptions = set()
+        self.__history = deque(maxlen=history)  # (event id, frame)
+        self.__ids = itertools.count(1)
+        self.__lock = Lock()
+        self.__published = 0
+        self.__rejected = 0
+        self.__dropped = 0
+
+    def publish(self, event_type, data):
+        with self.__lock:
+            event_id = next(self.__ids)
+            frame = format_event(event_id, event_type, data)
+            self.__history.append((event_id, frame))
+            self.__published += 1
+            # queued under the lock - clients receive events in id order, put never blocks
+            for subscription in self.__subscriptions:
+                subscription.put(frame)
+
+    def subscribe(self, last_event_id=None):
+        """ Returns EventSubscription or None when max_clients are connected already. """
+        with self.__lock:
+            if len(self.__subscriptions) >= self.__max_clients:
+                self.__rejected += 1
+                return None
+            missed = [frame for event_id, frame in self.__history
+                      if last_event_id is not None and event_id > last_event_id]
+            subscription = EventSubscription(self.__queue_size, missed)
+            self.__subscriptions.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self.__lock:
+            if subscription in self.__subscriptions:
+                self.__subscriptions.discard(subscription)
+                self.__dropped += subscription.dropped
+
+    def statistics(self):
+        with self.__lock:
+            data = dict()
+            data['clients'] = len(self.__subscriptions)
+            data['published'] = self.__published
+            data['rejected_clients'] = self.__rejected
+            data['dropped'] = self.__dropped + sum(subscription.dropped for subscription in self.__subscriptions)
+            return data
@@ -0,0 +1,181 @@
+import random
+import time
+from threading import Lock
+
+import requests
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from metrics.Histogram import Histogram
+
+ENTRANCE = 'entrance'
+DEPARTURE = 'departure'
+
+# responses worth another attempt - backend restarting or overloaded
+RETRY_STATUS_CODES = (502, 503, 504)
+# lets backend logs be correlated with detection traces
+TRACE_HEADER = 'X-Trace-Id'
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+def endpoint_for_role(role):
+    return ENTRANCE if role == 'ENTRY' else DEPARTURE
+
+
+def decision_of(response):
+    """ Returns True or False only for explicit decision of the backend - 200 with boolean validation. """
+    if 200 != response.status_code:
+        return None
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    result = data.get('validation') if isinstance(data, dict) else None
+    return result if isinstance(result, bool) else None
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures - calls are rejected right away for reset_timeout seconds.
+    Then single trial call is let through: success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__failures = 0
+        self.__opened_at = None
+        self.__trial_in_progress = False
+        self.__lock = Lock()
+
+    def allow(self):
+        with self.__lock:
+            if self.__opened_at is None:
+                return True
+            if time.monotonic() - self.__opened_at < self.__reset_timeout or self.__trial_in_progress:
+                return False
+            self.__trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial_in_progress = False
+
+    def record_failure(self):
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial_in_progress or self.__failures >= self.__failure_threshold:
+                self.__opened_at = time.monotonic()
+            self.__trial_in_progress = False
+
+    def state(self):
+        with self.__lock:
+            if self.__opened_at is None:
+                return BREAKER_CLOSED
+            if time.monotonic() - self.__opened_at < self.__reset_timeout:
+                return BREAKER_OPEN
+            return BREAKER_HALF_OPEN
+
+
+class GateClient:
+    """
+    Client of the gate backend. Keeps pooled keep-alive session so detections do not pay for a new
+    TCP and TLS handshake, retries transient failures with jittered backoff and stops calling
+    the backend while the circuit breaker is open. Latency of every endpoint is kept in a histogram.
+    """
+
+    def __init__(self, base_url, requester, connect_timeout=1.0, read_timeout=3.0, retries=2, backoff=0.1,
+                 pool_size=4, failure_threshold=5, reset_timeout=30.0):
+        self.__base_url = base_url.rstrip('/')
+        self.__requester = requester
+        self.__timeout = (connect_timeout, read_timeout)
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.__session = requests.Session()
+        self.__session.headers.update({'content-type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, pool_block=False)
+        self.__session.mount('https://', adapter)
+        self.__session.mount('http://', adapter)
+        self.__lock = Lock()
+        self.__latencies = {ENTRANCE: Histogram(), DEPARTURE: Histogram()}
+        self.__outcomes = {'accepted': 0, 'rejected': 0, 'unexpected': 0, 'failed': 0, 'short_circuited': 0,
+                           'retried': 0}
+
+    def requester(self):
+        return self.__requester
+
+    def url(self, endpoint):
+        return self.__base_url + '/gate/' + endpoint
+
+    def __count(self, outcome):
+        with self.__lock:
+            self.__outcomes[outcome] += 1
+
+    def __post(self, endpoint, data, headers=None):
+        start = time.perf_counter()
+        try:
+            return self.__session.post(self.url(endpoint), data=data, headers=headers, timeout=self.__timeout)
+        finally:
+            with self.__lock:
+                self.__latencies[endpoint].observe(time.perf_counter() - start)
+
+    def validate(self, role, data, trace_id=None):
+        """
+        Posts request data to entrance or departure endpoint of the role.
+        Returns validation result of the backend or None when backend could not be asked
+        or responded with anything else than its accept or reject response.
+        """
+        endpoint = endpoint_for_role(role)
+        headers = {TRACE_HEADER: trace_id} if trace_id is not None else None
+        if not self.__breaker.allow():
+            self.__count('short_circuited')
+            print('gate backend circuit open - ', endpoint, ' not called')
+            return None
+
+        for attempt in range(self.__retries + 1):
+            if attempt:
+                self.__count('retried')
+                # full jitter keeps detectors from retrying in lockstep
+                time.sleep(random.uniform(0, self.__backoff * 2 ** attempt))
+            try:
+                response = self.__post(endpoint, data, headers)
+            except RequestException as e:
+                print('gate backend request failed: ', e)
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                print('gate backend responded with ', response.status_code)
+                continue
+
+            if response.status_code >= 500:
+                print('gate backend responded with ', response.status_code)
+                break
+
+            self.__breaker.record_success()
+            result = decision_of(response)
+            if result is None:
+                # backend is up but gave no decision - caller must not treat it as rejection
+                print('gate backend gave no decision - status ', response.status_code)
+                self.__count('unexpected')
+                return None
+            self.__count('accepted' if result else 'rejected')
+            return result
+
+        self.__breaker.record_failure()
+        self.__count('failed')
+        return None
+
+    def close(self):
+        self.__session.close()
+
+    def statistics(self):
+        with self.__lock:
+            data = dict(self.__outcomes)
+            data['circuit'] = self.__breaker.state()
+            data['latency'] = {endpoint: histogram.as_dict() for endpoint, histogram in self.__latencies.items()}
+            return data
@@ -0,0 +1,296 @@
+import sqlite3
+import time
+from threading import Thread, Lock, Event, Condition
+
+DEFAULT_MAX_ROWS = 100000
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_RETRY_INTERVAL = 5.0
+# seconds live sender waits for the lane delivered by someone else
+DEFAULT_SEND_TIMEOUT = 10.0
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lane TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    role TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_lane ON outbox (lane, id);
+'''
+
+
+class Outbox:
+    """
+    Durable queue of detections waiting for the gate backend, kept in SQLite in WAL mode.
+    Every detection is stored before it is sent. Entries of a lane (e.g. device and plate) are delivered
+    strictly in order - a lane is claimed by one sender at a time (live handler or background drainer).
+    sender(role, payload) returns None when backend could not be asked, anything else means delivered.
+    When max_rows is exceeded the oldest entries are dropped.
+    """
+
+    def __init__(self, path, sender, max_rows=DEFAULT_MAX_ROWS, batch_size=DEFAULT_BATCH_SIZE,
+                 retry_interval=DEFAULT_RETRY_INTERVAL):
+        self.__sender = sender
+        self.__max_rows = max_rows
+        self.__batch_size = batch_size
+        self.__retry_interval = retry_interval
+        self.__lock = Lock()
+        self.__lane_released = Condition(self.__lock)
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        # WAL with NORMAL sync survives process crashes, only power loss may drop last transactions
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(SCHEMA)
+        self.__migrate()
+        self.__rows = self.__connection.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+        self.__claimed_lanes = set()
+        self.__reserved = set()  # ids of entries whose live sender waits for the result
+        self.__results = dict()  # {reserved entry id: result} of entries delivered by someone else
+        self.__wakeup = Event()
+        # interrupts lane draining - drain_once() also works without the drainer thread
+        self.__stopping = Event()
+        self.__running = False
+        self.__thread = None
+        self.__appended = 0
+        self.__delivered = 0
+        self.__dropped = 0
+        self.__failed_attempts = 0
+        self.__busy_lanes = 0
+
+    def __migrate(self):
+        columns = [row[1] for row in self.__connection.execute('PRAGMA table_info(outbox)')]
+        if 'role' not in columns:
+            # lanes of the first schema were roles
+            self.__connection.execute('ALTER TABLE outbox ADD COLUMN role TEXT')
+            self.__connection.execute('UPDATE outbox SET role = lane WHERE role IS NULL')
+
+    def append(self, lane, role, payload, reserve=False):
+        """
+        Persists payload and returns id of the entry. Reserved entry is going to be delivered by send() -
+        when anyone else delivers it first, its result is kept for that send() call.
+        """
+        with self.__lock:
+            cursor = self.__connection.execute('INSERT INTO outbox (lane, role, created, payload) VALUES (?, ?, ?, ?)',
+                                               (lane, role, time.time(), payload))
+            self.__rows += 1
+            self.__appended += 1
+            if reserve:
+                self.__reserved.add(cursor.lastrowid)
+            if self.__rows > self.__max_rows:
+                self.__drop_oldest(self.__rows - self.__max_rows)
+            return cursor.lastrowid
+
+    def append_many(self, entries):
+        """ Persists list of (lane, role, payload) entries in a single transaction. """
+        now = time.time()
+        with self.__lock:
+            self.__connection.execute('BEGIN')
+            self.__connection.executemany('INSERT INTO outbox (lane, role, created, payload) VALUES (?, ?, ?, ?)',
+                                          ((lane, role, now, payload) for lane, role, payload in entries))
+            self.__connection.execute('COMMIT')
+            self.__rows += len(entries)
+            self.__appended += len(entries)
+            if self.__rows > self.__max_rows:
+                self.__drop_oldest(self.__rows - self.__max_rows)
+
+    def __drop_oldest(self, count):
+        cursor = self.__connection.execute('DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)',
+                                           (count,))
+        self.__rows -= cursor.rowcount
+        self.__dropped += cursor.rowcount
+        print('Outbox full - ', cursor.rowcount, ' oldest entries dropped')
+
+    def __complete(self, entries):
+        """ Removes delivered list of (entry id, result) pairs and keeps results waited for by live senders. """
+        with self.__lock:
+            cursor = self.__connection.executemany('DELETE FROM outbox WHERE id = ?',
+                                                   ((entry_id,) for entry_id, _ in entries))
+            # entry delivered while it was dropped from full outbox is already gone
+            self.__rows -= cursor.rowcount
+            self.__delivered += len(entries)
+            for entry_id, result in entries:
+                if entry_id in self.__reserved:
+                    self.__results[entry_id] = result
+
+    def __record_attempt(self, entry_id):
+        with self.__lock:
+            self.__connection.execute('UPDATE outbox SET attempts = attempts + 1 WHERE id = ?', (entry_id,))
+            self.__failed_attempts += 1
+
+    def __claim(self, lane, timeout=0):
+        with self.__lock:
+            if not self.__lane_released.wait_for(lambda: lane not in self.__claimed_lanes, timeout):
+                return False
+            self.__claimed_lanes.add(lane)
+            return True
+
+    def __release(self, lane):
+        with self.__lock:
+            self.__claimed_lanes.discard(lane)
+            self.__lane_released.notify_all()
+
+    def __batch(self, lane, limit):
+        with self.__lock:
+            return self.__connection.execute('SELECT id, role, payload FROM outbox WHERE lane = ? ORDER BY id LIMIT ?',
+                                             (lane, limit)).fetchall()
+
+    def send(self, lane, entry_id, timeout=DEFAULT_SEND_TIMEOUT, **sender_arguments):
+        """
+        Delivers entry reserved by append(). Waits up to timeout while another sender delivers the lane,
+        then delivers older entries of the lane first, so the order is kept. sender_arguments are passed
+        to the sender of this entry only (e.g. trace id). Returns result of the sender, None when the backend
+        failed or the lane stayed busy - the entry then stays queued for the drainer.
+        """
+        if not self.__claim(lane, timeout):
+            with self.__lock:
+                self.__reserved.discard(entry_id)
+                self.__busy_lanes += 1
+            print('Outbox lane ', lane, ' busy for ', timeout, ' s - entry ', entry_id, ' left for the drainer')
+            self.__wakeup.set()
+            return None
+        try:
+            while True:
+                with self.__lock:
+                    if entry_id in self.__results:
+                        # delivered by the drainer or another live sender while this one waited
+                        return self.__results.pop(entry_id)
+                batch = self.__batch(lane, 1)
+                if not batch or batch[0][0] > entry_id:
+                    # dropped because outbox was full
+                    return None
+                oldest_id, role, payload = batch[0]
+                result = self.__sender(role, payload, **(sender_arguments if oldest_id == entry_id else {}))
+                if result is None:
+                    self.__record_attempt(oldest_id)
+                    self.__wakeup.set()
+                    return None
+                self.__complete([(oldest_id, result)])
+                if oldest_id == entry_id:
+                    return self.__results.pop(entry_id, result)
+        finally:
+            with self.__lock:
+                self.__reserved.discard(entry_id)
+                self.__results.pop(entry_id, None)
+            self.__release(lane)
+
+    def __drain_lane(self, lane):
+        """ Delivers batches of the lane in order. Returns False when backend is unavailable. """
+        while not self.__stopping.is_set():
+            batch = self.__batch(lane, self.__batch_size)
+            if not batch:
+                return True
+            delivered = []
+            try:
+                for entry_id, role, payload in batch:
+                    result = self.__sender(role, payload)
+                    if result is None:
+                        self.__record_attempt(entry_id)
+                        return False
+                    delivered.append((entry_id, result))
+            finally:
+                if delivered:
+                    self.__complete(delivered)
+        return True
+
+    def drain_once(self):
+        """ Delivers everything that can be delivered now. Returns False when some lane had to be left. """
+        with self.__lock:
+            lanes = [row[0] for row in self.__connection.execute('SELECT DISTINCT lane FROM outbox')]
+        available = True
+        for lane in lanes:
+            if not self.__claim(lane):
+                continue
+            try:
+                available = self.__drain_lane(lane) and available
+            finally:
+                self.__release(lane)
+        return available
+
+    def __drain_loop(self):
+        while self.__running:
+            available = self.drain_once()
+            self.__wakeup.wait(None if available and not self.__rows else self.__retry_interval)
+            self.__wakeup.clear()
+
+    def start(self):
+        if self.__running:
+            return False
+        self.__running = True
+        self.__stopping.clear()
+        self.__thread = Thread(target=self.__drain_loop, daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        self.__running = False
+        self.__stopping.set()
+        self.__wakeup.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def close(self):
+        self.stop()
+        with self.__lock:
+            self.__connection.close()
+
+    def statistics(self):
+        with self.__lock:
+            data = dict()
+            data['pending'] = self.__rows
+            data['appended'] = self.__appended
+            data['delivered'] = self.__delivered
+            data['dropped'] = self.__dropped
+            data['failed_attempts'] = self.__failed_attempts
+            data['busy_lanes'] = self.__busy_lanes
+            oldest = self.__connection.execute('SELECT MIN(created) FROM outbox').fetchone()[0]
+            data['oldest_age'] = time.time() - oldest if oldest is not None else None
+            return data
+
+
+def main():
+    """ Measures append and drain throughput of the outbox. """
+    import argparse
+    import json
+    import os
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='Measures throughput of the detection outbox.')
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=4)
+    arguments = parser.parse_args()
+
+    payload = json.dumps({'requester': 'benchmark', 'plates': ['KR12345', 'KR1234S', 'KRI2345']})
+    report = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = Outbox(os.path.join(directory, 'outbox.db'), sender=lambda role, data: True,
+                        max_rows=arguments.count * 2)
+
+        def append(lane):
+            for _ in range(arguments.count // arguments.threads):
+                outbox.append(lane, 'ENTRY', payload)
+
+        threads = [Thread(target=append, args=('lane-' + str(index % 2),)) for index in range(arguments.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+        appended = outbox.statistics()['appended']
+        report['append_per_second'] = appended / duration
+
+        start = time.perf_counter()
+        outbox.start()
+        while outbox.statistics()['pending']:
+            time.sleep(0.01)
+        report['drain_per_second'] = appended / (time.perf_counter() - start)
+        outbox.close()
+        report['entries'] = appended
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
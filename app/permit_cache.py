@@ -0,0 +1,226 @@
+import json
+import os
+import time
+from collections import OrderedDict, namedtuple
+from threading import Lock, Thread, Event
+
+from app.plate_index import PlateIndex
+from metrics.Histogram import Histogram
+
+# cached decision is final, backend is told about the detection asynchronously
+MODE_TRUST = 'trust'
+# cached decision drives the LED right away, backend answer is still awaited and wins
+MODE_VERIFY = 'verify'
+
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_SYNC_INTERVAL = 30.0
+
+PermitEntry = namedtuple('PermitEntry', 'permitted, expires')
+
+
+class PermitCache:
+    """
+    Local authorization cache of plates keyed by lane role and plate. Entries expire after ttl seconds,
+    least recently used entries are evicted above max_entries. Filled from backend decisions
+    and incremental syncs. With fuzzy_distance permitted plates are also kept in PlateIndex per role,
+    so OCR misreads of a permitted plate can be resolved. Only exact plates are looked up for decisions -
+    a resolved plate only tells which spelling the backend should be asked about.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, mode=MODE_TRUST, fuzzy_distance=None):
+        if mode not in (MODE_TRUST, MODE_VERIFY):
+            raise ValueError('unknown permit cache mode ' + str(mode))
+        self.mode = mode
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__entries = OrderedDict()  # {(role, plate): PermitEntry}
+        self.__fuzzy_distance = fuzzy_distance
+        self.__indexes = dict()  # {role: PlateIndex of permitted plates}
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__expired = 0
+        self.__evicted = 0
+        self.__disagreements = 0
+        self.__fuzzy_hits = 0
+        self.__cached_latency = Histogram()
+        self.__backend_latency = Histogram()
+        self.__sync_thread = None
+        self.__sync_stop = Event()
+
+    def __get(self, key, now):
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < now:
+            self.__delete(key)
+            self.__expired += 1
+            return None
+        self.__entries.move_to_end(key)
+        return entry
+
+    def __delete(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry is not None and entry.permitted and key[0] in self.__indexes:
+            self.__indexes[key[0]].remove(key[1])
+
+    def __fuzzy_match(self, role, candidates, now):
+        index = self.__indexes.get(role)
+        if index is None:
+            return None
+        match = index.match(candidates)
+        # entry found by index may have expired in the meantime
+        if match is None or self.__get((role, match.plate), now) is None:
+            return None
+        return match
+
+    def resolve(self, role, candidates):
+        """
+        Returns PlateMatch of permitted plate matching [plate, confidence] candidates despite OCR errors.
+        Different car may have such plate - never decide from the match, ask the backend about it.
+        """
+        with self.__lock:
+            match = self.__fuzzy_match(role, candidates, time.monotonic())
+            if match is not None:
+                self.__fuzzy_hits += 1
+            return match
+
+    def lookup(self, role, plates):
+        """
+        Returns True when any plate is permitted, False when the first (consolidated) plate is denied
+        and no other plate is permitted, None on cache miss. Plates have to match exactly.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            decision = None
+            for index, plate in enumerate(plates):
+                entry = self.__get((role, plate), now)
+                if entry is None:
+                    continue
+                if entry.permitted:
+                    decision = True
+                    break
+                if 0 == index:
+                    decision = False
+            if decision is None:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+            return decision
+
+    def __put(self, role, plate, permitted, now):
+        key = (role, plate)
+        self.__delete(key)
+        self.__entries[key] = PermitEntry(permitted, now + self.__ttl)
+        if permitted and self.__fuzzy_distance is not None:
+            if role not in self.__indexes:
+                self.__indexes[role] = PlateIndex(self.__fuzzy_distance)
+            self.__indexes[role].add(plate)
+        while len(self.__entries) > self.__max_entries:
+            self.__delete(next(iter(self.__entries)))
+            self.__evicted += 1
+
+    def store(self, role, plate, permitted):
+        with self.__lock:
+            self.__put(role, plate, permitted, time.monotonic())
+
+    def remove(self, role, plate):
+        with self.__lock:
+            self.__delete((role, plate))
+
+    def confirm(self, role, plate, cached, permitted):
+        """ Applies backend decision for plate, counts cases where the cached decision was wrong. """
+        if permitted is None:
+            return
+        with self.__lock:
+            if cached is not None and cached != permitted:
+                self.__disagreements += 1
+                print('permit cache decision for ', plate, ' corrected by backend: ', permitted)
+            self.__put(role, plate, permitted, time.monotonic())
+
+    def record_decision(self, seconds, cached):
+        with self.__lock:
+            (self.__cached_latency if cached else self.__backend_latency).observe(seconds)
+
+    def apply_changes(self, changes):
+        """ Applies iterable of dicts with role, plate and permitted - permitted None removes the entry. """
+        now = time.monotonic()
+        count = 0
+        with self.__lock:
+            for change in changes:
+                key = (change['role'], change['plate'])
+                if change.get('permitted') is None:
+                    self.__delete(key)
+                else:
+                    self.__put(change['role'], change['plate'], bool(change['permitted']), now)
+                count += 1
+        return count
+
+    def __sync_loop(self, source, interval):
+        while not self.__sync_stop.is_set():
+            try:
+                changes = source.changes()
+                if changes:
+                    print('permit cache synced ', self.apply_changes(changes), ' entries')
+            except (OSError, ValueError, KeyError) as e:
+                print('permit cache sync failed: ', e)
+            self.__sync_stop.wait(interval)
+
+    def start_sync(self, source, interval=DEFAULT_SYNC_INTERVAL):
+        if self.__sync_thread is not None:
+            return False
+        self.__sync_stop.clear()
+        self.__sync_thread = Thread(target=self.__sync_loop, args=(source, interval), daemon=True)
+        self.__sync_thread.start()
+        return True
+
+    def stop_sync(self):
+        self.__sync_stop.set()
+        if self.__sync_thread is not None:
+            self.__sync_thread.join()
+            self.__sync_thread = None
+
+    def statistics(self):
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            data = dict()
+            data['mode'] = self.mode
+            data['entries'] = len(self.__entries)
+            data['hits'] = self.__hits
+            data['misses'] = self.__misses
+            data['hit_rate'] = self.__hits / lookups if lookups else None
+            data['expired'] = self.__expired
+            data['evicted'] = self.__evicted
+            data['disagreements'] = self.__disagreements
+            data['fuzzy_hits'] = self.__fuzzy_hits
+            data['cached_decision_latency'] = self.__cached_latency.as_dict()
+            data['backend_decision_latency'] = self.__backend_latency.as_dict()
+            return data
+
+
+class FilePermitSource:
+    """
+    Local stand-in for backend permit sync - JSON file with list of {role, plate, permitted, updated} entries.
+    Only entries updated after the previous sync are returned.
+    """
+
+    def __init__(self, path):
+        self.__path = path
+        self.__modified = None
+        self.__last_update = None
+
+    def changes(self):
+        if not os.path.exists(self.__path):
+            return []
+        modified = os.path.getmtime(self.__path)
+        if modified == self.__modified:
+            return []
+        self.__modified = modified
+        with open(self.__path) as permits_file:
+            entries = json.load(permits_file)
+        changes = [entry for entry in entries
+                   if self.__last_update is None or entry.get('updated', 0) > self.__last_update]
+        if entries:
+            self.__last_update = max(entry.get('updated', 0) for entry in entries)
+        return changes
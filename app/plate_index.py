@@ -0,0 +1,177 @@
+from collections import namedtuple
+from itertools import combinations
+
+# characters OCR mixes up are mapped to one representative before any comparison
+CONFUSION_CLASSES = ('0ODQ', '1IL', '2Z', '5S', '6G', '8B')
+CONFUSION_MAP = {character: group[0] for group in CONFUSION_CLASSES for character in group}
+IGNORED_CHARACTERS = ' -.'
+
+DEFAULT_MAX_DISTANCE = 1
+
+PlateMatch = namedtuple('PlateMatch', 'plate, candidate, distance, confidence')
+
+
+def canonical(plate):
+    return ''.join(CONFUSION_MAP.get(character, character) for character in plate.upper()
+                   if character not in IGNORED_CHARACTERS)
+
+
+def deletions(word, max_distance):
+    """ All strings made by deleting up to max_distance characters from word (word itself included). """
+    result = {word}
+    for count in range(1, min(max_distance, len(word)) + 1):
+        for positions in combinations(range(len(word)), count):
+            result.add(''.join(character for index, character in enumerate(word) if index not in positions))
+    return result
+
+
+def bounded_distance(first, second, limit):
+    """ Optimal string alignment distance of two strings or limit + 1 when it exceeds limit. """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        row_minimum = i
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_minimum = min(row_minimum, value)
+        if row_minimum > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class PlateIndex:
+    """
+    Deletion index (SymSpell) over canonical forms of plates. Confusable characters cost nothing,
+    other OCR errors are accepted up to max_distance edits. Lookup time does not depend on number of plates.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.__max_distance = max_distance
+        self.__plates = dict()  # {plate: canonical form}
+        self.__canonical = dict()  # {canonical form: set of plates}
+        self.__deletions = dict()  # {deletion: set of canonical forms}
+
+    def __len__(self):
+        return len(self.__plates)
+
+    def __contains__(self, plate):
+        return plate in self.__plates
+
+    def add(self, plate):
+        if plate in self.__plates:
+            return
+        form = canonical(plate)
+        self.__plates[plate] = form
+        plates = self.__canonical.setdefault(form, set())
+        plates.add(plate)
+        if len(plates) == 1:
+            for deletion in deletions(form, self.__max_distance):
+                self.__deletions.setdefault(deletion, set()).add(form)
+
+    def remove(self, plate):
+        form = self.__plates.pop(plate, None)
+        if form is None:
+            return
+        plates = self.__canonical[form]
+        plates.discard(plate)
+        if plates:
+            return
+        del self.__canonical[form]
+        for deletion in deletions(form, self.__max_distance):
+            forms = self.__deletions.get(deletion)
+            if forms is not None:
+                forms.discard(form)
+                if not forms:
+                    del self.__deletions[deletion]
+
+    def __lookup(self, form, limit):
+        """ Returns (distance, canonical form) of the closest indexed plate within limit or None. """
+        if form in self.__canonical:
+            return 0, form
+        best = None
+        for deletion in deletions(form, limit):
+            for indexed in self.__deletions.get(deletion, ()):
+                distance = bounded_distance(form, indexed, limit)
+                if distance <= limit and (best is None or distance < best[0]):
+                    best = (distance, indexed)
+                    limit = distance
+        return best
+
+    def match(self, candidates, max_distance=None):
+        """
+        Matches list of [plate, confidence] candidates in a single pass and returns PlateMatch of the closest
+        indexed plate (ties broken by candidate order) or None. max_distance cannot exceed the index distance.
+        """
+        limit = self.__max_distance if max_distance is None else min(max_distance, self.__max_distance)
+        best = None
+        for candidate, confidence in candidates:
+            found = self.__lookup(canonical(candidate), limit if best is None else best.distance - 1)
+            if found is None:
+                continue
+            distance, form = found
+            # plates sharing canonical form differ only by confusable characters - take the closest raw spelling
+            plate = min(self.__canonical[form], key=lambda indexed: (bounded_distance(candidate, indexed, 8), indexed))
+            best = PlateMatch(plate, candidate, distance, confidence)
+            if 0 == distance:
+                break
+        return best
+
+
+def main():
+    """ Measures lookup latency of the index with randomly generated plates. """
+    import argparse
+    import json
+    import random
+    import string
+    import time
+
+    parser = argparse.ArgumentParser(description='Measures fuzzy plate index lookups.')
+    parser.add_argument('--plates', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    arguments = parser.parse_args()
+
+    alphabet = string.ascii_uppercase + string.digits
+    plates = [''.join(random.choice(alphabet) for _ in range(random.choice((7, 8)))) for _ in range(arguments.plates)]
+    index = PlateIndex()
+    start = time.perf_counter()
+    for plate in plates:
+        index.add(plate)
+    build_time = time.perf_counter() - start
+
+    def misread(plate):
+        position = random.randrange(len(plate))
+        return plate[:position] + random.choice(alphabet) + plate[position + 1:]
+
+    # each lookup gets candidates list like the one produced by the detector
+    queries = []
+    for _ in range(arguments.lookups):
+        plate = random.choice(plates)
+        queries.append([[misread(plate), 90.0], [misread(plate), 85.0], [plate.replace('0', 'O'), 80.0]])
+
+    latencies = []
+    matched = 0
+    for candidates in queries:
+        start = time.perf_counter()
+        matched += index.match(candidates) is not None
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    report = dict()
+    report['plates'] = len(index)
+    report['build_seconds'] = build_time
+    report['matched'] = matched / len(queries)
+    report['lookup_p50_ms'] = latencies[len(latencies) // 2] * 1000
+    report['lookup_p99_ms'] = latencies[int(len(latencies) * 0.99)] * 1000
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
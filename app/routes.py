@@ -1,11 +1,14 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify
+from flask import render_template, flash, redirect, url_for, request, jsonify, Response
 from flask_login import login_user, logout_user, current_user, login_required
 from werkzeug.urls import url_parse
 
-from app import device_container, flask_app
+from app import device_container, flask_app, gate_client, outbox, permit_cache, deduplicator, metrics_collector, \
+    trace_recorder, event_broadcaster
+from app.event_stream import KEEPALIVE_INTERVAL
 from app.forms import LoginForm, DeviceForm, UpdateDeviceForm
 from app.models import User
 from device.Device import DeviceStatus, DeviceLocation, DeviceRole
+from metrics.Exposition import PrometheusWriter, CONTENT_TYPE
 
 
 @flask_app.route('/')
@@ -45,6 +48,75 @@ def status():
     return 'Current avaiable sources: \n' + str(device_container.get_list_of_devices())
 
 
+@flask_app.route('/gate', methods=['GET'])
+def gate_statistics():
+    data = gate_client.statistics()
+    data['outbox'] = outbox.statistics() if outbox is not None else None
+    data['permit_cache'] = permit_cache.statistics() if permit_cache is not None else None
+    data['deduplication'] = deduplicator.statistics() if deduplicator is not None else None
+    return jsonify(data)
+
+
+@flask_app.route('/metrics', methods=['GET'])
+def metrics():
+    writer = PrometheusWriter()
+    metrics_collector.write(writer)
+    gate = gate_client.statistics()
+    writer.counter('alpr_gate_requests_total', 'Gate backend requests by outcome',
+                   [({'outcome': outcome}, gate[outcome])
+                    for outcome in ('accepted', 'rejected', 'unexpected', 'failed', 'short_circuited',
+                                    'retried')])
+    writer.histogram('alpr_gate_request_seconds', 'Gate backend request latency',
+                     [({'endpoint': endpoint}, histogram) for endpoint, histogram in sorted(gate['latency'].items())])
+    if outbox is not None:
+        outbox_statistics = outbox.statistics()
+        writer.gauge('alpr_outbox_pending', 'Detections not yet delivered to gate backend',
+                     [({}, outbox_statistics['pending'])])
+        writer.counter('alpr_outbox_delivered_total', 'Detections delivered from outbox',
+                       [({}, outbox_statistics['delivered'])])
+    stream = event_broadcaster.statistics()
+    writer.gauge('alpr_event_stream_clients', 'Connected /events clients', [({}, stream['clients'])])
+    writer.counter('alpr_event_stream_dropped_total', 'Events dropped for clients falling behind',
+                   [({}, stream['dropped'])])
+    return Response(writer.text(), content_type=CONTENT_TYPE)
+
+
+@flask_app.route('/events', methods=['GET'])
+def events():
+    subscription = event_broadcaster.subscribe(request.headers.get('Last-Event-ID', type=int))
+    if subscription is None:
+        return 'too many event stream clients', 503
+
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                frames = subscription.take(KEEPALIVE_INTERVAL)
+                # comment line keeps proxies from closing idle connection
+                yield ''.join(frames) if frames else ': keepalive\n\n'
+        finally:
+            # generator is closed when the client disconnects
+            event_broadcaster.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@flask_app.route('/traces', methods=['GET'])
+def traces():
+    data = trace_recorder.statistics()
+    data['summary'] = trace_recorder.summary()
+    data['recent'] = trace_recorder.recent(request.args.get('device'), request.args.get('limit', 50, type=int))
+    return jsonify(data)
+
+
+@flask_app.route('/traces/export', methods=['GET'])
+def export_traces():
+    response = jsonify(trace_recorder.recent(request.args.get('device')))
+    response.headers['Content-Disposition'] = 'attachment; filename=traces.json'
+    return response
+
+
 def handle_device_update(name, new_status_enum, video_source, location_enum, address, listener_port, role,
                          capture_images):
     if name not in device_container:
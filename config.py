@@ -13,3 +13,47 @@ class Config(object):
                               'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
+    # shared recognition worker pool for local devices - disabled means one Alpr instance per camera process
+    RECOGNITION_POOL_ENABLED = os.environ.get('RECOGNITION_POOL_ENABLED', '0') == '1'
+    RECOGNITION_POOL_WORKERS = int(os.environ.get('RECOGNITION_POOL_WORKERS') or os.cpu_count())
+    # openalpr country, configuration file and runtime data loaded by pool workers
+    RECOGNITION_POOL_COUNTRY = os.environ.get('RECOGNITION_POOL_COUNTRY') or 'eu'
+    RECOGNITION_POOL_CONFIG_FILE = os.environ.get('RECOGNITION_POOL_CONFIG_FILE') or 'resources/openalpr.conf'
+    RECOGNITION_POOL_RUNTIME_DATA = os.environ.get('RECOGNITION_POOL_RUNTIME_DATA') or 'resources/runtime_data'
+    # detections handled concurrently by IPC server - 0 handles them one at a time
+    IPC_SERVER_WORKERS = int(os.environ.get('IPC_SERVER_WORKERS', 4))
+    # wire format of detector IPC sockets - json or binary
+    IPC_CODEC = os.environ.get('IPC_CODEC', 'json')
+    # PUB/SUB event bus proxy in the web app - detectors publish detections to it for any number of subscribers
+    EVENT_BUS_ENABLED = os.environ.get('EVENT_BUS_ENABLED', '0') == '1'
+    # gate backend validating detected plates
+    GATE_BACKEND_URL = os.environ.get('GATE_BACKEND_URL') or 'https://test-lot.herokuapp.com'
+    GATE_REQUESTER = os.environ.get('GATE_REQUESTER') or 'Parking-Krk-1'
+    GATE_CONNECT_TIMEOUT = float(os.environ.get('GATE_CONNECT_TIMEOUT', 1.0))
+    GATE_READ_TIMEOUT = float(os.environ.get('GATE_READ_TIMEOUT', 3.0))
+    GATE_RETRIES = int(os.environ.get('GATE_RETRIES', 2))
+    # durable outbox of detections not yet delivered to gate backend
+    OUTBOX_ENABLED = os.environ.get('OUTBOX_ENABLED', '0') == '1'
+    OUTBOX_PATH = os.environ.get('OUTBOX_PATH') or os.path.join(basedir, 'outbox.db')
+    OUTBOX_MAX_ROWS = int(os.environ.get('OUTBOX_MAX_ROWS', 100000))
+    # seconds a detection waits for earlier delivery of its lane (device and plate) before it is left queued
+    OUTBOX_SEND_TIMEOUT = float(os.environ.get('OUTBOX_SEND_TIMEOUT', 10))
+    # local cache of plate decisions - trust answers from cache, verify still waits for backend
+    PERMIT_CACHE_ENABLED = os.environ.get('PERMIT_CACHE_ENABLED', '0') == '1'
+    PERMIT_CACHE_MODE = os.environ.get('PERMIT_CACHE_MODE') or 'trust'
+    PERMIT_CACHE_TTL = float(os.environ.get('PERMIT_CACHE_TTL', 3600))
+    PERMIT_CACHE_MAX_ENTRIES = int(os.environ.get('PERMIT_CACHE_MAX_ENTRIES', 10000))
+    # optional JSON file of permits synced incrementally into the cache
+    PERMIT_CACHE_FILE = os.environ.get('PERMIT_CACHE_FILE')
+    PERMIT_CACHE_SYNC_INTERVAL = float(os.environ.get('PERMIT_CACHE_SYNC_INTERVAL', 30))
+    # edits tolerated when resolving misreads of permitted plates - confusable characters (O/0, B/8, I/1) are always
+    # matched. Resolved plate is only sent to the backend, gate never opens from cache on a near match
+    PERMIT_FUZZY_DISTANCE = int(os.environ.get('PERMIT_FUZZY_DISTANCE', 0))
+    # repeated detections of a plate in a lane within the window (seconds) share one backend call, 0 disables
+    DEDUP_WINDOW = float(os.environ.get('DEDUP_WINDOW', 10))
+    DEDUP_MAX_ENTRIES = int(os.environ.get('DEDUP_MAX_ENTRIES', 1000))
+    # completed end-to-end detection traces kept for /traces
+    TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', 2000))
+    # live /events stream - events buffered per client (oldest dropped when client falls behind), client limit
+    EVENT_STREAM_QUEUE_SIZE = int(os.environ.get('EVENT_STREAM_QUEUE_SIZE', 100))
+    EVENT_STREAM_MAX_CLIENTS = int(os.environ.get('EVENT_STREAM_MAX_CLIENTS', 50))
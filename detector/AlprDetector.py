@@ -1,17 +1,35 @@
-import datetime
+import os
+import time
 from collections import namedtuple
 
 import cv2
-from openalpr import Alpr
+
+from detector.DetectionRegion import FramePreprocessor
+from detector.EvidenceWriter import EvidenceWriter
+from detector.FrameGrabber import FrameGrabber, CaptureConfiguration
+from detector.FrameSampler import FrameSampler
+from detector.MotionGate import MotionGate
+from detector.PlatePatterns import PATTERN_FILTER_PREFER, PATTERN_FILTER_OFF, matcher_for
+from detector.PlateTracker import PlateTracker, PlateObservation
+from detector.Recognizer import AlprRecognizer
+from detector.StageTimings import STAGE_PREPROCESS, STAGE_RECOGNIZE, STAGE_CALLBACK
+from metrics.DetectorMetrics import FRAMES_SKIPPED, FRAMES_GATED, DETECTIONS, REJECTED_PLATES, CAPTURE_FAILURES, \
+    DETECTOR_ERRORS
+from metrics.Tracing import start_trace, mark, STAGE_EMITTED, TRACE_KEY
 
 VIDEO_SOURCE = 0  # default webcam address
 VIDEO_SOURCE_FILE = '../resources/videos/hispeed.mp4'
 WINDOW_NAME = 'openalpr'
 FRAME_SKIP = 12
+FRAME_WAIT_TIMEOUT = 5.0
 
-AlprConfiguration = namedtuple('AlprConfiguration', 'region, config_file, runtime_data_file, frame_skip')
+# pattern_filter - how candidates are checked against postprocess patterns of the region (see PlatePatterns)
+AlprConfiguration = namedtuple('AlprConfiguration', 'region, config_file, runtime_data_file, frame_skip, sampling, '
+                                                    'pattern_filter',
+                               defaults=(None, PATTERN_FILTER_PREFER))
 AlprDetectorArgs = namedtuple('AlprDetectorArgs', 'instance_name, alpr_configuration, video_source, capture_images, '
-                                                  'role')
+                                                  'role, motion_gate, detection_region, tracker, evidence',
+                              defaults=(None, None, None, None))
 
 
 def video_source_properties(cap):
@@ -25,19 +43,138 @@ def video_source_properties(cap):
 
 class AlprDetector:
 
-    def __init__(self, name, config, video_source, event_callback=None, save_images=False):
+    def __init__(self, name, config, video_source, event_callback=None, save_images=False, capture=None,
+                 motion_gate=None, detection_region=None, tracker=None, recognizer=None, evidence=None,
+                 timings=None, metrics=None):
         self.__name = name
-        self.__alpr_instance = Alpr(config.region, config.config_file, config.runtime_data_file)
-        if not self.__alpr_instance.is_loaded():
-            print('Alpr instance could not be created')
-        self.__frame_skip = config.frame_skip
+        self.__config = config
+        # recognizer can be shared (e.g. pooled) - otherwise detector owns its own Alpr instance
+        self.__owns_recognizer = recognizer is None
+        self.__recognizer = recognizer if recognizer is not None else AlprRecognizer(config)
+        self.__recognition_path = self.__recognizer.recognition_path()
+        print(self.__name, ' recognition path: ', self.__recognition_path)
+        self.__sampler = FrameSampler(config.frame_skip, config.sampling)
+        self.__pattern_matcher = AlprDetector.__create_pattern_matcher(config)
+        self.__rejected_plates = 0
         self.event_callback = event_callback
         self.__video_source = video_source
         self.__cap = cv2.VideoCapture(video_source)
+        self.__capture_config = capture if capture else CaptureConfiguration()
+        # optional counters of the detector loop (DetectorMetrics) - also records stage durations unless timings given
+        self.__metrics = metrics
+        # optional recorder of per stage durations, e.g. StageTimings
+        self.__timings = timings if timings is not None else metrics
+        self.__grabber = self.__create_grabber()
+        self.__motion_gate_config = motion_gate
+        self.__motion_gate = MotionGate(motion_gate) if motion_gate else None
+        self.__detection_region = detection_region
+        self.__preprocessor = FramePreprocessor(detection_region) if detection_region else None
+        self.__tracker_config = tracker
+        self.__tracker = PlateTracker(tracker)
         self.__running = False
         self.__save_image = save_images
-        import os
-        self.__directory = os.getcwd()
+        self.__evidence_config = evidence
+        self.__evidence_writer = EvidenceWriter(name, evidence) if save_images else None
+
+    @staticmethod
+    def __create_pattern_matcher(config):
+        if PATTERN_FILTER_OFF == config.pattern_filter:
+            return None
+        # compiled patterns are shared by every detector of the process
+        return matcher_for(config.runtime_data_file, config.region)
+
+    @staticmethod
+    def __requires_reload(current, new):
+        return (current.region, current.config_file, current.runtime_data_file) != \
+               (new.region, new.config_file, new.runtime_data_file)
+
+    def reconfigure(self, config, video_source, save_images=False, motion_gate=None, detection_region=None,
+                    tracker=None, evidence=None):
+        """
+        Applies new settings to stopped detector, touching only parts which changed.
+        Alpr instance is reloaded only when region or configuration files differ.
+        """
+        if self.__running:
+            print(self.__name, ' Detector has to be stopped before reconfiguration')
+            return False
+
+        start = time.perf_counter()
+        changed = []
+        if self.__requires_reload(self.__config, config):
+            if self.__owns_recognizer:
+                self.__recognizer.unload()
+                self.__recognizer = AlprRecognizer(config)
+                self.__recognition_path = self.__recognizer.recognition_path()
+                changed.append('recognizer')
+            else:
+                print(self.__name, ' shared recognizer is not reloaded on configuration change')
+        if (self.__config.frame_skip, self.__config.sampling) != (config.frame_skip, config.sampling):
+            self.__sampler = FrameSampler(config.frame_skip, config.sampling)
+            changed.append('sampling')
+        if (self.__config.region, self.__config.runtime_data_file, self.__config.pattern_filter) != \
+                (config.region, config.runtime_data_file, config.pattern_filter):
+            self.__pattern_matcher = AlprDetector.__create_pattern_matcher(config)
+            changed.append('pattern_filter')
+        self.__config = config
+
+        if video_source != self.__video_source:
+            self.__cap.release()
+            self.__video_source = video_source
+            self.__cap = cv2.VideoCapture(video_source)
+            self.__grabber = self.__create_grabber()
+            # new grabber counts frames from the beginning
+            self.__sampler.reset()
+            changed.append('video_source')
+        if motion_gate != self.__motion_gate_config:
+            self.__motion_gate_config = motion_gate
+            self.__motion_gate = MotionGate(motion_gate) if motion_gate else None
+            changed.append('motion_gate')
+        if detection_region != self.__detection_region:
+            self.__detection_region = detection_region
+            self.__preprocessor = FramePreprocessor(detection_region) if detection_region else None
+            changed.append('detection_region')
+        if tracker != self.__tracker_config:
+            self.__tracker_config = tracker
+            self.__tracker = PlateTracker(tracker)
+            changed.append('tracker')
+        if save_images != self.__save_image or evidence != self.__evidence_config:
+            self.__save_image = save_images
+            self.__evidence_config = evidence
+            self.__evidence_writer = EvidenceWriter(self.__name, evidence) if save_images else None
+            changed.append('evidence')
+
+        print(self.__name, ' reconfigured ', changed, ' in ', time.perf_counter() - start, ' s')
+        return True
+
+    def close(self):
+        self.__cap.release()
+        if self.__owns_recognizer:
+            self.__recognizer.unload()
+
+    def __create_grabber(self):
+        pacing = self.__capture_config.realtime_pacing
+        if pacing is None:
+            # files are read as fast as possible unless paced - emulate camera behaviour for them
+            pacing = isinstance(self.__video_source, str) and os.path.isfile(self.__video_source)
+        pace_fps = self.__cap.get(cv2.CAP_PROP_FPS) if pacing else None
+        return FrameGrabber(self.__cap, slots=self.__capture_config.slots, pace_fps=pace_fps,
+                            lossless=self.__capture_config.lossless, timings=self.__timings)
+
+    def status(self):
+        data = self.__grabber.statistics()
+        data['running'] = self.__running
+        data['recognition_path'] = self.__recognition_path
+        data['sampling'] = self.__sampler.statistics()
+        data['tracker'] = self.__tracker.statistics()
+        data['rejected_plates'] = self.__rejected_plates
+        if self.__evidence_writer is not None:
+            data['evidence'] = self.__evidence_writer.statistics()
+        if self.__motion_gate is not None:
+            data['motion_gate'] = self.__motion_gate.statistics()
+        return data
+
+    def recognition_path(self):
+        return self.__recognition_path
 
     def is_working(self):
         return self.__cap.isOpened() and self.__running
@@ -49,10 +186,10 @@ class AlprDetector:
         data['width'] = self.__cap.get(cv2.CAP_PROP_FRAME_WIDTH)
         data['height'] = self.__cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
         data['codec'] = self.__cap.get(cv2.CAP_PROP_FOURCC)
-        return
+        data['recognition_path'] = self.__recognition_path
+        return data
 
-    @staticmethod
-    def __extract_results(alpr_result):
+    def __extract_results(self, alpr_result):
         if alpr_result is None:
             return None
         if not alpr_result['results']:
@@ -60,22 +197,46 @@ class AlprDetector:
         else:
             result = []
             for plate in alpr_result['results']:
-                for candidate in plate['candidates']:
-                    result.append([candidate['plate'], candidate['confidence']])
+                candidates = [[candidate['plate'], candidate['confidence']] for candidate in plate['candidates']]
+                if self.__pattern_matcher is not None:
+                    # candidates of invalid format never reach tracker, dedup or backend
+                    candidates = self.__pattern_matcher.filter_candidates(candidates, self.__config.pattern_filter)
+                    if not candidates:
+                        self.__rejected_plates += 1
+                        if self.__metrics is not None:
+                            self.__metrics.increment(REJECTED_PLATES)
+                        continue
+                result.append(PlateObservation(candidates, plate.get('coordinates')))
             return result
 
-    @staticmethod
-    def __extract_best_candidate(alpr_result):
-        return alpr_result['results'][0]['plate'] if alpr_result['results'] else None
-
-    def __handle_results(self, extracted_results):
+    def __handle_results(self, event):
         if self.event_callback is not None:
             callback_data = dict()
-            # object is list of dict containing 'plate' and 'confidence'
-            callback_data['candidates'] = extracted_results
+            # object is list of [plate, confidence] pairs - consolidated plate first
+            callback_data['candidates'] = event.candidates
+            callback_data['coordinates'] = event.coordinates
+            callback_data['observations'] = event.observations
             callback_data['detector'] = self.__name
-            print('calling callback , ', extracted_results)
+            callback_data['timestamp'] = time.time()
+            if event.trace_id is not None:
+                # latency of the vehicle pass is measured from the first frame its plate was seen in
+                trace = start_trace(event.trace_id, event.captured, event.observed)
+                mark(trace, STAGE_EMITTED, callback_data['timestamp'])
+                callback_data[TRACE_KEY] = trace
+            print('calling callback , ', event.candidates)
+            if self.__metrics is not None:
+                self.__metrics.increment(DETECTIONS)
+            callback_start = time.perf_counter()
             self.event_callback(callback_data)
+            if self.__timings is not None:
+                self.__timings.record(STAGE_CALLBACK, time.perf_counter() - callback_start)
+
+    def __emit_events(self, events):
+        for event in events:
+            print(event.plate)
+            self.__handle_results(event)
+            if self.__evidence_writer is not None and event.snapshot is not None:
+                self.__evidence_writer.submit(event.plate, event.snapshot)
 
     def run(self):
         if self.__running:
@@ -89,65 +250,92 @@ class AlprDetector:
             self.__running = False
             return False
 
-        frame_number = 0
-        last_recognized_plate = None
         error_state = False
         try:
-            print(self.__name, ' starting detector loop for: ', self.__video_source)
+            print(self.__name, ' starting detector loop for: ', self.__video_source, ' using ',
+                  self.__recognition_path, ' recognition path')
+            self.__grabber.start()
+            if self.__evidence_writer is not None:
+                self.__evidence_writer.start()
             while self.__running:
-                a = datetime.datetime.now()
-                last_read_status, frame = self.__cap.read()
-                if not last_read_status:
-                    print('Video capture.read() failed. Stopping the work')
-                    self.__running = False
-                    error_state = True
-                    break
-                frame_number += 1
-                if frame_number % self.__frame_skip == 0:
-                    frame_number = 0
+                captured = self.__grabber.latest(timeout=FRAME_WAIT_TIMEOUT)
+                if captured is None:
+                    if not self.__running:
+                        # stopped or reconfigured - grabber was stopped by stop()
+                        break
+                    if self.__grabber.has_failed():
+                        print('Video capture.read() failed. Stopping the work')
+                        if self.__metrics is not None:
+                            self.__metrics.increment(CAPTURE_FAILURES)
+                        self.__running = False
+                        error_state = True
+                        break
+                    if not self.__grabber.is_running():
+                        break
+                    continue
+                frame = captured.image
+                self.__emit_events(self.__tracker.expire())
+                if not self.__sampler.should_process(captured):
+                    if self.__metrics is not None:
+                        self.__metrics.increment(FRAMES_SKIPPED)
                     continue
                 if cv2.waitKey(1) == 27:
                     break
                 # cv2.imshow(self.__name, frame)
 
-                # todo: use recognize_ndarray when updated to at least 2.3.1
-                # alpr.recognize_ndarray(frame)
-                ret, enc = cv2.imencode("*.bmp", frame)
-                results = self.__alpr_instance.recognize_array(bytes(bytearray(enc)))
-                best_candidate = self.__extract_best_candidate(results)
-                if best_candidate is not None and best_candidate != last_recognized_plate:
-                    last_recognized_plate = best_candidate
-                    print(best_candidate)
-                    # send first recognized plate and all candidates
-                    extracted_results = self.__extract_results(results)
-                    if extracted_results:
-                        self.__handle_results(extracted_results)
-
-                    if self.__save_image:
-                        print(self.__directory)
-                        import os.path
-                        cv2.imwrite(os.path.join(self.__directory,
-                                                 self.__name,
-                                                 ''.join((best_candidate, '_',
-                                                          self.__name, '_',
-                                                          datetime.datetime.now().strftime(
-                                                              "%Y_%m_%d_%H_%M_%S"),
-                                                          '.jpeg'))), frame)
+                preprocess_start = time.perf_counter()
+                image = self.__preprocessor.prepare(frame) if self.__preprocessor is not None else frame
+                # motion is checked only inside region of interest
+                is_gated = self.__motion_gate is not None and not self.__motion_gate.should_process(image)
+                recognition_start = time.perf_counter()
+                if self.__timings is not None:
+                    self.__timings.record(STAGE_PREPROCESS, recognition_start - preprocess_start)
+                if is_gated:
+                    if self.__metrics is not None:
+                        self.__metrics.increment(FRAMES_GATED)
+                    continue
+                if self.__motion_gate is not None:
+                    self.__sampler.mark_active()
+
+                results = self.__recognizer.recognize(image)
+                recognition_time = time.perf_counter() - recognition_start
+                self.__sampler.record_recognition(recognition_time)
+                if self.__timings is not None:
+                    self.__timings.record(STAGE_RECOGNIZE, recognition_time)
+                if self.__preprocessor is not None:
+                    results = self.__preprocessor.map_results(results)
+                observations = self.__extract_results(results)
+                if observations:
+                    self.__sampler.mark_active()
+                    # frame buffer is reused by capture thread - snapshot has to be a copy
+                    snapshot = (lambda: frame.copy()) if self.__save_image else None
+                    self.__emit_events(self.__tracker.update(observations, snapshot=snapshot, frame=captured))
 
+            # vehicles still tracked when source ended or detector was stopped
+            self.__emit_events(self.__tracker.flush())
         except cv2.error as e:
             print("OpenCV Exception caught: ", e)
             error_state = True
+            if self.__metrics is not None:
+                self.__metrics.increment(DETECTOR_ERRORS)
         except Exception as e:
             print("Exception caught: ", e)
             error_state = True
+            if self.__metrics is not None:
+                self.__metrics.increment(DETECTOR_ERRORS)
         finally:
-            self.__alpr_instance.unload()
+            self.__grabber.stop()
+            print(self.__name, ' capture statistics: ', self.__grabber.statistics())
+            if self.__evidence_writer is not None:
+                self.__evidence_writer.stop()
             self.__running = False
             print(self.__name, " is stopping")
             return not error_state
 
     def stop(self):
         self.__running = False
+        # wakes up detector loop waiting for next frame
+        self.__grabber.stop()
 
 
 def create_configuration():
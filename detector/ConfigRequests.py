@@ -1,6 +1,11 @@
+import json
 from abc import abstractmethod, ABC
 
 from detector.DetectorStates import DetectorState
+from ipc_communication.Codec import register_schema, as_plain
+
+MESSAGE_STATE_CHANGE = 16
+MESSAGE_CONFIGURATION = 17
 
 
 class DetectorRequest(ABC):
@@ -11,27 +16,40 @@ class DetectorRequest(ABC):
 
 class StateChangeRequest(DetectorRequest):
     def __init__(self, state):
-        self.target_state = state
+        self.__target_state = state
 
     def target_state(self) -> DetectorState:
-        return self.target_state
+        return self.__target_state
 
 
 class ConfigurationRequest(DetectorRequest):
     def __init__(self, **kwargs):
-        self.target_state = DetectorState.CONFIGURE
+        self.__target_state = DetectorState.CONFIGURE
         self.device_specific_config = kwargs
 
     def target_state(self) -> DetectorState:
-        return self.target_state
+        return self.__target_state
+
+
+def as_dict(request: DetectorRequest):
+    data_dict = {'target_state': request.target_state().name}
+    if isinstance(request, ConfigurationRequest):
+        data_dict['device_specific_config'] = as_plain(request.device_specific_config)
+    return data_dict
 
 
 def as_command(data_dict: dict):
-    if 'target_state' not in data_dict:
+    if not isinstance(data_dict, dict) or 'target_state' not in data_dict:
         return None
-    import json
     if 'device_specific_config' in data_dict:
-        config_dict = json.loads(data_dict['device_specific_config'])
+        config_dict = data_dict['device_specific_config']
+        # older senders encoded the configuration as nested JSON string
+        if isinstance(config_dict, str):
+            config_dict = json.loads(config_dict)
         return ConfigurationRequest(**config_dict)
     else:
-        return StateChangeRequest(json.loads(data_dict['target_state']))
+        return StateChangeRequest(DetectorState[data_dict['target_state']])
+
+
+register_schema(MESSAGE_STATE_CHANGE, StateChangeRequest, as_dict, as_command)
+register_schema(MESSAGE_CONFIGURATION, ConfigurationRequest, as_dict, as_command)
@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+import cv2
+import numpy
+
+# roi - rectangle [x, y, width, height] or polygon [[x1, y1], [x2, y2], ...] in full frame coordinates
+# max_width, max_height - counterparts of max_detection_input_width/height from openalpr.conf
+DetectionRegionConfiguration = namedtuple('DetectionRegionConfiguration', 'roi, max_width, max_height',
+                                          defaults=(None, 1280, 720))
+
+
+def is_rectangle(roi):
+    return roi is not None and len(roi) == 4 and all(isinstance(value, (int, float)) for value in roi)
+
+
+def roi_to_polygon(roi):
+    if roi is None:
+        return None
+    if is_rectangle(roi):
+        x, y, width, height = roi
+        return [[x, y], [x + width, y], [x + width, y + height], [x, y + height]]
+    return [[point[0], point[1]] for point in roi]
+
+
+def clip_rectangle(x, y, width, height, frame_width, frame_height):
+    """ Clips both corners of rectangle to the frame - result covers at least one pixel. """
+    left = min(max(0, x), frame_width - 1)
+    top = min(max(0, y), frame_height - 1)
+    right = min(max(left + 1, x + width), frame_width)
+    bottom = min(max(top + 1, y + height), frame_height)
+    return left, top, right - left, bottom - top
+
+
+class FramePreprocessor:
+    """
+    Crops frame to region of interest, masks area outside of polygon (as detection_mask_image does)
+    and downscales the crop to detection resolution. Plate coordinates found on prepared image
+    are mapped back to full frame space with map_results.
+    """
+
+    def __init__(self, config: DetectionRegionConfiguration):
+        self.__config = config
+        self.__polygon = roi_to_polygon(config.roi)
+        self.__mask_only_rectangle = config.roi is None or is_rectangle(config.roi)
+        self.__frame_shape = None
+        self.__crop = None
+        self.__mask = None
+        self.__scale = 1.0
+
+    def __update_geometry(self, frame_shape):
+        self.__frame_shape = frame_shape
+        frame_height, frame_width = frame_shape[:2]
+
+        if self.__polygon is None:
+            x, y, width, height = 0, 0, frame_width, frame_height
+        else:
+            points = numpy.array(self.__polygon, dtype=numpy.int32)
+            x, y, width, height = clip_rectangle(*cv2.boundingRect(points), frame_width, frame_height)
+        self.__crop = (x, y, width, height)
+
+        self.__mask = None
+        if not self.__mask_only_rectangle:
+            self.__mask = numpy.zeros((height, width), dtype=numpy.uint8)
+            shifted = numpy.array(self.__polygon, dtype=numpy.int32) - numpy.array([x, y], dtype=numpy.int32)
+            cv2.fillPoly(self.__mask, [shifted], 255)
+
+        max_width = self.__config.max_width or width
+        max_height = self.__config.max_height or height
+        self.__scale = min(1.0, max_width / width, max_height / height)
+
+    def prepare(self, frame):
+        if frame.shape != self.__frame_shape:
+            self.__update_geometry(frame.shape)
+
+        x, y, width, height = self.__crop
+        image = frame[y:y + height, x:x + width]
+        if self.__mask is not None:
+            image = cv2.bitwise_and(image, image, mask=self.__mask)
+        if self.__scale < 1.0:
+            image = cv2.resize(image, (max(1, int(width * self.__scale)), max(1, int(height * self.__scale))),
+                               interpolation=cv2.INTER_AREA)
+        # recognition reads raw buffer - crop view has to be made contiguous
+        return numpy.ascontiguousarray(image)
+
+    def map_point(self, x, y):
+        offset_x, offset_y = self.__crop[:2]
+        return int(round(x / self.__scale + offset_x)), int(round(y / self.__scale + offset_y))
+
+    def map_results(self, alpr_result):
+        if alpr_result is None or self.__crop is None:
+            return alpr_result
+        for plate in alpr_result.get('results', []):
+            for point in plate.get('coordinates', []):
+                point['x'], point['y'] = self.map_point(point['x'], point['y'])
+        return alpr_result
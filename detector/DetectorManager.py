@@ -1,41 +1,123 @@
+import time
 from collections import namedtuple
-from threading import Thread
+from threading import Thread, Event
 
 import zmq
 
-from detector.AlprDetector import create_configuration, VIDEO_SOURCE, VIDEO_SOURCE_FILE, AlprDetector, AlprDetectorArgs
-from detector.ConfigRequests import DetectorRequest, ConfigurationRequest
+from detector.AlprDetector import create_configuration, VIDEO_SOURCE, VIDEO_SOURCE_FILE, AlprDetector, \
+    AlprDetectorArgs, AlprConfiguration
+from detector.ConfigRequests import DetectorRequest, ConfigurationRequest, as_command
+from detector.DetectionRegion import DetectionRegionConfiguration
 from detector.DetectorStates import DetectorState
-from ipc_communication.Client import Client
+from detector.EvidenceWriter import EvidenceConfiguration
+from detector.FrameSampler import SamplingConfiguration
+from detector.MotionGate import MotionGateConfiguration
+from detector.PlateTracker import TrackerConfiguration
+from ipc_communication.Codec import CODECS, JSON_CODEC, register_schema, as_plain
+from ipc_communication.EventBus import EventPublisher, detection_topic
+from ipc_communication.QueuedClient import QueuedClient
 from ipc_communication.Server import AsyncServer, Server
 from ipc_communication.default_configuration import CLIENT_PREFIX, DEFAULT_DETECTOR_SERVER_PORT, SERVER_PREFIX
+from metrics.DetectorMetrics import DetectorMetrics, DETECTIONS_SENT, STAGE_DECISION, metrics_report
 
-DetectorProcessArguments = namedtuple('DetectorProcessArguments', 'name, detector_args, communication_config')
+# recognizer - optional recognizer shared with other detectors (e.g. PooledRecognizer), None loads own Alpr instance
+DetectorProcessArguments = namedtuple('DetectorProcessArguments', 'name, detector_args, communication_config, recognizer',
+                                      defaults=(None,))
 
 AddressAndPort = namedtuple('AddressAndPort', 'address, port')
+# codec - name of wire format (see ipc_communication.Codec.CODECS) used by detector sockets
+# event_bus - AddressAndPort of event bus proxy frontend, None disables publishing of detections
 CommunicationConfiguration = namedtuple('CommunicationConfiguration',
-                                        'server, command_listener')
+                                        'server, command_listener, codec, event_bus',
+                                        defaults=(JSON_CODEC.name, None))
+
+RETRY_DELAY = 3.0
+# seconds between metrics reports sent to the web app
+METRICS_REPORT_INTERVAL = 10.0
+MESSAGE_PROCESS_ARGUMENTS = 18
+
+
+def as_detector_args(config_dict: dict) -> AlprDetectorArgs:
+    """ Builds AlprDetectorArgs from dict - nested settings arrive as plain dicts when sent over IPC. """
+    config_dict = dict(config_dict)
+    if isinstance(config_dict['alpr_configuration'], dict):
+        config_dict['alpr_configuration'] = AlprConfiguration(**config_dict['alpr_configuration'])
+    alpr_configuration = config_dict['alpr_configuration']
+    if isinstance(alpr_configuration.sampling, dict):
+        config_dict['alpr_configuration'] = alpr_configuration._replace(
+            sampling=SamplingConfiguration(**alpr_configuration.sampling))
+    if isinstance(config_dict.get('motion_gate'), dict):
+        config_dict['motion_gate'] = MotionGateConfiguration(**config_dict['motion_gate'])
+    if isinstance(config_dict.get('detection_region'), dict):
+        config_dict['detection_region'] = DetectionRegionConfiguration(**config_dict['detection_region'])
+    if isinstance(config_dict.get('tracker'), dict):
+        config_dict['tracker'] = TrackerConfiguration(**config_dict['tracker'])
+    if isinstance(config_dict.get('evidence'), dict):
+        config_dict['evidence'] = EvidenceConfiguration(**config_dict['evidence'])
+
+    return AlprDetectorArgs(**config_dict)
+
+
+def process_arguments_as_dict(args: DetectorProcessArguments):
+    # shared recognizer lives in local process only - remote detector always loads its own Alpr instance
+    return as_plain(args._replace(recognizer=None))
+
+
+def as_process_arguments(data_dict: dict) -> DetectorProcessArguments:
+    communication_config = data_dict['communication_config']
+    event_bus = communication_config.get('event_bus')
+    return DetectorProcessArguments(data_dict['name'], as_detector_args(data_dict['detector_args']),
+                                    CommunicationConfiguration(AddressAndPort(**communication_config['server']),
+                                                               AddressAndPort(
+                                                                   **communication_config['command_listener']),
+                                                               communication_config['codec'],
+                                                               AddressAndPort(**event_bus) if event_bus else None))
+
+
+register_schema(MESSAGE_PROCESS_ARGUMENTS, DetectorProcessArguments, process_arguments_as_dict, as_process_arguments)
 
 
 class DetectorManager:
     def __init__(self, name: str, detector_args: AlprDetectorArgs,
-                 communication_configuration: CommunicationConfiguration):
+                 communication_configuration: CommunicationConfiguration, recognizer=None):
         self.__state = DetectorState.ON
         self.__instance_name = name
         self.__role = detector_args.role
         self.__current_detector_args = detector_args
+        self.__recognizer = recognizer
+        self.__state_changed = Event()
+        self.__metrics = DetectorMetrics()
+        self.__metrics_stop = Event()
+        self.__metrics_thread = None
         self.__context = zmq.Context()
+        codec = CODECS[communication_configuration.codec]
         self.__command_listener = AsyncServer(address=communication_configuration.command_listener.address,
                                               port=communication_configuration.command_listener.port,
                                               context=self.__context,
-                                              message_handler=self.__handle_json_command)
-        self.__client = Client(address=communication_configuration.server.address,
-                               port=communication_configuration.server.port,
-                               context=self.__context)
+                                              message_handler=self.__handle_message,
+                                              codec=codec)
+        # detections are sent asynchronously - recognition never waits for the gate decision
+        self.__client = QueuedClient(address=communication_configuration.server.address,
+                                     port=communication_configuration.server.port,
+                                     context=self.__context,
+                                     ack_callback=self.__handle_acknowledgement,
+                                     codec=codec)
+        self.__publisher = None
+        if communication_configuration.event_bus is not None:
+            self.__publisher = EventPublisher(address=communication_configuration.event_bus.address,
+                                              port=communication_configuration.event_bus.port,
+                                              context=self.__context,
+                                              codec=codec)
         self.__detector = AlprDetector(name=detector_args.instance_name, config=detector_args.alpr_configuration,
                                        video_source=detector_args.video_source,
                                        event_callback=self.__client_send_message,
                                        save_images=detector_args.capture_images,
+                                       motion_gate=detector_args.motion_gate,
+                                       detection_region=detector_args.detection_region,
+                                       tracker=detector_args.tracker,
+                                       recognizer=recognizer,
+                                       evidence=detector_args.evidence,
+                                       metrics=self.__metrics,
                                        )
 
     def run(self):
@@ -43,6 +125,9 @@ class DetectorManager:
         print('starting detector process')
         print('properties:', self.__detector.video_source_properties())
         self.__command_listener.run()
+        self.__client.start()
+        self.__metrics_thread = Thread(target=self.__report_metrics_loop, daemon=True)
+        self.__metrics_thread.start()
 
         self.__state = DetectorState.ON
         print('starting detector', '  is working now: ', self.__detector.is_working())
@@ -51,24 +136,33 @@ class DetectorManager:
                   self.__detector.is_working())
             if DetectorState.CONFIGURE == self.__state:
                 args = self.__current_detector_args
-                self.__detector = AlprDetector(args.instance_name, args.alpr_configuration,
-                                               args.video_source, self.__client.send_message)
+                # loaded Alpr instance is kept unless region or configuration files changed
+                self.__detector.reconfigure(args.alpr_configuration, args.video_source,
+                                            save_images=args.capture_images,
+                                            motion_gate=args.motion_gate,
+                                            detection_region=args.detection_region,
+                                            tracker=args.tracker,
+                                            evidence=args.evidence)
                 self.__state = DetectorState.ON
             elif DetectorState.ON == self.__state:
+                self.__state_changed.clear()
                 is_successful = self.__detector.run()
-                if not is_successful:
+                if not is_successful and DetectorState.ON == self.__state:
                     print('detector stopped due to invalid state - quitting run method')
-                    # the run method can be retried with new configuration
-                    self.__state = DetectorState.ON
-                    from time import sleep
-                    sleep(3)  # needs condtional variable here instead of sleep
-
-
-    def __handle_json_command(self, json_data):
-        print('handle_command ', str(json_data))
-        import json
-        from detector.ConfigRequests import as_command
-        command = json.loads(json_data, hook=as_command)
+                    # the run method can be retried with new configuration - wait for command or retry later
+                    self.__state_changed.wait(RETRY_DELAY)
+
+        self.__detector.close()
+        self.__metrics_stop.set()
+        self.__metrics_thread.join()
+        self.__client.stop()
+        if self.__publisher is not None:
+            self.__publisher.close()
+
+    def __handle_message(self, message):
+        print('handle_command ', str(message))
+        # binary codec decodes requests itself, JSON codec delivers plain dict
+        command = message if isinstance(message, DetectorRequest) else as_command(message)
         return self.__handle_command(command) if command else False
 
     def __handle_command(self, command: DetectorRequest):
@@ -99,6 +193,7 @@ class DetectorManager:
                 result = False
                 # error
 
+            self.__state_changed.set()
             return result
 
     @classmethod
@@ -108,18 +203,40 @@ class DetectorManager:
             if key in config_dict:
                 config_dict[key] = value
 
-        return AlprDetectorArgs(config_dict)
+        return as_detector_args(config_dict)
 
     def __client_send_message(self, message):
         message['detector_role'] = self.__role
         self.__client.send_message(message)
+        self.__metrics.increment(DETECTIONS_SENT)
+        if self.__publisher is not None:
+            self.__publisher.publish(detection_topic(self.__role, self.__instance_name), message)
+
+    def __report_metrics_loop(self):
+        while not self.__metrics_stop.wait(METRICS_REPORT_INTERVAL):
+            client_statistics = self.__client.statistics()
+            if client_statistics['queued']:
+                # detections go first - metrics are cumulative, so next report carries everything
+                continue
+            snapshot = self.__metrics.snapshot(detections_dropped=client_statistics['dropped'],
+                                               acknowledgements_timed_out=client_statistics['timed_out'])
+            self.__client.send_message(metrics_report(self.__current_detector_args.instance_name, self.__role,
+                                                      snapshot))
+
+    def __handle_acknowledgement(self, message, reply):
+        if 'candidates' not in message:
+            # metrics report
+            return
+        if 'timestamp' in message:
+            self.__metrics.record(STAGE_DECISION, time.time() - message['timestamp'])
+        print(self.__instance_name, ' detection ', message['candidates'][0][0], ' acknowledged: ', reply)
 
 
 def start_detector_process(args: DetectorProcessArguments):
     print('starting detector process')
     import os
     print('Current working directory: ', os.getcwd())
-    manager = DetectorManager(args.name, args.detector_args, args.communication_config)
+    manager = DetectorManager(args.name, args.detector_args, args.communication_config, args.recognizer)
     manager.run()
 
     print('stopping detector process')
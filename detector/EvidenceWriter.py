@@ -0,0 +1,189 @@
+import datetime
+import os
+import queue
+import time
+from collections import namedtuple, deque
+from threading import Thread
+
+import cv2
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
+# directory - None stores images in <working directory>/<detector name>
+# max_bytes, max_age - retention budget of the directory, None disables the limit
+EvidenceConfiguration = namedtuple('EvidenceConfiguration',
+                                   'directory, queue_size, drop_policy, jpeg_quality, max_bytes, max_age',
+                                   defaults=(None, 16, DROP_NEWEST, 90, 512 * 1024 * 1024, 7 * 24 * 3600))
+
+EvidenceImage = namedtuple('EvidenceImage', 'plate, image, created')
+StoredFile = namedtuple('StoredFile', 'path, size, created')
+
+EVIDENCE_EXTENSION = '.jpeg'
+# seconds between retention runs of idle writer - age limit applies also when no image is written
+RETENTION_INTERVAL = 60.0
+
+
+class EvidenceWriter:
+    """
+    Writes evidence images on background thread so slow disks do not stall detection.
+    Images are fed through bounded queue and directory is kept within size and age budget.
+    """
+
+    def __init__(self, name, config: EvidenceConfiguration = None):
+        self.__name = name
+        self.__config = config if config else EvidenceConfiguration()
+        self.__directory = self.__config.directory or os.path.join(os.getcwd(), name)
+        self.__queue = queue.Queue(maxsize=max(1, self.__config.queue_size))
+        self.__thread = None
+        self.__stored = deque()
+        self.__stored_bytes = 0
+        self.__written = 0
+        self.__dropped = 0
+        self.__removed = 0
+        self.__failed = 0
+        self.__last_latency = None
+        self.__max_latency = 0.0
+        self.__total_latency = 0.0
+
+    def directory(self):
+        return self.__directory
+
+    def start(self):
+        if self.__thread is not None:
+            return False
+        self.__thread = Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        """ Writes queued images and stops the writer thread. """
+        if self.__thread is None:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__thread = None
+
+    def submit(self, plate, image):
+        item = EvidenceImage(plate, image, datetime.datetime.now())
+        policy = self.__config.drop_policy
+        if BLOCK == policy:
+            self.__queue.put(item)
+            return True
+        try:
+            self.__queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        self.__dropped += 1
+        if DROP_OLDEST == policy:
+            try:
+                self.__queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.__queue.put_nowait(item)
+                return True
+            except queue.Full:
+                return False
+        return False
+
+    def __load_existing_files(self):
+        files = []
+        for entry in os.scandir(self.__directory):
+            if entry.is_file() and entry.name.endswith(EVIDENCE_EXTENSION):
+                stat = entry.stat()
+                files.append(StoredFile(entry.path, stat.st_size, stat.st_mtime))
+        # writer is restarted with every detector start - files seen by previous run are on disk again
+        self.__stored.clear()
+        self.__stored_bytes = 0
+        for stored_file in sorted(files, key=lambda f: f.created):
+            self.__stored.append(stored_file)
+            self.__stored_bytes += stored_file.size
+
+    def __file_path(self, item: EvidenceImage):
+        name = ''.join((item.plate, '_', self.__name, '_', item.created.strftime("%Y_%m_%d_%H_%M_%S_"),
+                        '%03d' % (item.created.microsecond // 1000)))
+        path = os.path.join(self.__directory, name + EVIDENCE_EXTENSION)
+        suffix = 0
+        # existing image is never overwritten - it is already counted in the retention budget
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(self.__directory, name + '_' + str(suffix) + EVIDENCE_EXTENSION)
+        return path
+
+    def __enforce_retention(self):
+        max_bytes = self.__config.max_bytes
+        max_age = self.__config.max_age
+        now = time.time()
+        while self.__stored:
+            oldest = self.__stored[0]
+            over_size = max_bytes is not None and self.__stored_bytes > max_bytes
+            too_old = max_age is not None and now - oldest.created > max_age
+            if not over_size and not too_old:
+                break
+            self.__stored.popleft()
+            self.__stored_bytes -= oldest.size
+            try:
+                os.remove(oldest.path)
+                self.__removed += 1
+            except OSError as e:
+                print('Evidence file could not be removed: ', e)
+
+    def __write(self, item: EvidenceImage):
+        path = self.__file_path(item)
+        start = time.perf_counter()
+        written = cv2.imwrite(path, item.image, [cv2.IMWRITE_JPEG_QUALITY, self.__config.jpeg_quality])
+        latency = time.perf_counter() - start
+
+        self.__last_latency = latency
+        self.__max_latency = max(self.__max_latency, latency)
+        self.__total_latency += latency
+        if not written:
+            self.__failed += 1
+            print(self.__name, ' evidence image could not be written to ', path)
+            return
+        self.__written += 1
+        size = os.path.getsize(path)
+        self.__stored.append(StoredFile(path, size, time.time()))
+        self.__stored_bytes += size
+
+    def __write_loop(self):
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            self.__load_existing_files()
+            self.__enforce_retention()
+        except OSError as e:
+            print(self.__name, ' evidence directory not available: ', e)
+
+        while True:
+            try:
+                item = self.__queue.get(timeout=RETENTION_INTERVAL)
+            except queue.Empty:
+                # idle camera - files still expire by age
+                self.__enforce_retention()
+                continue
+            if item is None:
+                break
+            try:
+                self.__write(item)
+                self.__enforce_retention()
+            except (cv2.error, OSError) as e:
+                self.__failed += 1
+                print(self.__name, ' evidence writer exception caught: ', e)
+
+    def statistics(self):
+        data = dict()
+        data['queue_depth'] = self.__queue.qsize()
+        data['written'] = self.__written
+        data['dropped'] = self.__dropped
+        data['failed'] = self.__failed
+        data['removed'] = self.__removed
+        data['stored_bytes'] = self.__stored_bytes
+        data['write_latency_last'] = self.__last_latency
+        data['write_latency_max'] = self.__max_latency
+        data['write_latency_avg'] = self.__total_latency / (self.__written + self.__failed) \
+            if self.__written + self.__failed else None
+        return data
@@ -0,0 +1,134 @@
+import os
+import time
+from collections import namedtuple, deque
+from threading import Thread, Condition
+
+from detector.StageTimings import STAGE_READ
+
+# trace_id - identifies the frame in end-to-end traces (see metrics.Tracing)
+CapturedFrame = namedtuple('CapturedFrame', 'sequence, timestamp, image, trace_id')
+# realtime_pacing - None paces only file sources, lossless - capture waits for consumer instead of overwriting frames
+CaptureConfiguration = namedtuple('CaptureConfiguration', 'slots, realtime_pacing, lossless', defaults=(1, None, False))
+
+
+class FrameGrabber:
+    """
+    Drains cv2.VideoCapture on its own thread into a small ring of frame slots.
+    Consumer always receives the newest frame - older, not consumed frames are dropped.
+    """
+
+    def __init__(self, cap, slots=1, pace_fps=None, lossless=False, timings=None):
+        self.__cap = cap
+        self.__lossless = lossless
+        self.__timings = timings
+        self.__slots = max(1, slots)
+        self.__pace_interval = 1.0 / pace_fps if pace_fps else None
+        self.__ready = deque()
+        self.__free_buffers = []
+        self.__buffer_in_use = None
+        self.__condition = Condition()
+        self.__thread = None
+        self.__running = False
+        self.__failed = False
+        self.__sequence = 0
+        # random prefix keeps trace ids unique across grabbers and restarts
+        self.__trace_prefix = os.urandom(4).hex() + '-'
+        self.__frames_read = 0
+        self.__frames_consumed = 0
+        self.__frames_overwritten = 0
+        self.__frames_dropped = 0
+
+    def is_running(self):
+        return self.__running
+
+    def has_failed(self):
+        return self.__failed
+
+    def start(self):
+        if self.__running:
+            return False
+        self.__running = True
+        self.__failed = False
+        self.__thread = Thread(target=self.__capture_loop, daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __capture_loop(self):
+        next_read = time.monotonic()
+        while self.__running:
+            if self.__pace_interval is not None:
+                delay = next_read - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_read += self.__pace_interval
+
+            with self.__condition:
+                if self.__lossless:
+                    self.__condition.wait_for(lambda: len(self.__ready) < self.__slots or not self.__running)
+                    if not self.__running:
+                        break
+                buffer = self.__free_buffers.pop() if self.__free_buffers else None
+
+            read_start = time.perf_counter()
+            status, image = self.__cap.read(image=buffer)
+            timestamp = time.time()
+            if self.__timings is not None:
+                self.__timings.record(STAGE_READ, time.perf_counter() - read_start)
+
+            with self.__condition:
+                if not status:
+                    print('Video capture.read() failed. Stopping capture thread')
+                    self.__failed = True
+                    self.__running = False
+                    self.__condition.notify_all()
+                    break
+
+                self.__sequence += 1
+                self.__frames_read += 1
+                if len(self.__ready) == self.__slots:
+                    overwritten = self.__ready.popleft()
+                    self.__free_buffers.append(overwritten.image)
+                    self.__frames_overwritten += 1
+                self.__ready.append(CapturedFrame(self.__sequence, timestamp, image,
+                                                  self.__trace_prefix + str(self.__sequence)))
+                self.__condition.notify_all()
+
+    def latest(self, timeout=None):
+        """
+        Returns newest CapturedFrame or None when timeout elapsed or capture stopped.
+        Returned image stays valid until next call of this method.
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__ready or not self.__running, timeout)
+            if not self.__ready:
+                return None
+
+            newest = self.__ready.pop()
+            while self.__ready:
+                self.__free_buffers.append(self.__ready.popleft().image)
+                self.__frames_dropped += 1
+
+            if self.__buffer_in_use is not None:
+                self.__free_buffers.append(self.__buffer_in_use)
+            self.__buffer_in_use = newest.image
+            self.__frames_consumed += 1
+            self.__condition.notify_all()
+            return newest
+
+    def statistics(self):
+        with self.__condition:
+            data = dict()
+            data['frames_read'] = self.__frames_read
+            data['frames_consumed'] = self.__frames_consumed
+            data['frames_overwritten'] = self.__frames_overwritten
+            data['frames_dropped'] = self.__frames_dropped
+            data['slots'] = self.__slots
+            return data
@@ -0,0 +1,102 @@
+import math
+import time
+from collections import namedtuple
+
+# target_cpu_share - fraction of one core recognition may use (lower bound for frame skip)
+# max_lag - upper bound of seconds between plate appearing and its frame being recognized
+# min_frame_skip, max_frame_skip - limits of controller output
+# active_hold - seconds for which every min_frame_skip frame is processed after lane became active
+SamplingConfiguration = namedtuple('SamplingConfiguration',
+                                   'target_cpu_share, max_lag, min_frame_skip, max_frame_skip, active_hold',
+                                   defaults=(0.5, 1.0, 1, 30, 2.0))
+
+SMOOTHING_FACTOR = 0.2
+
+
+def smooth(previous, sample):
+    return sample if previous is None else previous + SMOOTHING_FACTOR * (sample - previous)
+
+
+class FrameSampler:
+    """
+    Decides which captured frames are recognized. Frame skip N means that every Nth frame
+    read from the source is processed. Without sampling configuration N stays fixed,
+    otherwise it follows measured source FPS and recognition latency.
+    """
+
+    def __init__(self, frame_skip, config: SamplingConfiguration = None):
+        self.__config = config
+        self.__frame_skip = max(1, frame_skip)
+        self.__last_sequence = None
+        self.__last_capture = None
+        self.__last_sampled = None
+        self.__source_fps = None
+        self.__recognition_latency = None
+        self.__sample_interval = None
+        self.__active_until = None
+
+    def frame_skip(self):
+        return self.__frame_skip
+
+    def reset(self):
+        """ Forgets position in the stream - frame sequence of a new capture starts from the beginning. """
+        self.__last_sequence = None
+        self.__last_capture = None
+
+    def should_process(self, captured):
+        if self.__last_capture is not None and captured.sequence < self.__last_capture.sequence:
+            # sequence went back - frames come from a new stream
+            self.reset()
+        if self.__last_capture is not None:
+            sequence_delta = captured.sequence - self.__last_capture.sequence
+            time_delta = captured.timestamp - self.__last_capture.timestamp
+            if sequence_delta > 0 and time_delta > 0:
+                self.__source_fps = smooth(self.__source_fps, sequence_delta / time_delta)
+        self.__last_capture = captured
+
+        if self.__last_sequence is not None and captured.sequence - self.__last_sequence < self.__frame_skip:
+            return False
+
+        self.__last_sequence = captured.sequence
+        now = time.monotonic()
+        if self.__last_sampled is not None:
+            self.__sample_interval = smooth(self.__sample_interval, now - self.__last_sampled)
+        self.__last_sampled = now
+        return True
+
+    def mark_active(self, now=None):
+        if self.__config is None:
+            return
+        now = now if now is not None else time.monotonic()
+        self.__active_until = now + self.__config.active_hold
+        self.__adjust(now)
+
+    def record_recognition(self, latency, now=None):
+        self.__recognition_latency = smooth(self.__recognition_latency, latency)
+        if self.__config is not None:
+            self.__adjust(now if now is not None else time.monotonic())
+
+    def __adjust(self, now):
+        config = self.__config
+        if self.__active_until is not None and now < self.__active_until:
+            self.__frame_skip = config.min_frame_skip
+            return
+        if self.__source_fps is None or self.__recognition_latency is None:
+            return
+
+        # recognition of every Nth frame costs fps / N * latency of cpu time per second
+        frame_skip = math.ceil(self.__source_fps * self.__recognition_latency / config.target_cpu_share)
+        if config.max_lag:
+            # frame containing new plate waits up to N / fps before it is sampled
+            lag_limit = math.floor((config.max_lag - self.__recognition_latency) * self.__source_fps)
+            frame_skip = min(frame_skip, lag_limit)
+        self.__frame_skip = max(config.min_frame_skip, min(config.max_frame_skip, max(1, frame_skip)))
+
+    def statistics(self):
+        data = dict()
+        data['frame_skip'] = self.__frame_skip
+        data['adaptive'] = self.__config is not None
+        data['source_fps'] = self.__source_fps
+        data['recognition_latency'] = self.__recognition_latency
+        data['effective_sample_rate'] = 1.0 / self.__sample_interval if self.__sample_interval else None
+        return data
@@ -0,0 +1,70 @@
+import time
+from collections import namedtuple
+
+import cv2
+
+# sensitivity - per pixel intensity difference treated as motion (0-255)
+# min_area - fraction of downscaled frame that has to change to wake recognition
+# cooldown - seconds for which recognition stays awake after last detected motion
+# width - width of downscaled frame used for differencing
+MotionGateConfiguration = namedtuple('MotionGateConfiguration', 'sensitivity, min_area, cooldown, width',
+                                     defaults=(25, 0.01, 2.0, 160))
+
+
+class MotionGate:
+    """
+    Cheap pre-filter run before recognition. Compares downscaled, blurred grayscale frames
+    and lets frames through only when something moves in the view (or shortly after).
+    """
+
+    def __init__(self, config: MotionGateConfiguration):
+        self.__config = config
+        self.__previous = None
+        self.__last_motion = None
+        self.__frames_checked = 0
+        self.__frames_gated = 0
+
+    def __prepare(self, frame):
+        height, width = frame.shape[:2]
+        target_width = min(self.__config.width, width)
+        target_height = max(1, int(height * target_width / width))
+        small = cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def __has_motion(self, prepared):
+        if self.__previous is None or self.__previous.shape != prepared.shape:
+            return True
+        difference = cv2.absdiff(self.__previous, prepared)
+        _, mask = cv2.threshold(difference, self.__config.sensitivity, 255, cv2.THRESH_BINARY)
+        changed = cv2.countNonZero(mask)
+        return changed >= self.__config.min_area * mask.shape[0] * mask.shape[1]
+
+    def is_active(self, now=None):
+        now = now if now is not None else time.monotonic()
+        return self.__last_motion is not None and now - self.__last_motion <= self.__config.cooldown
+
+    def should_process(self, frame, now=None):
+        now = now if now is not None else time.monotonic()
+        prepared = self.__prepare(frame)
+        if self.__has_motion(prepared):
+            self.__last_motion = now
+        self.__previous = prepared
+        self.__frames_checked += 1
+
+        if self.is_active(now):
+            return True
+        self.__frames_gated += 1
+        return False
+
+    def reset(self):
+        self.__previous = None
+        self.__last_motion = None
+
+    def statistics(self):
+        data = dict()
+        data['frames_checked'] = self.__frames_checked
+        data['frames_gated'] = self.__frames_gated
+        data['gated_ratio'] = self.__frames_gated / self.__frames_checked if self.__frames_checked else 0.0
+        return data
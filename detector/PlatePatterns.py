@@ -0,0 +1,172 @@
+import os
+import re
+from collections import namedtuple
+from threading import Lock
+
+POSTPROCESS_DIRECTORY = 'postprocess'
+PATTERNS_EXTENSION = '.patterns'
+
+# forward every candidate (no filtering)
+PATTERN_FILTER_OFF = 'off'
+# candidates matching a pattern go first and the rest is dropped - unless nothing matches
+PATTERN_FILTER_PREFER = 'prefer'
+# plates without a candidate matching a pattern are dropped
+PATTERN_FILTER_STRICT = 'strict'
+
+PatternMatch = namedtuple('PatternMatch', 'country, rank')
+
+_matchers = dict()  # {patterns file: PatternMatcher or None}
+_matchers_lock = Lock()
+
+
+def pattern_to_regex(pattern):
+    """
+    Translates openalpr postprocess pattern: @ letter, # digit, ? any character, [..] single position
+    limited to listed characters.
+    """
+    parts = []
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        if '[' == character:
+            end = pattern.index(']', index)
+            parts.append('[' + ''.join(re.escape(allowed) if allowed != '-' else '-'
+                                       for allowed in pattern[index + 1:end]) + ']')
+            index = end + 1
+            continue
+        if '@' == character:
+            parts.append('[A-Z]')
+        elif '#' == character:
+            parts.append('[0-9]')
+        elif '?' == character:
+            parts.append('.')
+        else:
+            parts.append(re.escape(character))
+        index += 1
+    return ''.join(parts)
+
+
+def read_patterns(path):
+    """ Returns list of (country, pattern) pairs in file order - most likely pattern of a country first. """
+    patterns = []
+    with open(path) as patterns_file:
+        for line in patterns_file:
+            fields = line.split()
+            if len(fields) == 2:
+                patterns.append((fields[0], fields[1]))
+    return patterns
+
+
+def pattern_length(pattern):
+    """ Every pattern position stands for exactly one character. """
+    return len(re.sub(r'\[[^\]]*\]', '_', pattern))
+
+
+class PatternMatcher:
+    """
+    Patterns of a region compiled into one regular expression per plate length - one named alternative
+    per pattern, so a single match tells both whether candidate is valid and which country pattern
+    it matched. Alternatives keep file order, so the most likely pattern wins.
+    """
+
+    def __init__(self, patterns):
+        self.__countries = []
+        alternatives = dict()  # {plate length: list of named alternatives}
+        for rank, (country, pattern) in enumerate(patterns):
+            alternatives.setdefault(pattern_length(pattern), []).append(
+                '(?P<p' + str(rank) + '>' + pattern_to_regex(pattern) + ')')
+            self.__countries.append(country)
+        self.__regexes = {length: re.compile('|'.join(group)) for length, group in alternatives.items()}
+
+    def __len__(self):
+        return len(self.__countries)
+
+    def match(self, plate):
+        """ Returns PatternMatch of the most likely pattern matching plate or None. """
+        regex = self.__regexes.get(len(plate))
+        match = regex.fullmatch(plate) if regex is not None else None
+        if match is None:
+            return None
+        rank = int(match.lastgroup[1:])
+        return PatternMatch(self.__countries[rank], rank)
+
+    def match_candidates(self, candidates):
+        """ Returns list with PatternMatch or None for every [plate, confidence] candidate. """
+        return [self.match(plate) for plate, _ in candidates]
+
+    def filter_candidates(self, candidates, mode=PATTERN_FILTER_PREFER):
+        """
+        Returns candidates matching a pattern ordered by confidence. When none matches, prefer mode keeps
+        all candidates and strict mode returns empty list.
+        """
+        if PATTERN_FILTER_OFF == mode or not candidates:
+            return candidates
+        valid = [candidate for candidate in candidates if self.match(candidate[0]) is not None]
+        if not valid:
+            return [] if PATTERN_FILTER_STRICT == mode else candidates
+        return sorted(valid, key=lambda candidate: candidate[1], reverse=True)
+
+
+def patterns_file(runtime_data_directory, region):
+    return os.path.join(runtime_data_directory, POSTPROCESS_DIRECTORY, region + PATTERNS_EXTENSION)
+
+
+def matcher_for(runtime_data_directory, region):
+    """ Compiles patterns of the region on first use and shares the matcher. None when there are no patterns. """
+    path = os.path.abspath(patterns_file(runtime_data_directory, region))
+    with _matchers_lock:
+        if path not in _matchers:
+            patterns = read_patterns(path) if os.path.isfile(path) else []
+            _matchers[path] = PatternMatcher(patterns) if patterns else None
+            print('plate patterns loaded for ', region, ': ', len(patterns))
+        return _matchers[path]
+
+
+def main():
+    """ Compares combined matcher with matching patterns one by one. """
+    import argparse
+    import json
+    import random
+    import string
+    import time
+
+    parser = argparse.ArgumentParser(description='Benchmarks compiled postprocess pattern matcher.')
+    parser.add_argument('--runtime-data', default='resources/runtime_data')
+    parser.add_argument('--region', default='eu')
+    parser.add_argument('--plates', type=int, default=2000)
+    parser.add_argument('--candidates', type=int, default=10)
+    arguments = parser.parse_args()
+
+    patterns = read_patterns(patterns_file(arguments.runtime_data, arguments.region))
+    start = time.perf_counter()
+    matcher = PatternMatcher(patterns)
+    compile_time = time.perf_counter() - start
+    single = [(country, re.compile(pattern_to_regex(pattern))) for country, pattern in patterns]
+
+    alphabet = string.ascii_uppercase + string.digits
+    plates = [[[''.join(random.choice(alphabet) for _ in range(random.randint(5, 8))), 90.0 - index]
+               for index in range(arguments.candidates)] for _ in range(arguments.plates)]
+
+    start = time.perf_counter()
+    per_pattern = [[next((country for country, regex in single if regex.fullmatch(plate)), None)
+                    for plate, _ in candidates] for candidates in plates]
+    per_pattern_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = [[match.country if match else None for match in matcher.match_candidates(candidates)]
+                for candidates in plates]
+    combined_time = time.perf_counter() - start
+
+    report = dict()
+    report['patterns'] = len(matcher)
+    report['compile_ms'] = compile_time * 1000
+    report['candidates'] = arguments.plates * arguments.candidates
+    report['matching'] = sum(country is not None for countries in combined for country in countries)
+    report['results_equal'] = per_pattern == combined
+    report['per_pattern_us_per_plate'] = per_pattern_time / arguments.plates * 1e6
+    report['combined_us_per_plate'] = combined_time / arguments.plates * 1e6
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import time
+from collections import namedtuple
+
+# min_overlap - IoU of plate boxes required to assign observation to existing track
+# track_timeout - seconds without observation after which vehicle pass is finished
+# min_observations - observations after which consolidated event is emitted without waiting for pass end
+# repeat_window - seconds during which the same consolidated plate is not emitted again
+TrackerConfiguration = namedtuple('TrackerConfiguration',
+                                  'min_overlap, track_timeout, min_observations, repeat_window',
+                                  defaults=(0.3, 1.5, 3, 10.0))
+
+# candidates - list of [plate, confidence] pairs, coordinates - list of {'x', 'y'} points
+PlateObservation = namedtuple('PlateObservation', 'candidates, coordinates')
+# trace_id and captured - trace id and capture time of the first frame of the track, observed - capture time of the last
+TrackEvent = namedtuple('TrackEvent', 'plate, candidates, coordinates, observations, first_seen, last_seen, snapshot, '
+                                      'trace_id, captured, observed',
+                        defaults=(None, None, None))
+
+MAX_EVENT_CANDIDATES = 10
+
+
+def bounding_box(coordinates):
+    if not coordinates:
+        return None
+    xs = [point['x'] for point in coordinates]
+    ys = [point['y'] for point in coordinates]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def overlap(first, second):
+    if first is None or second is None:
+        return 0.0
+    width = min(first[2], second[2]) - max(first[0], second[0])
+    height = min(first[3], second[3]) - max(first[1], second[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (first[2] - first[0]) * (first[3] - first[1]) + (second[2] - second[0]) * (second[3] - second[1]) \
+        - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class PlateTrack:
+    def __init__(self, observation, now):
+        self.box = bounding_box(observation.coordinates)
+        self.coordinates = observation.coordinates
+        self.first_seen = now
+        self.last_seen = now
+        self.observations = 0
+        self.emitted = False
+        self.snapshot = None
+        self.trace_id = None
+        self.captured = None
+        self.observed = None
+        self.__best_confidence = -1.0
+        self.__votes = dict()  # {plate length: [{character: accumulated confidence}, ...]}
+        self.__candidate_scores = dict()
+
+    def add(self, observation, now, snapshot=None, frame=None):
+        self.observations += 1
+        self.last_seen = now
+        if frame is not None:
+            if self.trace_id is None:
+                self.trace_id = frame.trace_id
+                self.captured = frame.timestamp
+            self.observed = frame.timestamp
+        if observation.coordinates:
+            self.box = bounding_box(observation.coordinates)
+            self.coordinates = observation.coordinates
+
+        for plate, confidence in observation.candidates:
+            self.__candidate_scores[plate] = self.__candidate_scores.get(plate, 0.0) + confidence
+            positions = self.__votes.setdefault(len(plate), [dict() for _ in plate])
+            for position, character in enumerate(plate):
+                positions[position][character] = positions[position].get(character, 0.0) + confidence
+
+        top_confidence = observation.candidates[0][1] if observation.candidates else 0.0
+        if snapshot is not None and top_confidence > self.__best_confidence:
+            self.__best_confidence = top_confidence
+            self.snapshot = snapshot()
+
+    def matches_plate(self, observation):
+        plates = set(plate for plate, _ in observation.candidates)
+        return any(plate in self.__candidate_scores for plate in plates)
+
+    def consolidate(self):
+        if not self.__votes:
+            return None, []
+        # plate length with the highest accumulated support wins
+        positions = max(self.__votes.values(), key=lambda votes: sum(sum(v.values()) for v in votes))
+        characters = []
+        confidences = []
+        for votes in positions:
+            character, score = max(votes.items(), key=lambda item: item[1])
+            characters.append(character)
+            confidences.append(100.0 * score / sum(votes.values()))
+        plate = ''.join(characters)
+
+        ranked = sorted(self.__candidate_scores.items(), key=lambda item: item[1], reverse=True)
+        candidates = [[plate, sum(confidences) / len(confidences)]]
+        for candidate, score in ranked:
+            if len(candidates) >= MAX_EVENT_CANDIDATES:
+                break
+            if candidate != plate:
+                candidates.append([candidate, score / self.observations])
+        return plate, candidates
+
+
+class PlateTracker:
+    """
+    Groups plate observations from consecutive frames into tracks by plate box overlap,
+    accumulates per character confidence votes and emits single consolidated event per vehicle pass.
+    """
+
+    def __init__(self, config: TrackerConfiguration = None):
+        self.__config = config if config else TrackerConfiguration()
+        self.__tracks = []
+        self.__recent_plates = dict()  # {plate: time of last emission}
+        self.__events_emitted = 0
+        self.__events_suppressed = 0
+        self.__observations = 0
+
+    def __find_track(self, observation):
+        box = bounding_box(observation.coordinates)
+        best_track, best_overlap = None, 0.0
+        for track in self.__tracks:
+            track_overlap = overlap(track.box, box)
+            if track_overlap > best_overlap:
+                best_track, best_overlap = track, track_overlap
+        if best_overlap >= self.__config.min_overlap:
+            return best_track
+        # plate boxes may be missing or jump between frames - fall back to candidate match
+        for track in self.__tracks:
+            if track.matches_plate(observation):
+                return track
+        return None
+
+    def __emit(self, track, now):
+        track.emitted = True
+        plate, candidates = track.consolidate()
+        if plate is None:
+            return None
+
+        for recent_plate, emitted_at in list(self.__recent_plates.items()):
+            if now - emitted_at > self.__config.repeat_window:
+                del self.__recent_plates[recent_plate]
+        if plate in self.__recent_plates:
+            self.__events_suppressed += 1
+            return None
+
+        self.__recent_plates[plate] = now
+        self.__events_emitted += 1
+        return TrackEvent(plate, candidates, track.coordinates, track.observations, track.first_seen,
+                          track.last_seen, track.snapshot, track.trace_id, track.captured, track.observed)
+
+    def update(self, observations, now=None, snapshot=None, frame=None):
+        """
+        Adds plate observations found in a single frame. Returns list of TrackEvents ready to be sent.
+        snapshot is an optional callable returning image stored along the best observation of a track.
+        frame is an optional CapturedFrame of the observations - its trace id and capture time end up in events.
+        """
+        now = now if now is not None else time.monotonic()
+        events = self.expire(now)
+        for observation in observations or []:
+            if not observation.candidates:
+                continue
+            self.__observations += 1
+            track = self.__find_track(observation)
+            if track is None:
+                track = PlateTrack(observation, now)
+                self.__tracks.append(track)
+            track.add(observation, now, snapshot, frame)
+            if not track.emitted and track.observations >= self.__config.min_observations:
+                event = self.__emit(track, now)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def expire(self, now=None):
+        """
+        Finishes tracks which were not observed for track_timeout seconds.
+        Tracks finished before reaching min_observations are emitted at that point.
+        """
+        now = now if now is not None else time.monotonic()
+        events = []
+        active_tracks = []
+        for track in self.__tracks:
+            if now - track.last_seen <= self.__config.track_timeout:
+                active_tracks.append(track)
+            elif not track.emitted:
+                event = self.__emit(track, now)
+                if event is not None:
+                    events.append(event)
+        self.__tracks = active_tracks
+        return events
+
+    def flush(self):
+        """ Finishes all tracks, e.g. when video source ended. """
+        return self.expire(float('inf'))
+
+    def statistics(self):
+        data = dict()
+        data['active_tracks'] = len(self.__tracks)
+        data['observations'] = self.__observations
+        data['events_emitted'] = self.__events_emitted
+        data['events_suppressed'] = self.__events_suppressed
+        return data
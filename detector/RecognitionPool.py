@@ -0,0 +1,254 @@
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from collections import namedtuple
+from threading import Thread, Lock
+
+from detector.SharedFrameRing import SharedFrameRing
+
+# frame is sent through the queue only when it does not fit shared memory slot - otherwise slot references it
+RecognitionRequest = namedtuple('RecognitionRequest', 'client, request_id, frame, slot')
+RecognitionResponse = namedtuple('RecognitionResponse', 'client, request_id, result')
+
+RECOGNITION_PATH_POOL = 'pool'
+DEFAULT_RESPONSE_TIMEOUT = 10.0
+DISPATCH_WAIT_TIMEOUT = 1.0
+DISPATCH_RETRY_DELAY = 0.001
+DISPATCH_MAX_RETRY_DELAY = 0.1
+FRAME_RING_SLOTS = 2
+FRAME_RING_CAPACITY = 1920 * 1080 * 3
+
+
+def recognize_shared_frame(recognizer, rings, slot):
+    ring = rings.get(slot.ring)
+    if ring is None:
+        ring = SharedFrameRing.attach(slot.ring)
+        rings[slot.ring] = ring
+    frame = ring.read(slot.slot, slot.version)
+    if frame is None:
+        print('shared frame was overwritten before recognition')
+        return None
+    result = recognizer.recognize(frame.image)
+    # result of frame overwritten during recognition cannot be trusted
+    return result if ring.is_valid(slot.slot, slot.version) else None
+
+
+def recognition_worker(config, work_queue, result_queue):
+    from detector.Recognizer import AlprRecognizer
+    recognizer = AlprRecognizer(config)
+    rings = dict()  # {shared memory name: attached SharedFrameRing}
+    print('recognition worker ', os.getpid(), ' ready using ', recognizer.recognition_path(), ' recognition path')
+    try:
+        while True:
+            request = work_queue.get()
+            if request is None:
+                break
+            try:
+                if request.slot is not None:
+                    result = recognize_shared_frame(recognizer, rings, request.slot)
+                else:
+                    result = recognizer.recognize(request.frame)
+            except FileNotFoundError:
+                # ring of unregistered client was removed
+                if request.slot is not None:
+                    rings.pop(request.slot.ring, None)
+                result = None
+            except Exception as e:
+                print('Recognition worker exception caught: ', e)
+                result = None
+            result_queue.put(RecognitionResponse(request.client, request.request_id, result))
+    finally:
+        recognizer.unload()
+        for ring in rings.values():
+            ring.close()
+
+
+class PooledRecognizer:
+    """
+    Recognizer handed to capture processes. Frames are submitted to RecognitionPool
+    and the call blocks until one of the pool workers returns the result.
+    """
+
+    def __init__(self, name, request_queue, response_queue, pending, ring_name=None,
+                 timeout=DEFAULT_RESPONSE_TIMEOUT):
+        self.__name = name
+        self.__ring_name = ring_name
+        self.__ring = None
+        self.__request_queue = request_queue
+        self.__response_queue = response_queue
+        self.__pending = pending
+        self.__timeout = timeout
+        self.__request_id = 0
+
+    def recognition_path(self):
+        return RECOGNITION_PATH_POOL
+
+    def is_loaded(self):
+        return True
+
+    def __to_shared_memory(self, frame):
+        if self.__ring_name is None:
+            return None
+        if self.__ring is None:
+            # attached lazily - in the capture process, not where the recognizer was created
+            self.__ring = SharedFrameRing.attach(self.__ring_name)
+        if not self.__ring.fits(frame):
+            return None
+        # frame is copied into the slot once here - capture cannot read into ring slots directly:
+        # grabber reads every source frame into its own reused buffers while only sampled frames are
+        # recognized, and detection region hands over a cropped copy rather than the captured buffer.
+        # Reading into slots would cycle the ring at source fps and overwrite frames workers still use.
+        return self.__ring.write(self.__name, self.__request_id, time.time(), frame)
+
+    def recognize(self, frame):
+        self.__request_id += 1
+        slot = self.__to_shared_memory(frame)
+        request = RecognitionRequest(self.__name, self.__request_id, None if slot else frame, slot)
+        self.__request_queue.put(request)
+        self.__pending.release()
+        try:
+            while True:
+                response = self.__response_queue.get(timeout=self.__timeout)
+                # responses to requests which timed out earlier are discarded
+                if response.request_id == self.__request_id:
+                    return response.result
+        except queue.Empty:
+            print(self.__name, ' recognition request timed out')
+            return None
+
+    def unload(self):
+        if self.__ring is not None:
+            self.__ring.close()
+            self.__ring = None
+
+    def __getstate__(self):
+        # attached shared memory is not inherited - capture process attaches on first frame
+        state = self.__dict__.copy()
+        state['_PooledRecognizer__ring'] = None
+        return state
+
+
+class RecognitionPool:
+    """
+    Fixed set of worker processes, each holding one loaded Alpr instance, shared by all cameras.
+    Requests are taken from per-camera queues in round robin order so a busy camera cannot starve others.
+    """
+
+    def __init__(self, config, workers=None):
+        self.__config = config
+        self.__worker_count = workers if workers else os.cpu_count()
+        # bounded to worker count - backlog stays in per-client queues where fair scheduling applies
+        self.__work_queue = multiprocessing.Queue(maxsize=self.__worker_count)
+        self.__result_queue = multiprocessing.Queue()
+        self.__pending = multiprocessing.Semaphore(0)
+        self.__clients = dict()  # {name: (request queue, response queue)}
+        self.__rings = dict()  # {name: SharedFrameRing owned by the pool}
+        self.__clients_lock = Lock()
+        self.__workers = []
+        self.__threads = []
+        self.__running = False
+        self.__next_client = 0
+        self.__served = dict()
+
+    def register(self, name) -> PooledRecognizer:
+        with self.__clients_lock:
+            if name not in self.__clients:
+                self.__clients[name] = (multiprocessing.Queue(), multiprocessing.Queue())
+                self.__rings[name] = SharedFrameRing.create('alpr_' + uuid.uuid4().hex[:16], FRAME_RING_SLOTS,
+                                                            FRAME_RING_CAPACITY)
+                self.__served[name] = 0
+            request_queue, response_queue = self.__clients[name]
+            ring_name = self.__rings[name].name()
+        return PooledRecognizer(name, request_queue, response_queue, self.__pending, ring_name)
+
+    def unregister(self, name):
+        with self.__clients_lock:
+            self.__clients.pop(name, None)
+            self.__served.pop(name, None)
+            ring = self.__rings.pop(name, None)
+        if ring is not None:
+            ring.close()
+
+    def start(self):
+        if self.__running:
+            return False
+        self.__running = True
+        for _ in range(self.__worker_count):
+            worker = multiprocessing.Process(target=recognition_worker,
+                                             args=(self.__config, self.__work_queue, self.__result_queue),
+                                             daemon=True)
+            worker.start()
+            self.__workers.append(worker)
+        self.__threads = [Thread(target=self.__dispatch_loop, daemon=True),
+                          Thread(target=self.__route_loop, daemon=True)]
+        for thread in self.__threads:
+            thread.start()
+        print('recognition pool started with ', self.__worker_count, ' workers')
+        return True
+
+    def stop(self):
+        if not self.__running:
+            return
+        self.__running = False
+        self.__pending.release()
+        self.__result_queue.put(None)
+        for thread in self.__threads:
+            thread.join()
+        for _ in self.__workers:
+            self.__work_queue.put(None)
+        for worker in self.__workers:
+            worker.join()
+        self.__workers = []
+        for name in list(self.__rings.keys()):
+            self.unregister(name)
+
+    def __next_request(self):
+        with self.__clients_lock:
+            names = list(self.__clients.keys())
+            queues = [self.__clients[name][0] for name in names]
+        for offset in range(len(names)):
+            index = (self.__next_client + offset) % len(names)
+            try:
+                request = queues[index].get_nowait()
+            except queue.Empty:
+                continue
+            self.__next_client = index + 1
+            return request
+        return None
+
+    def __dispatch_loop(self):
+        while self.__running:
+            if not self.__pending.acquire(timeout=DISPATCH_WAIT_TIMEOUT):
+                continue
+            # queue feeder thread of the client may not have flushed the request yet - the permit is kept
+            # until a request arrives, giving it up would leave the request waiting for an unrelated one
+            delay = DISPATCH_RETRY_DELAY
+            while self.__running:
+                request = self.__next_request()
+                if request is not None:
+                    self.__work_queue.put(request)
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, DISPATCH_MAX_RETRY_DELAY)
+
+    def __route_loop(self):
+        while self.__running:
+            response = self.__result_queue.get()
+            if response is None:
+                break
+            with self.__clients_lock:
+                client = self.__clients.get(response.client)
+                if client is not None:
+                    self.__served[response.client] += 1
+            if client is not None:
+                client[1].put(response)
+
+    def statistics(self):
+        with self.__clients_lock:
+            data = dict()
+            data['workers'] = len(self.__workers)
+            data['clients'] = len(self.__clients)
+            data['served'] = dict(self.__served)
+            return data
@@ -0,0 +1,85 @@
+import time
+
+import cv2
+
+try:
+    from openalpr import Alpr
+except ImportError:
+    Alpr = None
+
+RECOGNITION_PATH_NDARRAY = 'ndarray'
+RECOGNITION_PATH_ENCODED = 'encoded'
+RECOGNITION_PATH_STUB = 'stub'
+
+
+class AlprRecognizer:
+    """
+    Owns loaded Alpr instance and passes frames to it using the fastest path supported by the binding.
+    """
+
+    def __init__(self, config):
+        if Alpr is None:
+            raise RuntimeError('openalpr python bindings are not installed')
+        self.__alpr_instance = Alpr(config.region, config.config_file, config.runtime_data_file)
+        if not self.__alpr_instance.is_loaded():
+            print('Alpr instance could not be created')
+        self.__recognition_path = self.__select_recognition_path(self.__alpr_instance)
+
+    @staticmethod
+    def __select_recognition_path(alpr_instance):
+        # recognize_ndarray is available in python bindings starting from openalpr 2.3.1
+        if callable(getattr(alpr_instance, 'recognize_ndarray', None)):
+            return RECOGNITION_PATH_NDARRAY
+        return RECOGNITION_PATH_ENCODED
+
+    def recognition_path(self):
+        return self.__recognition_path
+
+    def is_loaded(self):
+        return self.__alpr_instance.is_loaded()
+
+    def recognize(self, frame):
+        if RECOGNITION_PATH_NDARRAY == self.__recognition_path:
+            return self.__alpr_instance.recognize_ndarray(frame)
+
+        # fallback for older bindings - single copy of encoded image
+        ret, enc = cv2.imencode('.bmp', frame)
+        if not ret:
+            return None
+        return self.__alpr_instance.recognize_array(enc.tobytes())
+
+    def unload(self):
+        self.__alpr_instance.unload()
+
+
+class StubRecognizer:
+    """
+    Stand-in for AlprRecognizer on machines without OpenALPR. Sleeps for given latency
+    and reports the same plate (or nothing) for every frame.
+    """
+
+    def __init__(self, latency=0.0, plate=None, confidence=90.0):
+        self.__latency = latency
+        self.__plate = plate
+        self.__confidence = confidence
+
+    def recognition_path(self):
+        return RECOGNITION_PATH_STUB
+
+    def is_loaded(self):
+        return True
+
+    def recognize(self, frame):
+        if self.__latency:
+            time.sleep(self.__latency)
+        if self.__plate is None:
+            return {'results': []}
+        height, width = frame.shape[:2]
+        coordinates = [{'x': width // 3, 'y': height // 2}, {'x': 2 * width // 3, 'y': height // 2},
+                       {'x': 2 * width // 3, 'y': height // 2 + height // 10},
+                       {'x': width // 3, 'y': height // 2 + height // 10}]
+        return {'results': [{'plate': self.__plate, 'confidence': self.__confidence, 'coordinates': coordinates,
+                             'candidates': [{'plate': self.__plate, 'confidence': self.__confidence}]}]}
+
+    def unload(self):
+        pass
@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import subprocess
+import time
+
+import cv2
+
+from detector.AlprDetector import AlprDetector, AlprConfiguration
+from detector.FrameGrabber import CaptureConfiguration
+from detector.PlatePatterns import PATTERN_FILTER_OFF, PATTERN_FILTER_PREFER, PATTERN_FILTER_STRICT
+from detector.Recognizer import StubRecognizer
+from detector.StageTimings import StageTimings
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def replay(video_file, alpr_configuration, realtime, recognizer_factory):
+    """
+    Runs single pass of video file through AlprDetector and returns measured statistics.
+    Full speed replay is lossless - every frame is read and passed to the sampler.
+    """
+    timings = StageTimings()
+    detections = []
+    capture = CaptureConfiguration(slots=1, realtime_pacing=realtime, lossless=not realtime)
+    detector = AlprDetector('benchmark', alpr_configuration, video_file, event_callback=detections.append,
+                            capture=capture, recognizer=recognizer_factory(), timings=timings)
+
+    start = time.perf_counter()
+    detector.run()
+    duration = time.perf_counter() - start
+    detector.close()
+
+    status = detector.status()
+    result = dict()
+    result['video'] = video_file
+    result['duration'] = duration
+    result['frames_read'] = status['frames_read']
+    result['frames_processed'] = timings.summary().get('recognize', {}).get('count', 0)
+    result['frames_per_second'] = status['frames_read'] / duration if duration > 0 else None
+    result['detections'] = len(detections)
+    result['plates'] = [detection['candidates'][0][0] for detection in detections]
+    result['stages'] = timings.summary()
+    result['capture'] = {key: status[key] for key in ('frames_read', 'frames_consumed', 'frames_overwritten',
+                                                      'frames_dropped')}
+    return result
+
+
+def run_benchmark(video_files, alpr_configuration, passes=1, realtime=False, recognizer_factory=None):
+    runs = []
+    for video_file in video_files:
+        for pass_number in range(passes):
+            print('benchmark pass ', pass_number + 1, '/', passes, ' of ', video_file)
+            result = replay(video_file, alpr_configuration, realtime, recognizer_factory)
+            result['pass'] = pass_number + 1
+            runs.append(result)
+
+    report = dict()
+    report['commit'] = current_commit()
+    report['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    report['opencv'] = cv2.__version__
+    report['realtime'] = realtime
+    report['passes'] = passes
+    report['runs'] = runs
+    return report
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Replays video files through AlprDetector and measures throughput')
+    parser.add_argument('videos', nargs='+', help='video files to replay')
+    parser.add_argument('--passes', type=int, default=1, help='number of passes per video file')
+    parser.add_argument('--realtime', action='store_true', help='pace reading at video FPS instead of full speed')
+    parser.add_argument('--frame-skip', type=int, default=1, help='process every Nth frame')
+    parser.add_argument('--region', default='eu')
+    parser.add_argument('--config-file', default='resources/openalpr.conf')
+    parser.add_argument('--runtime-data', default='resources/runtime_data')
+    parser.add_argument('--pattern-filter', default=PATTERN_FILTER_PREFER,
+                        choices=(PATTERN_FILTER_OFF, PATTERN_FILTER_PREFER, PATTERN_FILTER_STRICT),
+                        help='how candidates are checked against postprocess patterns')
+    parser.add_argument('--stub', action='store_true', help='use stub recognizer instead of OpenALPR')
+    parser.add_argument('--stub-latency', type=float, default=0.0, help='seconds spent by stub per frame')
+    parser.add_argument('--stub-plate', default=None, help='plate reported by stub for every frame')
+    parser.add_argument('--output', default=None, help='JSON file for results, printed when not given')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    alpr_configuration = AlprConfiguration(arguments.region, arguments.config_file, arguments.runtime_data,
+                                           arguments.frame_skip, pattern_filter=arguments.pattern_filter)
+    if arguments.stub:
+        def recognizer_factory():
+            return StubRecognizer(arguments.stub_latency, arguments.stub_plate)
+    else:
+        # None makes AlprDetector load its own Alpr instance for every pass
+        def recognizer_factory():
+            return None
+
+    report = run_benchmark(arguments.videos, alpr_configuration, arguments.passes, arguments.realtime,
+                           recognizer_factory)
+    report_json = json.dumps(report, indent=2)
+    if arguments.output:
+        os.makedirs(os.path.dirname(os.path.abspath(arguments.output)), exist_ok=True)
+        with open(arguments.output, 'w') as output:
+            output.write(report_json)
+        print('benchmark results written to ', arguments.output)
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    main()
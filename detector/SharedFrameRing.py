@@ -0,0 +1,111 @@
+import struct
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy
+
+# ring header: slot count, frame capacity of a slot in bytes
+RING_HEADER = struct.Struct('<II')
+# slot header: seqlock version, frame sequence, capture timestamp, device id, height, width, channels
+SLOT_HEADER = struct.Struct('<QQd32sIII')
+DEVICE_ID_LENGTH = 32
+
+FrameView = namedtuple('FrameView', 'device_id, sequence, timestamp, image')
+SlotReference = namedtuple('SlotReference', 'ring, slot, version')
+
+
+class SharedFrameRing:
+    """
+    Ring of frame slots in multiprocessing.shared_memory with a single producer.
+    Every slot is guarded by a seqlock version: odd while producer writes, even once the frame is complete.
+    Consumers get ndarray views without copying and validate the version again after using the frame,
+    so frame left half written by terminated producer is never accepted.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner):
+        self.__memory = memory
+        self.__owner = owner
+        self.__slots, self.__capacity = RING_HEADER.unpack_from(memory.buf, 0)
+        self.__slot_size = SLOT_HEADER.size + self.__capacity
+        self.__next_slot = 0
+
+    @classmethod
+    def create(cls, name, slots, capacity):
+        memory = shared_memory.SharedMemory(name=name, create=True,
+                                            size=RING_HEADER.size + slots * (SLOT_HEADER.size + capacity))
+        RING_HEADER.pack_into(memory.buf, 0, slots, capacity)
+        for slot in range(slots):
+            SLOT_HEADER.pack_into(memory.buf, RING_HEADER.size + slot * (SLOT_HEADER.size + capacity),
+                                  0, 0, 0.0, b'', 0, 0, 0)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        memory = shared_memory.SharedMemory(name=name)
+        # only the creator unlinks the segment - attaching process must not be tracked as its owner
+        resource_tracker.unregister(memory._name, 'shared_memory')
+        return cls(memory, owner=False)
+
+    def name(self):
+        return self.__memory.name
+
+    def capacity(self):
+        return self.__capacity
+
+    def __slot_offset(self, slot):
+        return RING_HEADER.size + slot * self.__slot_size
+
+    def __version(self, slot):
+        return struct.unpack_from('<Q', self.__memory.buf, self.__slot_offset(slot))[0]
+
+    def __set_version(self, slot, version):
+        struct.pack_into('<Q', self.__memory.buf, self.__slot_offset(slot), version)
+
+    def fits(self, frame):
+        return frame.dtype == numpy.uint8 and frame.nbytes <= self.__capacity
+
+    def write(self, device_id, sequence, timestamp, frame):
+        """
+        Copies frame into the next slot and returns SlotReference of complete frame.
+        Slots are reused in round robin order, so they are filled only with frames sent for recognition.
+        """
+        slot = self.__next_slot
+        self.__next_slot = (slot + 1) % self.__slots
+        offset = self.__slot_offset(slot)
+
+        current = self.__version(slot)
+        # version left odd by terminated producer is moved past as well
+        writing = current + 1 if current % 2 == 0 else current + 2
+        self.__set_version(slot, writing)
+
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        SLOT_HEADER.pack_into(self.__memory.buf, offset, writing, sequence, timestamp,
+                              device_id.encode()[:DEVICE_ID_LENGTH], height, width, channels)
+        data = numpy.ndarray(frame.shape, dtype=numpy.uint8, buffer=self.__memory.buf,
+                             offset=offset + SLOT_HEADER.size)
+        data[...] = frame
+
+        complete = writing + 1
+        self.__set_version(slot, complete)
+        return SlotReference(self.name(), slot, complete)
+
+    def read(self, slot, version):
+        """ Returns FrameView backed by shared memory or None when slot does not hold expected frame. """
+        offset = self.__slot_offset(slot)
+        current, sequence, timestamp, device_id, height, width, channels = \
+            SLOT_HEADER.unpack_from(self.__memory.buf, offset)
+        if current != version:
+            return None
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        image = numpy.ndarray(shape, dtype=numpy.uint8, buffer=self.__memory.buf, offset=offset + SLOT_HEADER.size)
+        return FrameView(device_id.rstrip(b'\0').decode(), sequence, timestamp, image)
+
+    def is_valid(self, slot, version):
+        """ Checks that frame read earlier was not overwritten while it was used. """
+        return self.__version(slot) == version
+
+    def close(self):
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
@@ -0,0 +1,46 @@
+import math
+from collections import defaultdict
+
+STAGE_READ = 'read'
+STAGE_PREPROCESS = 'preprocess'
+STAGE_RECOGNIZE = 'recognize'
+STAGE_CALLBACK = 'callback'
+
+STAGES = (STAGE_READ, STAGE_PREPROCESS, STAGE_RECOGNIZE, STAGE_CALLBACK)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class StageTimings:
+    """
+    Keeps every duration recorded per detector stage. Meant for benchmarks and offline analysis -
+    memory grows with number of processed frames.
+    """
+
+    def __init__(self):
+        self.__samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        self.__samples[stage].append(seconds)
+
+    def samples(self, stage):
+        return list(self.__samples.get(stage, []))
+
+    def summary(self):
+        data = dict()
+        for stage, samples in self.__samples.items():
+            ordered = sorted(samples)
+            data[stage] = {
+                'count': len(ordered),
+                'mean': sum(ordered) / len(ordered),
+                'p50': percentile(ordered, 0.50),
+                'p90': percentile(ordered, 0.90),
+                'p99': percentile(ordered, 0.99),
+                'max': ordered[-1],
+            }
+        return data
@@ -10,6 +10,7 @@ from detector.DetectorManager import DetectorProcessArguments, AlprDetectorArgs,
     CommunicationConfiguration, start_detector_process
 from detector.DetectorStates import DetectorState
 from ipc_communication.Client import Client
+from ipc_communication.Codec import CODECS
 from ipc_communication.default_configuration import DEFAULT_DETECTOR_SERVER_PORT
 
 
@@ -67,14 +68,23 @@ class BaseDevice(ABC):
 
 
 class LocalDevice(BaseDevice):
+    """
+    Detector running in local process. Motion gate and detection region are set only at runtime -
+    update sends them in ConfigurationRequest and the device keeps the applied values,
+    so detector process started again after stop gets the same settings.
+    """
+
     def __init__(self, name: str, video_source: str, communication_config: CommunicationConfiguration, role: DeviceRole,
-                 capture_images) -> None:
+                 capture_images, recognition_pool=None) -> None:
         super().__init__(name, communication_config.command_listener.address,
                          communication_config.command_listener.port, video_source, role, capture_images)
         self.__process = None
         self.__communication_config = communication_config
-        self.__command_sender = Client()
+        self.__command_sender = Client(codec=CODECS[communication_config.codec])
         self.capture_images = capture_images
+        self.motion_gate = None
+        self.detection_region = None
+        self.__recognition_pool = recognition_pool
 
     def get_device_type(self) -> DeviceLocation:
         return DeviceLocation.LOCAL
@@ -82,8 +92,11 @@ class LocalDevice(BaseDevice):
     def __start_detector(self):
         alpr_configuration = AlprConfiguration('eu', 'resources/openalpr.conf', 'resources/runtime_data', FRAME_SKIP)
         detector_arguments = AlprDetectorArgs(self.id, alpr_configuration, self.video_source, self.capture_images,
-                                              self.role.name)
-        new_process_args = DetectorProcessArguments(self.id, detector_arguments, self.__communication_config)
+                                              self.role.name, self.motion_gate, self.detection_region)
+        # with shared pool the detector process only captures frames - recognition happens in pool workers
+        recognizer = self.__recognition_pool.register(self.id) if self.__recognition_pool else None
+        new_process_args = DetectorProcessArguments(self.id, detector_arguments, self.__communication_config,
+                                                    recognizer)
 
         print('Starting new process with config:\n', new_process_args)
         self.__process = Process(target=start_detector_process, args=(new_process_args,))
@@ -109,6 +122,8 @@ class LocalDevice(BaseDevice):
             if self.__process.is_alive():
                 self.__process.terminate()
                 self.__process.join()
+            if self.__recognition_pool:
+                self.__recognition_pool.unregister(self.id)
 
         return super().stop()
 
@@ -125,6 +140,14 @@ class LocalDevice(BaseDevice):
                     print('updating address: ', update_data.get('address'))
                     self.address = update_data.get('address')
 
+                if 'motion_gate' in update_data:
+                    print('updating motion_gate: ', update_data.get('motion_gate'))
+                    self.motion_gate = update_data.get('motion_gate')
+
+                if 'detection_region' in update_data:
+                    print('updating detection_region: ', update_data.get('detection_region'))
+                    self.detection_region = update_data.get('detection_region')
+
             return response
         else:
             return False
@@ -2,17 +2,34 @@ from collections import namedtuple
 
 from detector.DetectorManager import CommunicationConfiguration, AddressAndPort
 from device.Device import DeviceLocation, LocalDevice, DeviceStatus, RemoteDevice, DeviceRole
+from ipc_communication.Codec import JSON_CODEC
 from ipc_communication.default_configuration import DEFAULT_DETECTOR_SERVER_PORT, CLIENT_PREFIX
 
 
 class DeviceContainer:
-    def __init__(self) -> None:
+    def __init__(self, recognition_pool=None, codec=JSON_CODEC.name, event_bus=None, state_listener=None) -> None:
         super().__init__()
         self.__devices = dict()
+        self.__recognition_pool = recognition_pool
+        self.__codec = codec
+        self.__event_bus = event_bus
+        # optional callable receiving dict describing every change of device list or device status
+        self.__state_listener = state_listener
 
     def __contains__(self, item):
         return item in self.__devices
 
+    def __notify(self, name, change):
+        if self.__state_listener is None:
+            return
+        device = self.__devices.get(name, None)
+        data = dict()
+        data['name'] = name
+        data['change'] = change
+        data['status'] = device.status.name if device is not None else None
+        data['role'] = device.role.name if device is not None else None
+        self.__state_listener(data)
+
     def add_device(self, name: str, device_type: DeviceLocation, address: str, listener_port,
                    video_source: str, role: DeviceRole, capture_images: bool) -> bool:
         if name in self.__devices:
@@ -24,10 +41,13 @@ class DeviceContainer:
                                                 AddressAndPort(CLIENT_PREFIX, DEFAULT_DETECTOR_SERVER_PORT),
                                                 command_listener=
                                                 AddressAndPort(address,
-                                                               listener_port))
+                                                               listener_port),
+                                                codec=self.__codec,
+                                                event_bus=self.__event_bus)
             print("role: ", role)
             new_device = LocalDevice(name=name, video_source=video_source, communication_config=config,
-                                     capture_images=capture_images, role=role)
+                                     capture_images=capture_images, role=role,
+                                     recognition_pool=self.__recognition_pool)
             self.__devices[name] = new_device
         else:
             print('adding remote device ', name)
@@ -35,10 +55,12 @@ class DeviceContainer:
                                       video_source=video_source, role=role, persistence=capture_images)
             self.__devices[name] = new_device
 
+        self.__notify(name, 'added')
         return True
 
     def remove_device(self, name: str) -> None:
         del self.__devices[name]
+        self.__notify(name, 'removed')
 
     def get_list_of_devices(self):
         return self.__devices.keys()
@@ -57,11 +79,21 @@ class DeviceContainer:
 
     def start_device(self, name: str) -> bool:
         device = self.__devices.get(name, None)
-        return False if device is None else device.start()
+        if device is None:
+            return False
+        result = device.start()
+        if result:
+            self.__notify(name, 'started')
+        return result
 
     def stop_device(self, name: str) -> bool:
         device = self.__devices.get(name, None)
-        return False if device is None else device.stop()
+        if device is None:
+            return False
+        result = device.stop()
+        if result:
+            self.__notify(name, 'stopped')
+        return result
 
     def handle_device_update(self, name, new_status: DeviceStatus, address=None,
                              listener_port=None, video_source: str = None, capture_images=None) -> bool:
@@ -82,12 +114,14 @@ class DeviceContainer:
                 if capture_images:
                     args['capture_images'] = capture_images
 
-                result = device.update(args)
+                result = device.update(**args)
+                if result:
+                    self.__notify(name, 'updated')
                 return result
 
-            return device.start()
+            return self.start_device(name)
         elif DeviceStatus.OFF == new_status:
-            return device.stop()
+            return self.stop_device(name)
         else:
             print('Incorrect device status passed to update')
             return False
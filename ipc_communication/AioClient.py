@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+
+import zmq
+import zmq.asyncio
+
+from ipc_communication.Codec import JSON_CODEC
+from ipc_communication.QueuedClient import MESSAGE_ID_KEY, REPLY_KEY
+
+DEFAULT_TIMEOUT = 10.0
+
+
+class AioClient:
+    """
+    asyncio counterpart of Client built on zmq.asyncio. Uses single DEALER socket - any number
+    of requests can be awaited concurrently, replies are matched to requests by message_id.
+    """
+
+    def __init__(self, address=None, port=None, context=None, timeout=DEFAULT_TIMEOUT, codec=JSON_CODEC):
+        self.__context = context if context else zmq.asyncio.Context.instance()
+        self.__socket = self.__context.socket(zmq.DEALER)
+        self.__socket.setsockopt(zmq.LINGER, 0)
+        self.__timeout = timeout
+        self.__codec = codec
+        self.__ids = itertools.count(1)
+        self.__pending = dict()  # {message id: future}
+        self.__receiver = None
+        if address is not None and port is not None:
+            self.connect(address, port)
+
+    @staticmethod
+    def __create_full_address(address, port):
+        return address + ':' + str(port)
+
+    def connect(self, address, port):
+        complete_address = AioClient.__create_full_address(address, port)
+        print('Connecting to :', complete_address)
+        self.__socket.connect(complete_address)
+
+    def disconnect(self, address, port):
+        self.__socket.disconnect(AioClient.__create_full_address(address, port))
+
+    async def __receive_loop(self):
+        while True:
+            frames = await self.__socket.recv_multipart()
+            reply = self.__codec.loads(frames[-1])
+            if not isinstance(reply, dict) or MESSAGE_ID_KEY not in reply:
+                print('Reply without message id received: ', reply)
+                continue
+            future = self.__pending.get(reply[MESSAGE_ID_KEY])
+            # request may have been timed out or cancelled already
+            if future is not None and not future.done():
+                future.set_result(reply.get(REPLY_KEY))
+
+    async def send_message(self, message: dict, timeout=None):
+        """ Sends message and waits for its reply. Returns None when no reply arrived in time. """
+        if self.__receiver is None or self.__receiver.done():
+            self.__receiver = asyncio.ensure_future(self.__receive_loop())
+
+        message_id = next(self.__ids)
+        body = dict(message)
+        body[MESSAGE_ID_KEY] = message_id
+        future = asyncio.get_running_loop().create_future()
+        self.__pending[message_id] = future
+        try:
+            # empty delimiter frame keeps DEALER compatible with REP sockets
+            await self.__socket.send_multipart([b'', self.__codec.dumps(body)])
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.__timeout)
+        except asyncio.TimeoutError:
+            print('No reply received for message ', message_id)
+            return None
+        except zmq.ZMQError as e:
+            print("AioClient Exception caught: ", e)
+            return None
+        finally:
+            self.__pending.pop(message_id, None)
+
+    def in_flight(self):
+        return len(self.__pending)
+
+    async def close(self):
+        if self.__receiver is not None:
+            self.__receiver.cancel()
+            try:
+                await self.__receiver
+            except asyncio.CancelledError:
+                pass
+            self.__receiver = None
+        for future in self.__pending.values():
+            future.cancel()
+        self.__pending.clear()
+        self.__socket.close()
@@ -0,0 +1,141 @@
+import asyncio
+
+import zmq
+import zmq.asyncio
+
+from ipc_communication.Codec import JSON_CODEC
+from ipc_communication.Server import FullAddressAndHandler, Server, decode_message
+
+
+class AioServer:
+    """
+    asyncio counterpart of AsyncServer built on zmq.asyncio with ROUTER sockets.
+    Every message is handled in its own task and replied to as soon as its handler finishes.
+    Coroutine handlers are awaited, plain functions run in the loop's default executor.
+    Every socket is received by its own task - socket bound while serving gets one right away,
+    so bind has to be called on the event loop thread. Shutdown is done by cancelling serving task (stop).
+    """
+
+    def __init__(self, message_handler, address=None, port=None, context=None, max_concurrency=None, codec=JSON_CODEC):
+        self.__context = context if context else zmq.asyncio.Context.instance()
+        self.__sockets = dict()  # dict of {socket: {Address and Handler}}
+        self.__default_message_handler = message_handler
+        self.__default_codec = codec
+        self.__limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.__serving = None
+        self.__receiving = False
+        self.__receivers = dict()  # {socket: receiving task}
+        self.__handlers = set()
+        self.__handled = 0
+        self.__malformed = 0
+
+        if address is not None and port is not None:
+            self.bind(address, port, message_handler)
+
+    @staticmethod
+    def __create_full_address(address, port):
+        return address + ':' + str(port)
+
+    def bind(self, address, port, handler=None, codec=None):
+        full_address = AioServer.__create_full_address(address, port)
+        if full_address in (i.address for i in self.__sockets.values()):
+            print('Socket was already bound to ', full_address)
+            return
+
+        socket = self.__context.socket(zmq.ROUTER)
+        socket.setsockopt(zmq.LINGER, 0)
+        print('binding to : ', full_address)
+        socket.bind(full_address)
+        self.__sockets[socket] = FullAddressAndHandler(full_address, handler or self.__default_message_handler,
+                                                             codec or self.__default_codec)
+        if self.__receiving:
+            self.__start_receiver(socket, self.__sockets[socket])
+
+    def unbind(self, address, port):
+        full_address = AioServer.__create_full_address(address, port)
+        for socket, socket_data in list(self.__sockets.items()):
+            if socket_data.address == full_address:
+                del self.__sockets[socket]
+                receiver = self.__receivers.pop(socket, None)
+                if receiver is not None:
+                    receiver.cancel()
+                socket.close()
+                return
+        print('No socket was bound to ', full_address)
+
+    async def __call_handler(self, callback, message):
+        if asyncio.iscoroutinefunction(callback):
+            return await callback(message)
+        return await asyncio.get_running_loop().run_in_executor(None, callback, message)
+
+    async def __handle(self, socket, socket_data, envelope, message):
+        try:
+            if self.__limit is not None:
+                async with self.__limit:
+                    reply = await self.__call_handler(socket_data.callback, message)
+            else:
+                reply = await self.__call_handler(socket_data.callback, message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print('Message handler exception caught: ', e)
+            reply = None
+        self.__handled += 1
+        await socket.send_multipart(envelope + [socket_data.codec.dumps(Server.correlate_reply(message, reply))])
+
+    async def __receive_loop(self, socket, socket_data):
+        while True:
+            frames = await socket.recv_multipart()
+            envelope = frames[:-1]
+            message, decoded = decode_message(socket_data, frames[-1])
+            if not decoded:
+                self.__malformed += 1
+                await socket.send_multipart(envelope + [socket_data.codec.dumps(None)])
+                continue
+            task = asyncio.ensure_future(self.__handle(socket, socket_data, envelope, message))
+            self.__handlers.add(task)
+            task.add_done_callback(self.__handlers.discard)
+
+    def __start_receiver(self, socket, socket_data):
+        if socket not in self.__receivers:
+            self.__receivers[socket] = asyncio.ensure_future(self.__receive_loop(socket, socket_data))
+
+    async def serve(self):
+        """ Receives on every bound socket, also on the ones bound later, until cancelled. """
+        self.__receiving = True
+        try:
+            for socket, socket_data in list(self.__sockets.items()):
+                self.__start_receiver(socket, socket_data)
+            await asyncio.get_running_loop().create_future()
+        finally:
+            self.__receiving = False
+            receivers = list(self.__receivers.values())
+            self.__receivers.clear()
+            for receiver in receivers:
+                receiver.cancel()
+            await asyncio.gather(*receivers, return_exceptions=True)
+
+    def run(self):
+        """ Starts serving in the running event loop and returns the serving task. """
+        if self.__serving is None or self.__serving.done():
+            self.__serving = asyncio.ensure_future(self.serve())
+        return self.__serving
+
+    async def stop(self):
+        tasks = list(self.__handlers)
+        if self.__serving is not None:
+            tasks.append(self.__serving)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__serving = None
+        for socket in self.__sockets:
+            socket.close()
+        self.__sockets.clear()
+
+    def statistics(self):
+        data = dict()
+        data['in_flight'] = len(self.__handlers)
+        data['handled'] = self.__handled
+        data['malformed'] = self.__malformed
+        return data
@@ -1,10 +1,13 @@
 import zmq
 
+from ipc_communication.Codec import JSON_CODEC
+
 
 class Client:
 
-    def __init__(self, address=None, port=None, context=None):
+    def __init__(self, address=None, port=None, context=None, codec=JSON_CODEC):
         self.__context = context if context else zmq.Context()
+        self.__codec = codec
         self.__socket = self.__context.socket(zmq.REQ)
         self.__socket.setsockopt(zmq.RCVTIMEO, 10000)
         if address is not None and port is not None:
@@ -27,8 +30,8 @@ class Client:
         print('send_message', message)
         reply = None
         try:
-            self.__socket.send_json(message)
-            reply = self.__socket.recv_json()
+            self.__socket.send(self.__codec.dumps(message))
+            reply = self.__codec.loads(self.__socket.recv())
         except zmq.ZMQError as e:
             print("Client Exception caught: ", e)
         finally:
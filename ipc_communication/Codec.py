@@ -0,0 +1,381 @@
+import json
+import math
+import struct
+
+WIRE_FORMAT_VERSION = 2
+
+MESSAGE_GENERIC = 0
+MESSAGE_DETECTION = 1
+
+HEADER = struct.Struct('!BB')  # version, message type
+# present fields, timestamp, observations, candidates count, coordinates count,
+# encoded length of detector, role and plates - followed by confidences and coordinates
+DETECTION_HEADER_FORMAT = '!BdHHHBBI'
+DETECTION_HEADER = struct.Struct(DETECTION_HEADER_FORMAT)
+LENGTH = struct.Struct('!I')
+SHORT_LENGTH = struct.Struct('!B')
+INT32 = struct.Struct('!i')
+INT64 = struct.Struct('!q')
+DOUBLE = struct.Struct('!d')
+PLATE_SEPARATOR = '\x00'
+
+# optional keys carried by fixed detection layout when their values fit it - flagged in detection header
+HAS_TIMESTAMP = 1
+HAS_OBSERVATIONS = 2
+HAS_COORDINATES = 4
+HAS_ROLE = 8
+MAX_COUNT = 2 ** 16 - 1
+MAX_SHORT_LENGTH = 255
+# layouts of detections with more candidates or points than this are compiled on every use
+MAX_CACHED_LAYOUTS = 256
+
+FLOAT_TYPE = {float}
+INT_TYPE = {int}
+
+_schemas_by_type = dict()  # {message type: (class, to_fields, from_fields)}
+_schemas_by_class = dict()  # {class: message type}
+
+
+def register_schema(message_type, cls, to_fields, from_fields):
+    """
+    Registers control message class for BinaryCodec. to_fields(obj) returns plain value (dict, list, str, ...)
+    encoded after the header, from_fields(value) rebuilds the object. Types 0-15 are reserved for ipc_communication.
+    """
+    if message_type < 16:
+        raise ValueError('message types below 16 are reserved')
+    _schemas_by_type[message_type] = (cls, to_fields, from_fields)
+    _schemas_by_class[cls] = message_type
+
+
+def as_plain(value):
+    """ Converts namedtuples (also nested in dicts and lists) to dicts so field names survive any codec. """
+    if hasattr(value, '_asdict'):
+        return {key: as_plain(item) for key, item in value._asdict().items()}
+    if isinstance(value, dict):
+        return {key: as_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [as_plain(item) for item in value]
+    return value
+
+
+class JsonCodec:
+    """ Default codec - same encoding as send_json/recv_json. Registered control messages are sent as dicts. """
+
+    name = 'json'
+
+    @staticmethod
+    def __default(obj):
+        message_type = _schemas_by_class.get(type(obj))
+        if message_type is not None:
+            return _schemas_by_type[message_type][1](obj)
+        raise TypeError('Object of type ' + type(obj).__name__ + ' is not JSON serializable')
+
+    def dumps(self, message) -> bytes:
+        return json.dumps(message, default=JsonCodec.__default).encode()
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+
+def _pack_string(parts, value, length=LENGTH):
+    encoded = value.encode()
+    parts.append(length.pack(len(encoded)))
+    parts.append(encoded)
+
+
+def _unpack_string(data, offset, length=LENGTH):
+    size, = length.unpack_from(data, offset)
+    offset += length.size
+    return data[offset:offset + size].decode(), offset + size
+
+
+def _float_key(value):
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return float.__repr__(value)
+
+
+def _map_key(key):
+    """ Converts dict key to string the way json does. """
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    if isinstance(key, int):
+        return int.__repr__(key)
+    if isinstance(key, float):
+        return _float_key(key)
+    raise TypeError('keys must be str, int, float, bool or None, not ' + type(key).__name__)
+
+
+def _pack_value(parts, value):
+    """ Tagged encoding of the values JsonCodec accepts, decoded to the same values json.loads returns. """
+    if value is None:
+        parts.append(b'N')
+    elif value is True:
+        parts.append(b'T')
+    elif value is False:
+        parts.append(b'F')
+    elif isinstance(value, int):
+        if -2 ** 31 <= value < 2 ** 31:
+            parts.append(b'i' + INT32.pack(value))
+        elif -2 ** 63 <= value < 2 ** 63:
+            parts.append(b'q' + INT64.pack(value))
+        else:
+            parts.append(b'I')
+            _pack_string(parts, int.__repr__(value))
+    elif isinstance(value, float):
+        parts.append(b'd' + DOUBLE.pack(value))
+    elif isinstance(value, str):
+        parts.append(b's')
+        _pack_string(parts, value)
+    elif isinstance(value, dict):
+        parts.append(b'm' + LENGTH.pack(len(value)))
+        for key, item in value.items():
+            _pack_string(parts, _map_key(key))
+            _pack_value(parts, item)
+    elif isinstance(value, (list, tuple)):
+        # namedtuples are lists as in JSON - as_plain keeps their field names
+        parts.append(b'l' + LENGTH.pack(len(value)))
+        for item in value:
+            _pack_value(parts, item)
+    else:
+        # registered control message nested in other value is sent as its fields, as JsonCodec does
+        message_type = _schemas_by_class.get(type(value))
+        if message_type is None:
+            raise TypeError('Object of type ' + type(value).__name__ + ' cannot be encoded')
+        _pack_value(parts, _schemas_by_type[message_type][1](value))
+
+
+def _unpack_value(data, offset):
+    tag = data[offset:offset + 1]
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    if tag == b'T':
+        return True, offset
+    if tag == b'F':
+        return False, offset
+    if tag == b'i':
+        return INT32.unpack_from(data, offset)[0], offset + INT32.size
+    if tag == b'q':
+        return INT64.unpack_from(data, offset)[0], offset + INT64.size
+    if tag == b'I':
+        value, offset = _unpack_string(data, offset)
+        return int(value), offset
+    if tag == b'd':
+        return DOUBLE.unpack_from(data, offset)[0], offset + DOUBLE.size
+    if tag == b's':
+        return _unpack_string(data, offset)
+    if tag == b'l':
+        count, = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        items = []
+        for _ in range(count):
+            item, offset = _unpack_value(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == b'm':
+        count, = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        items = dict()
+        for _ in range(count):
+            key, offset = _unpack_string(data, offset)
+            items[key], offset = _unpack_value(data, offset)
+        return items, offset
+    raise ValueError('Unknown value tag ' + repr(tag))
+
+
+EMPTY_MAP = b'm' + LENGTH.pack(0)
+
+
+def _fixed_keys(present):
+    keys = {'candidates', 'detector'}
+    for flag, key in ((HAS_TIMESTAMP, 'timestamp'), (HAS_OBSERVATIONS, 'observations'),
+                      (HAS_COORDINATES, 'coordinates'), (HAS_ROLE, 'detector_role')):
+        if present & flag:
+            keys.add(key)
+    return frozenset(keys)
+
+
+# keys of fixed layout for every combination of present flags
+FIXED_KEYS = tuple(_fixed_keys(present) for present in range(16))
+
+_detection_layouts = dict()  # {(candidates count, coordinates count): struct.Struct}
+
+
+def _detection_layout(candidates_count, coordinates_count):
+    layout = _detection_layouts.get((candidates_count, coordinates_count))
+    if layout is None:
+        layout = struct.Struct(DETECTION_HEADER_FORMAT + '%dd%di' % (candidates_count, 2 * coordinates_count))
+        if len(_detection_layouts) < MAX_CACHED_LAYOUTS:
+            _detection_layouts[(candidates_count, coordinates_count)] = layout
+    return layout
+
+
+def _coordinate_values(coordinates):
+    """ Flat list of x, y values or None when coordinates are not a list of {'x', 'y'} int32 points. """
+    if type(coordinates) not in (list, tuple) or len(coordinates) > MAX_COUNT:
+        return None
+    try:
+        values = [value for point in coordinates for value in (point['x'], point['y'])]
+        if sum(map(len, coordinates)) != len(values):
+            return None
+    except (TypeError, KeyError, IndexError):
+        return None
+    if values and (not INT_TYPE.issuperset(map(type, values)) or min(values) < -2 ** 31 or max(values) >= 2 ** 31):
+        return None
+    return values
+
+
+def _pack_detection(message):
+    """
+    Returns detection packed in fixed layout or None when its detector or candidates do not fit it.
+    Optional keys whose values do not fit travel in the extension map, so decoding restores them as they were.
+    """
+    candidates = message['candidates']
+    detector = message['detector']
+    if type(detector) is not str or type(candidates) not in (list, tuple) or len(candidates) > MAX_COUNT:
+        return None
+    if candidates:
+        try:
+            plates, confidences = zip(*candidates)
+            plates = PLATE_SEPARATOR.join(plates)
+        except (TypeError, ValueError):
+            return None
+        # confidences are sent as doubles - same values as JSON, other types would change on the way
+        if not FLOAT_TYPE.issuperset(map(type, confidences)) or plates.count(PLATE_SEPARATOR) != len(candidates) - 1:
+            return None
+        plates = plates.encode()
+    else:
+        plates, confidences = b'', ()
+    detector = detector.encode()
+    if len(detector) > MAX_SHORT_LENGTH:
+        return None
+
+    present = 0
+    timestamp = message.get('timestamp')
+    if type(timestamp) is float:
+        present |= HAS_TIMESTAMP
+    else:
+        timestamp = 0.0
+    observations = message.get('observations')
+    if type(observations) is int and 0 <= observations <= MAX_COUNT:
+        present |= HAS_OBSERVATIONS
+    else:
+        observations = 0
+    role = message.get('detector_role')
+    role = role.encode() if type(role) is str else None
+    if role is not None and len(role) <= MAX_SHORT_LENGTH:
+        present |= HAS_ROLE
+    else:
+        role = b''
+    values = _coordinate_values(message.get('coordinates'))
+    if values is not None:
+        present |= HAS_COORDINATES
+    else:
+        values = ()
+
+    fixed_keys = FIXED_KEYS[present]
+    # fixed keys are always present in the message - same size means no other keys
+    if len(message) == len(fixed_keys):
+        extensions = EMPTY_MAP
+    else:
+        parts = []
+        _pack_value(parts, {key: value for key, value in message.items() if key not in fixed_keys})
+        extensions = b''.join(parts)
+    layout = _detection_layout(len(confidences), len(values) // 2)
+    return b''.join((DETECTION_PREFIX,
+                     layout.pack(present, timestamp, observations, len(confidences), len(values) // 2,
+                                 len(detector), len(role), len(plates), *confidences, *values),
+                     detector, role, plates, extensions))
+
+
+def _unpack_detection(data, offset):
+    candidates_count, coordinates_count = DETECTION_HEADER.unpack_from(data, offset)[3:5]
+    layout = _detection_layout(candidates_count, coordinates_count)
+    fields = layout.unpack_from(data, offset)
+    present, timestamp, observations, _, _, detector_length, role_length, plates_length = fields[:8]
+    offset += layout.size
+    message = dict()
+    message['detector'] = data[offset:offset + detector_length].decode()
+    offset += detector_length
+    role = data[offset:offset + role_length].decode()
+    offset += role_length
+    plates = data[offset:offset + plates_length].decode()
+    offset += plates_length
+    extensions, offset = _unpack_value(data, offset)
+
+    confidences = fields[8:8 + candidates_count]
+    message['candidates'] = list(map(list, zip(plates.split(PLATE_SEPARATOR), confidences))) \
+        if candidates_count else []
+    if present & HAS_COORDINATES:
+        values = iter(fields[8 + candidates_count:])
+        message['coordinates'] = [{'x': x, 'y': y} for x, y in zip(values, values)]
+    if present & HAS_OBSERVATIONS:
+        message['observations'] = observations
+    if present & HAS_ROLE:
+        message['detector_role'] = role
+    if present & HAS_TIMESTAMP:
+        message['timestamp'] = timestamp
+    message.update(extensions)
+    return message
+
+
+def is_detection(message):
+    return isinstance(message, dict) and 'candidates' in message and 'detector' in message
+
+
+DETECTION_PREFIX = HEADER.pack(WIRE_FORMAT_VERSION, MESSAGE_DETECTION)
+
+
+class BinaryCodec:
+    """
+    Versioned binary wire format. Every message starts with version and message type byte.
+    Detection events use fixed struct layout, registered control messages and any other values
+    use compact tagged encoding. Both codecs accept the same values and decoded messages equal
+    the ones JsonCodec would decode - values which do not fit the fixed layout travel in its extension map.
+    """
+
+    name = 'binary'
+
+    def dumps(self, message) -> bytes:
+        message_type = _schemas_by_class.get(type(message))
+        if message_type is None and is_detection(message):
+            encoded = _pack_detection(message)
+            if encoded is not None:
+                return encoded
+        parts = []
+        if message_type is not None:
+            parts.append(HEADER.pack(WIRE_FORMAT_VERSION, message_type))
+            _pack_value(parts, _schemas_by_type[message_type][1](message))
+        else:
+            parts.append(HEADER.pack(WIRE_FORMAT_VERSION, MESSAGE_GENERIC))
+            _pack_value(parts, message)
+        return b''.join(parts)
+
+    def loads(self, data: bytes):
+        data = bytes(data)
+        version, message_type = HEADER.unpack_from(data, 0)
+        if version != WIRE_FORMAT_VERSION:
+            raise ValueError('Unsupported wire format version ' + str(version))
+        if MESSAGE_DETECTION == message_type:
+            return _unpack_detection(data, HEADER.size)
+        value, _ = _unpack_value(data, HEADER.size)
+        if MESSAGE_GENERIC == message_type:
+            return value
+        schema = _schemas_by_type.get(message_type)
+        if schema is None:
+            raise ValueError('Unknown message type ' + str(message_type))
+        return schema[2](value)
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS = {JSON_CODEC.name: JSON_CODEC, BINARY_CODEC.name: BINARY_CODEC}
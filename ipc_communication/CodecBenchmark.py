@@ -0,0 +1,59 @@
+import argparse
+import json
+import time
+
+from ipc_communication.Codec import CODECS
+
+SAMPLE_DETECTION = {
+    'candidates': [['KR12345', 91.5], ['KR1234S', 84.25], ['KRI2345', 80.0], ['KR12346', 77.75],
+                   ['KR1Z345', 71.5]],
+    'coordinates': [{'x': 412, 'y': 310}, {'x': 598, 'y': 312}, {'x': 597, 'y': 356}, {'x': 411, 'y': 354}],
+    'observations': 4,
+    'detector': 'entrance-camera',
+    'detector_role': 'ENTRY',
+    'timestamp': 1700000000.125,
+    'message_id': 1024,
+}
+
+SAMPLE_REPLY = {'message_id': 1024, 'reply': True}
+
+
+def measure(codec, message, iterations):
+    """ Returns encoded size and mean encode / decode time in microseconds. """
+    encoded = codec.dumps(message)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.dumps(message)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.loads(encoded)
+    decode_time = time.perf_counter() - start
+
+    result = dict()
+    result['size'] = len(encoded)
+    result['encode_us'] = encode_time / iterations * 1e6
+    result['decode_us'] = decode_time / iterations * 1e6
+    return result
+
+
+def run_benchmark(iterations):
+    messages = {'detection': SAMPLE_DETECTION, 'reply': SAMPLE_REPLY}
+    return {name: {codec_name: measure(codec, message, iterations) for codec_name, codec in CODECS.items()}
+            for name, message in messages.items()}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Compares size and speed of IPC wire formats.')
+    parser.add_argument('--iterations', type=int, default=100000)
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    print(json.dumps(run_benchmark(arguments.iterations), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import struct
+import time
+from collections import namedtuple
+from threading import Thread
+
+import zmq
+
+from ipc_communication.Codec import JSON_CODEC
+
+DEFAULT_HIGH_WATER_MARK = 1000
+TOPIC_SEPARATOR = b'\0'
+# event header: per topic sequence number, publish timestamp
+EVENT_HEADER = struct.Struct('!Qd')
+PROXY_TERMINATE = b'TERMINATE'
+
+BusEvent = namedtuple('BusEvent', 'topic, sequence, timestamp, message')
+
+
+def detection_topic(role, device=None):
+    """ Topic of detections - subscribing to detection_topic(role) receives all devices with that role. """
+    topic = 'detection.' + str(role) + '.'
+    return topic + device if device is not None else topic
+
+
+def _create_full_address(address, port):
+    return address + ':' + str(port)
+
+
+class EventPublisher:
+    """
+    Publishes events on PUB socket. Every frame holds topic, sequence number of the topic, publish time
+    and encoded message, so it can be conflated by subscribers. When subscriber's high water mark is
+    reached the event is dropped for that subscriber - publishing never blocks the detector loop.
+    """
+
+    def __init__(self, address=None, port=None, context=None, codec=JSON_CODEC,
+                 high_water_mark=DEFAULT_HIGH_WATER_MARK, bind=False):
+        self.__context = context if context else zmq.Context()
+        self.__socket = self.__context.socket(zmq.PUB)
+        self.__socket.setsockopt(zmq.SNDHWM, high_water_mark)
+        self.__socket.setsockopt(zmq.LINGER, 0)
+        self.__codec = codec
+        self.__sequences = dict()  # {topic: last sequence number}
+        self.__published = 0
+        if address is not None and port is not None:
+            if bind:
+                self.__socket.bind(_create_full_address(address, port))
+            else:
+                self.connect(address, port)
+
+    def connect(self, address, port):
+        complete_address = _create_full_address(address, port)
+        print('Publisher connecting to :', complete_address)
+        self.__socket.connect(complete_address)
+
+    def publish(self, topic: str, message):
+        sequence = self.__sequences.get(topic, 0) + 1
+        self.__sequences[topic] = sequence
+        frame = topic.encode() + TOPIC_SEPARATOR + EVENT_HEADER.pack(sequence, time.time()) + \
+            self.__codec.dumps(message)
+        try:
+            self.__socket.send(frame, zmq.NOBLOCK)
+            self.__published += 1
+        except zmq.ZMQError as e:
+            print('EventPublisher Exception caught: ', e)
+
+    def close(self):
+        self.__socket.close()
+
+    def statistics(self):
+        data = dict()
+        data['published'] = self.__published
+        data['topics'] = dict(self.__sequences)
+        return data
+
+
+class EventSubscriber:
+    """
+    Receives events of subscribed topic prefixes. Sequence numbers are checked per topic -
+    missing events (dropped at high water mark or conflated) are counted as gaps.
+    With conflate only the newest event is kept in the queue, which suits live views of a single topic.
+    """
+
+    def __init__(self, address=None, port=None, topics=('',), context=None, codec=JSON_CODEC,
+                 high_water_mark=DEFAULT_HIGH_WATER_MARK, conflate=False):
+        self.__context = context if context else zmq.Context()
+        self.__socket = self.__context.socket(zmq.SUB)
+        self.__socket.setsockopt(zmq.RCVHWM, high_water_mark)
+        self.__socket.setsockopt(zmq.LINGER, 0)
+        if conflate:
+            # has to be set before connecting
+            self.__socket.setsockopt(zmq.CONFLATE, 1)
+        self.__codec = codec
+        self.__last_sequences = dict()  # {topic: last received sequence number}
+        self.__received = 0
+        self.__missed = 0
+        self.__restarts = 0
+        for topic in topics:
+            self.subscribe(topic)
+        if address is not None and port is not None:
+            self.connect(address, port)
+
+    def connect(self, address, port):
+        complete_address = _create_full_address(address, port)
+        print('Subscriber connecting to :', complete_address)
+        self.__socket.connect(complete_address)
+
+    def subscribe(self, topic: str):
+        self.__socket.setsockopt(zmq.SUBSCRIBE, topic.encode())
+
+    def unsubscribe(self, topic: str):
+        self.__socket.setsockopt(zmq.UNSUBSCRIBE, topic.encode())
+
+    def __check_sequence(self, topic, sequence):
+        last = self.__last_sequences.get(topic)
+        self.__last_sequences[topic] = sequence
+        if last is None:
+            # first event of topic seen by this subscriber
+            return
+        if sequence <= last:
+            # publisher was restarted and counts from the beginning
+            self.__restarts += 1
+        elif sequence > last + 1:
+            self.__missed += sequence - last - 1
+            print('Event bus gap on ', topic, ': ', sequence - last - 1, ' events missed')
+
+    def receive(self, timeout_ms=None):
+        """ Returns next BusEvent or None when nothing arrived within timeout_ms (None waits forever). """
+        try:
+            if timeout_ms is not None and not self.__socket.poll(timeout_ms):
+                return None
+            frame = self.__socket.recv()
+        except zmq.ZMQError as e:
+            print('EventSubscriber Exception caught: ', e)
+            return None
+
+        separator = frame.index(TOPIC_SEPARATOR)
+        topic = frame[:separator].decode()
+        sequence, timestamp = EVENT_HEADER.unpack_from(frame, separator + 1)
+        message = self.__codec.loads(frame[separator + 1 + EVENT_HEADER.size:])
+        self.__received += 1
+        self.__check_sequence(topic, sequence)
+        return BusEvent(topic, sequence, timestamp, message)
+
+    def close(self):
+        self.__socket.close()
+
+    def statistics(self):
+        data = dict()
+        data['received'] = self.__received
+        data['missed'] = self.__missed
+        data['publisher_restarts'] = self.__restarts
+        data['topics'] = len(self.__last_sequences)
+        return data
+
+
+class EventProxy:
+    """
+    XSUB/XPUB forwarder - publishers from all detector processes connect to the frontend,
+    subscribers connect to the backend, so neither side has to know the addresses of the other.
+    """
+
+    def __init__(self, address, frontend_port, backend_port, context=None,
+                 high_water_mark=DEFAULT_HIGH_WATER_MARK):
+        self.__context = context if context else zmq.Context()
+        self.__frontend_address = _create_full_address(address, frontend_port)
+        self.__backend_address = _create_full_address(address, backend_port)
+        self.__control_address = 'inproc://event-proxy-' + str(id(self))
+        self.__high_water_mark = high_water_mark
+        self.__thread = None
+        self.__control = None
+
+    def start(self):
+        if self.__thread is not None:
+            return False
+        frontend = self.__context.socket(zmq.XSUB)
+        frontend.setsockopt(zmq.RCVHWM, self.__high_water_mark)
+        frontend.bind(self.__frontend_address)
+        backend = self.__context.socket(zmq.XPUB)
+        backend.setsockopt(zmq.SNDHWM, self.__high_water_mark)
+        backend.bind(self.__backend_address)
+        control = self.__context.socket(zmq.PAIR)
+        control.bind(self.__control_address)
+        self.__control = self.__context.socket(zmq.PAIR)
+        self.__control.connect(self.__control_address)
+        print('event bus proxy: ', self.__frontend_address, ' -> ', self.__backend_address)
+        self.__thread = Thread(target=EventProxy.__run, args=(frontend, backend, control), daemon=True)
+        self.__thread.start()
+        return True
+
+    @staticmethod
+    def __run(frontend, backend, control):
+        try:
+            zmq.proxy_steerable(frontend, backend, None, control)
+        except zmq.ZMQError as e:
+            print('EventProxy Exception caught: ', e)
+        finally:
+            for socket in (frontend, backend, control):
+                socket.close(linger=0)
+
+    def stop(self):
+        if self.__thread is None:
+            return
+        self.__control.send(PROXY_TERMINATE)
+        self.__thread.join()
+        self.__control.close()
+        self.__thread = None
+        self.__control = None
+
+
+def main():
+    """ Prints events passing through the bus together with gap statistics. """
+    import argparse
+    from ipc_communication.Codec import CODECS
+    from ipc_communication.default_configuration import CLIENT_PREFIX, DEFAULT_EVENT_BUS_SUBSCRIBER_PORT
+
+    parser = argparse.ArgumentParser(description='Subscribes to the event bus and prints received events.')
+    parser.add_argument('--topic', default='')
+    parser.add_argument('--port', type=int, default=DEFAULT_EVENT_BUS_SUBSCRIBER_PORT)
+    parser.add_argument('--codec', default=JSON_CODEC.name, choices=sorted(CODECS))
+    parser.add_argument('--conflate', action='store_true')
+    arguments = parser.parse_args()
+
+    subscriber = EventSubscriber(CLIENT_PREFIX, arguments.port, topics=(arguments.topic,),
+                                 codec=CODECS[arguments.codec], conflate=arguments.conflate)
+    try:
+        while True:
+            event = subscriber.receive()
+            if event is not None:
+                print(event.topic, event.sequence, event.message, subscriber.statistics())
+    except KeyboardInterrupt:
+        subscriber.close()
+
+
+if __name__ == "__main__":
+    main()
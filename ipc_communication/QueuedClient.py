@@ -0,0 +1,151 @@
+import itertools
+import queue
+import time
+from threading import Thread
+
+import zmq
+
+from ipc_communication.Codec import JSON_CODEC
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_ACK_TIMEOUT = 10.0
+IDLE_WAIT_TIMEOUT = 0.1
+REPLY_POLL_TIMEOUT_MS = 5
+
+MESSAGE_ID_KEY = 'message_id'
+REPLY_KEY = 'reply'
+
+
+class QueuedClient:
+    """
+    Non-blocking counterpart of Client. Messages are put into bounded outbound queue and sent
+    from background thread over DEALER socket with several messages in flight. Replies are
+    correlated with messages by message_id and passed to optional ack_callback(message, reply).
+    """
+
+    def __init__(self, address=None, port=None, context=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT, ack_timeout=DEFAULT_ACK_TIMEOUT, ack_callback=None,
+                 codec=JSON_CODEC):
+        self.__context = context if context else zmq.Context()
+        self.__socket = self.__context.socket(zmq.DEALER)
+        self.__socket.setsockopt(zmq.LINGER, 0)
+        self.__outbound = queue.Queue(maxsize=queue_size)
+        self.__max_in_flight = max_in_flight
+        self.__ack_timeout = ack_timeout
+        self.__ack_callback = ack_callback
+        self.__codec = codec
+        self.__pending = dict()  # {message id: (send time, message)}
+        self.__ids = itertools.count(1)
+        self.__thread = None
+        self.__running = False
+        self.__sent = 0
+        self.__acknowledged = 0
+        self.__dropped = 0
+        self.__timed_out = 0
+        self.__last_ack_latency = None
+        if address is not None and port is not None:
+            self.connect(address, port)
+
+    @staticmethod
+    def __create_full_address(address, port):
+        return address + ':' + str(port)
+
+    def connect(self, address, port):
+        complete_address = QueuedClient.__create_full_address(address, port)
+        print('Connecting to :', complete_address)
+        self.__socket.connect(complete_address)
+
+    def start(self):
+        if self.__running:
+            return False
+        self.__running = True
+        self.__thread = Thread(target=self.__send_loop, daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.__socket.close()
+
+    def send_message(self, message):
+        """ Queues message and returns immediately. Oldest queued message is dropped when queue is full. """
+        while True:
+            try:
+                self.__outbound.put_nowait(message)
+                return True
+            except queue.Full:
+                try:
+                    self.__outbound.get_nowait()
+                    self.__dropped += 1
+                    print('Outbound queue full - oldest message dropped')
+                except queue.Empty:
+                    pass
+
+    def __send(self, message):
+        message_id = next(self.__ids)
+        body = dict(message)
+        body[MESSAGE_ID_KEY] = message_id
+        # empty delimiter frame keeps DEALER compatible with REP sockets
+        self.__socket.send_multipart([b'', self.__codec.dumps(body)])
+        self.__pending[message_id] = (time.monotonic(), message)
+        self.__sent += 1
+
+    def __receive_replies(self):
+        while self.__socket.poll(0):
+            frames = self.__socket.recv_multipart()
+            reply = self.__codec.loads(frames[-1])
+            if not isinstance(reply, dict) or MESSAGE_ID_KEY not in reply:
+                print('Reply without message id received: ', reply)
+                continue
+            pending = self.__pending.pop(reply[MESSAGE_ID_KEY], None)
+            if pending is None:
+                # reply to message which already timed out
+                continue
+            sent_at, message = pending
+            self.__acknowledged += 1
+            self.__last_ack_latency = time.monotonic() - sent_at
+            if self.__ack_callback is not None:
+                self.__ack_callback(message, reply.get(REPLY_KEY))
+
+    def __expire_pending(self):
+        now = time.monotonic()
+        for message_id, (sent_at, message) in list(self.__pending.items()):
+            if now - sent_at > self.__ack_timeout:
+                del self.__pending[message_id]
+                self.__timed_out += 1
+                print('No acknowledgement received for message ', message_id)
+
+    def __send_queued(self):
+        try:
+            if not self.__pending:
+                self.__send(self.__outbound.get(timeout=IDLE_WAIT_TIMEOUT))
+            while len(self.__pending) < self.__max_in_flight:
+                self.__send(self.__outbound.get_nowait())
+        except queue.Empty:
+            pass
+
+    def __send_loop(self):
+        while self.__running:
+            try:
+                self.__send_queued()
+                if self.__pending:
+                    if self.__socket.poll(REPLY_POLL_TIMEOUT_MS):
+                        self.__receive_replies()
+                    self.__expire_pending()
+            except zmq.ZMQError as e:
+                print("QueuedClient Exception caught: ", e)
+
+    def statistics(self):
+        data = dict()
+        data['queued'] = self.__outbound.qsize()
+        data['in_flight'] = len(self.__pending)
+        data['sent'] = self.__sent
+        data['acknowledged'] = self.__acknowledged
+        data['dropped'] = self.__dropped
+        data['timed_out'] = self.__timed_out
+        data['last_ack_latency'] = self.__last_ack_latency
+        return data
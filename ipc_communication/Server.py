@@ -1,20 +1,75 @@
-from collections import namedtuple
-from threading import Thread
+import os
+import time
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock
 
 import zmq
 
+from ipc_communication.Codec import JSON_CODEC
+from ipc_communication.QueuedClient import MESSAGE_ID_KEY, REPLY_KEY
+
 AddressAndPort = namedtuple('AddressAndPort', 'address, port')
-FullAddressAndHandler = namedtuple('FullAddressAndHandler', 'address, callback')
+FullAddressAndHandler = namedtuple('FullAddressAndHandler', 'address, callback, codec', defaults=(JSON_CODEC,))
+CompletedReply = namedtuple('CompletedReply', 'socket, envelope, reply')
+
+
+def decode_message(socket_data, data):
+    """
+    Returns (message, True) or (None, False) when the frame cannot be decoded - malformed frame is logged
+    and answered with None reply, it must not stop serving of the socket.
+    """
+    try:
+        return socket_data.codec.loads(data), True
+    except Exception as e:
+        print('Malformed message received on ', socket_data.address, ': ', e)
+        return None, False
+
+
+class HandlerLatency:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def as_dict(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else None,
+                'max': self.max, 'last': self.last}
 
 
 class Server:
-    def __init__(self, message_handler, address=None, port=None, context=None):
+    """
+    Without workers every socket is REP and messages are handled one at a time on the polling thread.
+    With workers sockets are ROUTER - handlers run on a thread pool and replies are sent out of order.
+    """
+
+    def __init__(self, message_handler, address=None, port=None, context=None, workers=None, codec=JSON_CODEC):
         self.__context = context if context else zmq.Context()
         self.__sockets = dict()  # dict of {socket: {Address and Handler}}
 
         self.__default_message_handler = message_handler
+        self.__default_codec = codec
         self.__poller = zmq.Poller()
 
+        self.__executor = ThreadPoolExecutor(max_workers=workers) if workers else None
+        self.__completed = deque()
+        self.__statistics_lock = Lock()
+        self.__in_progress = 0
+        self.__malformed = 0
+        self.__latencies = dict()  # {full address: HandlerLatency}
+        self.__wakeup_read, self.__wakeup_write = None, None
+        if self.__executor is not None:
+            # workers signal finished replies through the pipe - sockets are used only by polling thread
+            self.__wakeup_read, self.__wakeup_write = os.pipe()
+            self.__poller.register(self.__wakeup_read, zmq.POLLIN)
+
         if address is not None and port is not None:
             self.bind(address, port, message_handler)
 
@@ -23,7 +78,7 @@ class Server:
         print(address + ':' + str(port))
         return address + ':' + str(port)
 
-    def bind(self, address, port, handler=None):
+    def bind(self, address, port, handler=None, codec=None):
         full_address = Server.__create_full_address(address, port)
 
         existing_addresses = list(i.address for i in self.__sockets.values())
@@ -32,14 +87,18 @@ class Server:
             print('Socket was already bound to ', full_address)
             return
 
-        socket = self.__context.socket(zmq.REP)
+        socket = self.__context.socket(zmq.ROUTER if self.__executor is not None else zmq.REP)
         print('binding to : ', full_address)
         socket.bind(full_address)
 
         if handler is None:
             handler = self.__default_message_handler
 
-        self.__sockets[socket] = FullAddressAndHandler(full_address, handler)
+        if codec is None:
+            codec = self.__default_codec
+
+        self.__sockets[socket] = FullAddressAndHandler(full_address, handler, codec)
+        self.__latencies[full_address] = HandlerLatency()
         self.__poller.register(socket, zmq.POLLIN)
 
     def unbind(self, address, port):
@@ -53,44 +112,127 @@ class Server:
             print('No socket was bound to ', full_address)
             return
 
-        popped_socket.unbind(full_address)
-        self.__poller.unregister(popped_socket)
-        self.__sockets.pop(full_address)
+        socket.unbind(full_address)
+        self.__poller.unregister(socket)
+
+    @staticmethod
+    def correlate_reply(message, reply):
+        # messages sent by QueuedClient carry message_id which has to be returned with the reply
+        if isinstance(message, dict) and MESSAGE_ID_KEY in message:
+            return {MESSAGE_ID_KEY: message[MESSAGE_ID_KEY], REPLY_KEY: reply}
+        return reply
 
     DEFAULT_60_SEC_TIMEOUT = 60000
 
+    def __handle(self, socket_data, message):
+        start = time.perf_counter()
+        try:
+            return socket_data.callback(message)
+        finally:
+            with self.__statistics_lock:
+                self.__latencies[socket_data.address].record(time.perf_counter() - start)
+
+    def __handle_in_worker(self, socket, socket_data, envelope, message):
+        try:
+            reply = self.__handle(socket_data, message)
+        except Exception as e:
+            print('Message handler exception caught: ', e)
+            reply = None
+        # reply is encoded on the worker thread - polling thread only sends it
+        encoded = socket_data.codec.dumps(Server.correlate_reply(message, reply))
+        self.__completed.append(CompletedReply(socket, envelope, encoded))
+        os.write(self.__wakeup_write, b'\0')
+
+    def __send_completed_replies(self):
+        os.read(self.__wakeup_read, 4096)
+        while self.__completed:
+            completed = self.__completed.popleft()
+            with self.__statistics_lock:
+                self.__in_progress -= 1
+            if completed.socket in self.__sockets:
+                completed.socket.send_multipart(completed.envelope + [completed.reply])
+
+    def __dispatch_to_worker(self, socket, socket_data):
+        frames = socket.recv_multipart()
+        # envelope holds client identity and empty delimiter - it is sent back with the reply
+        envelope = frames[:-1]
+        message, decoded = decode_message(socket_data, frames[-1])
+        if not decoded:
+            with self.__statistics_lock:
+                self.__malformed += 1
+            socket.send_multipart(envelope + [socket_data.codec.dumps(None)])
+            return
+        with self.__statistics_lock:
+            self.__in_progress += 1
+        self.__executor.submit(self.__handle_in_worker, socket, socket_data, envelope, message)
+
     def receive_message(self, timeout_ms=DEFAULT_60_SEC_TIMEOUT):
         try:
 
             events = dict(self.__poller.poll(timeout=timeout_ms))
 
             for event in events:
-                socket_data = self.__sockets[event]
+                if event == self.__wakeup_read:
+                    self.__send_completed_replies()
+                    continue
 
-                message = event.recv_json()
+                socket_data = self.__sockets[event]
+                if self.__executor is not None:
+                    self.__dispatch_to_worker(event, socket_data)
+                    continue
+
+                message, decoded = decode_message(socket_data, event.recv())
+                if not decoded:
+                    with self.__statistics_lock:
+                        self.__malformed += 1
+                    # REP socket has to reply before it can receive again
+                    event.send(socket_data.codec.dumps(None))
+                    continue
                 if message is None:
                     print('Received message is None')
 
-                reply = socket_data.callback(message)
-                event.send_json(reply)
+                reply = self.__handle(socket_data, message)
+                event.send(socket_data.codec.dumps(Server.correlate_reply(message, reply)))
 
         except zmq.ZMQError as e:
             print("Server Exception caught: ", e)
 
+    def close(self):
+        for socket in list(self.__sockets.keys()):
+            self.__poller.unregister(socket)
+            socket.close(linger=0)
+        self.__sockets.clear()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+
+    def statistics(self):
+        with self.__statistics_lock:
+            data = dict()
+            data['mode'] = 'router' if self.__executor is not None else 'rep'
+            data['queue_depth'] = self.__in_progress
+            data['malformed'] = self.__malformed
+            data['handlers'] = {address: latency.as_dict() for address, latency in self.__latencies.items()}
+            return data
+
 
 class AsyncServer(Server):
-    def __init__(self, message_handler, address=None, port=None, context=None):
+    def __init__(self, message_handler, address=None, port=None, context=None, workers=None, codec=JSON_CODEC):
         Server.__init__(self,
                         address=address,
                         port=port,
                         context=context,
-                        message_handler=message_handler)
+                        message_handler=message_handler,
+                        workers=workers,
+                        codec=codec)
         self.__run = False
         self.__server_thread = None
 
+    # short poll lets stop() finish quickly instead of waiting for the default 60 second timeout
+    STOP_CHECK_INTERVAL_MS = 500
+
     def __run_in_loop(self):
         while self.__run:
-            self.receive_message()
+            self.receive_message(timeout_ms=AsyncServer.STOP_CHECK_INTERVAL_MS)
 
     def run(self):
         if self.__run is not True:
@@ -99,7 +241,8 @@ class AsyncServer(Server):
             self.__server_thread.start()
 
     def stop(self):
-        for socket in self.__sockets:
-            socket.unbind()
-        self.__server_thread.join()
         self.__run = False
+        if self.__server_thread is not None:
+            self.__server_thread.join()
+            self.__server_thread = None
+        self.close()
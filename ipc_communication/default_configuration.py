@@ -3,3 +3,6 @@ TCP_PROTOCOL = 'tcp'
 CLIENT_PREFIX = 'tcp://127.0.0.1'
 SERVER_PREFIX = 'tcp://*'
 SERVER_PREFIX_LOCAL = 'tcp://91.223.167.177'
+# event bus proxy - detectors publish to the first port, subscribers connect to the second
+DEFAULT_EVENT_BUS_PUBLISHER_PORT = 6700
+DEFAULT_EVENT_BUS_SUBSCRIBER_PORT = 6701
@@ -0,0 +1,143 @@
+import time
+from threading import Lock, local
+
+from metrics.Histogram import Histogram
+
+# counters of detector loop
+FRAMES_SKIPPED = 'frames_skipped'
+FRAMES_GATED = 'frames_gated'
+DETECTIONS = 'detections'
+REJECTED_PLATES = 'rejected_plates'
+CAPTURE_FAILURES = 'capture_failures'
+DETECTOR_ERRORS = 'errors'
+# counters of detector process
+DETECTIONS_SENT = 'detections_sent'
+
+# time from detection to gate decision acknowledged by the web app
+STAGE_DECISION = 'decision'
+
+# key of metrics report sent by detector process to the web app
+METRICS_KEY = 'metrics'
+
+
+class ThreadAccumulator:
+    """ Counters and histograms written by one thread. The lock is contended only while a snapshot is taken. """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = dict()  # {name: count}
+        self.histograms = dict()  # {stage: Histogram}
+
+
+class DetectorMetrics:
+    """
+    Accumulators of counters and stage durations of one detector process. Metrics are written from several
+    threads (capture thread, detector loop, IPC client acknowledging decisions), so every thread records into
+    its own accumulator and snapshot() merges them - each accumulator is read under its lock, so histogram
+    count always matches its buckets. Accumulators of finished threads are kept, values only grow and
+    consumers compute rates from differences. Same record(stage, seconds) interface as StageTimings,
+    but memory stays constant.
+    """
+
+    def __init__(self):
+        self.__local = local()
+        self.__accumulators = []
+        self.__accumulators_lock = Lock()
+        self.__started = time.time()
+
+    def __accumulator(self):
+        accumulator = getattr(self.__local, 'accumulator', None)
+        if accumulator is None:
+            accumulator = self.__local.accumulator = ThreadAccumulator()
+            with self.__accumulators_lock:
+                self.__accumulators.append(accumulator)
+        return accumulator
+
+    def increment(self, name, amount=1):
+        accumulator = self.__accumulator()
+        with accumulator.lock:
+            accumulator.counters[name] = accumulator.counters.get(name, 0) + amount
+
+    def record(self, stage, seconds):
+        accumulator = self.__accumulator()
+        with accumulator.lock:
+            histogram = accumulator.histograms.get(stage)
+            if histogram is None:
+                histogram = accumulator.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self, **extra_counters):
+        """ Plain dict safe to send over IPC - extra_counters are added to counters (e.g. client statistics). """
+        with self.__accumulators_lock:
+            accumulators = list(self.__accumulators)
+        counters = dict()
+        histograms = dict()
+        for accumulator in accumulators:
+            with accumulator.lock:
+                for name, count in accumulator.counters.items():
+                    counters[name] = counters.get(name, 0) + count
+                for stage, histogram in accumulator.histograms.items():
+                    merged = histograms.get(stage)
+                    if merged is None:
+                        merged = histograms[stage] = Histogram(histogram.buckets)
+                    merged.merge(histogram)
+        counters.update(extra_counters)
+        data = dict()
+        data['started'] = self.__started
+        data['counters'] = counters
+        data['stages'] = {stage: histogram.as_dict() for stage, histogram in histograms.items()}
+        return data
+
+
+def metrics_report(detector, role, snapshot):
+    data = dict()
+    data[METRICS_KEY] = snapshot
+    data['detector'] = detector
+    data['detector_role'] = role
+    return data
+
+
+def is_metrics_report(message):
+    return isinstance(message, dict) and METRICS_KEY in message
+
+
+class MetricsCollector:
+    """ Latest metrics report of every detector, kept by the web app until the next one arrives. """
+
+    def __init__(self):
+        self.__reports = dict()  # {detector: (role, receive time, snapshot)}
+        self.__lock = Lock()
+
+    def update(self, report):
+        with self.__lock:
+            self.__reports[report['detector']] = (report.get('detector_role'), time.time(), report[METRICS_KEY])
+
+    def remove(self, detector):
+        with self.__lock:
+            self.__reports.pop(detector, None)
+
+    def reports(self):
+        """ Returns list of (detector, role, receive time, snapshot) sorted by detector. """
+        with self.__lock:
+            return [(detector, role, received, snapshot)
+                    for detector, (role, received, snapshot) in sorted(self.__reports.items())]
+
+    def write(self, writer):
+        """ Adds detector metric families to PrometheusWriter. """
+        reports = self.reports()
+        now = time.time()
+        counter_names = sorted({name for _, _, _, snapshot in reports for name in snapshot['counters']})
+        for name in counter_names:
+            writer.counter('alpr_detector_' + name + '_total', 'Detector ' + name.replace('_', ' '),
+                           [({'detector': detector, 'role': role}, snapshot['counters'][name])
+                            for detector, role, _, snapshot in reports if name in snapshot['counters']])
+        writer.histogram('alpr_detector_stage_seconds', 'Duration of detector pipeline stages',
+                         [({'detector': detector, 'role': role, 'stage': stage}, histogram)
+                          for detector, role, _, snapshot in reports
+                          for stage, histogram in sorted(snapshot['stages'].items())])
+        writer.gauge('alpr_detector_start_time_seconds', 'Start time of detector process',
+                     [({'detector': detector, 'role': role}, snapshot['started'])
+                      for detector, role, _, snapshot in reports])
+        writer.gauge('alpr_detector_report_age_seconds', 'Time since the last metrics report of detector',
+                     [({'detector': detector, 'role': role}, now - received)
+                      for detector, role, received, _ in reports])
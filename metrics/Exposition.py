@@ -0,0 +1,69 @@
+import math
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(name + '="' + escape_label(value) + '"' for name, value in labels.items()) + '}'
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if value != int(value) else str(int(value))
+
+
+class PrometheusWriter:
+    """
+    Builds Prometheus text exposition format. Families are written in call order, samples are
+    (labels dict, value) pairs - families without samples are left out.
+    """
+
+    def __init__(self):
+        self.__lines = []
+
+    def __family(self, name, help_text, metric_type):
+        self.__lines.append('# HELP ' + name + ' ' + help_text)
+        self.__lines.append('# TYPE ' + name + ' ' + metric_type)
+
+    def __simple(self, name, help_text, metric_type, samples):
+        if not samples:
+            return
+        self.__family(name, help_text, metric_type)
+        for labels, value in samples:
+            self.__lines.append(name + format_labels(labels) + ' ' + format_value(value))
+
+    def counter(self, name, help_text, samples):
+        self.__simple(name, help_text, 'counter', samples)
+
+    def gauge(self, name, help_text, samples):
+        self.__simple(name, help_text, 'gauge', samples)
+
+    def histogram(self, name, help_text, samples):
+        """ Samples hold Histogram.as_dict() values - cumulative buckets keyed by upper bound. """
+        if not samples:
+            return
+        self.__family(name, help_text, 'histogram')
+        for labels, data in samples:
+            count = 0
+            for bound, count in sorted(((float(bound), count) for bound, count in data['buckets'].items())):
+                bucket_labels = dict(labels)
+                bucket_labels['le'] = format_value(bound)
+                self.__lines.append(name + '_bucket' + format_labels(bucket_labels) + ' ' + str(count))
+            # count of the infinite bucket - consistent with buckets even when snapshot raced with a writer
+            self.__lines.append(name + '_sum' + format_labels(labels) + ' ' + format_value(data['sum']))
+            self.__lines.append(name + '_count' + format_labels(labels) + ' ' + str(count))
+
+    def text(self):
+        return '\n'.join(self.__lines) + '\n'
@@ -0,0 +1,67 @@
+import bisect
+
+# upper bounds in seconds - from fast local calls up to slow backend round trips
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Fixed bucket histogram with constant memory. Counts are kept per bucket (not cumulative),
+    values above the last bound fall into the overflow bucket. Not thread safe - guard with a lock when shared.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.buckets != self.buckets:
+            raise ValueError('histograms with different buckets cannot be merged')
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        """ Upper bound of the bucket holding given fraction of observations (max for the overflow bucket). """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def cumulative(self):
+        """ List of (upper bound, count of observations <= bound) pairs, last bound is infinity. """
+        result = []
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            result.append((bound, seen))
+        return result
+
+    def as_dict(self):
+        data = dict()
+        data['count'] = self.count
+        data['sum'] = self.sum
+        data['mean'] = self.sum / self.count if self.count else None
+        data['max'] = self.max
+        data['p50'] = self.percentile(0.5)
+        data['p95'] = self.percentile(0.95)
+        data['p99'] = self.percentile(0.99)
+        data['buckets'] = {str(bound): count for bound, count in self.cumulative()}
+        return data
@@ -0,0 +1,119 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+
+# vehicle first seen - capture time of the first frame with its plate
+STAGE_CAPTURED = 'captured'
+# capture time of the frame which completed the track
+STAGE_OBSERVED = 'observed'
+# detection handed over by the detector loop
+STAGE_EMITTED = 'emitted'
+# detection received by the web app
+STAGE_RECEIVED = 'received'
+# detection grouped with recent detections of the lane
+STAGE_DEDUPLICATED = 'deduplicated'
+# gate decision known - from permit cache or backend
+STAGE_DECIDED = 'decided'
+# first LED reaction
+STAGE_SIGNALLED = 'signalled'
+
+TOTAL = 'total'
+TRACE_KEY = 'trace'
+DEFAULT_CAPACITY = 2000
+
+
+def start_trace(trace_id, captured, observed=None):
+    """ Trace travelling in detection message - stage timestamps in insertion order (wall clock). """
+    stages = dict()
+    stages[STAGE_CAPTURED] = captured
+    if observed is not None:
+        stages[STAGE_OBSERVED] = observed
+    return {'id': trace_id, 'stages': stages}
+
+
+def mark(trace, stage, timestamp=None):
+    """ Records first occurrence of stage - later marks of the same stage are ignored. Accepts None trace. """
+    if trace is not None:
+        trace['stages'].setdefault(stage, time.time() if timestamp is None else timestamp)
+
+
+def stage_durations(trace):
+    """
+    Returns dict with seconds spent before every stage (since the previous one) and total since capture.
+    Stages from different hosts are only comparable when their clocks are synchronized.
+    """
+    durations = dict()
+    stages = list(trace['stages'].items())
+    for (_, previous), (stage, timestamp) in zip(stages, stages[1:]):
+        durations[stage] = timestamp - previous
+    if len(stages) > 1:
+        durations[TOTAL] = stages[-1][1] - stages[0][1]
+    return durations
+
+
+def percentile(sorted_values, fraction):
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class TraceRecorder:
+    """
+    Ring buffer of the last completed traces - the oldest trace is overwritten when capacity is reached,
+    so memory stays constant. Summaries are computed from the buffer on request.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.__traces = deque(maxlen=capacity)
+        self.__lock = Lock()
+        self.__recorded = 0
+
+    def record(self, device, role, trace, **attributes):
+        entry = dict(attributes)
+        entry['id'] = trace['id']
+        entry['device'] = device
+        entry['role'] = role
+        entry['stages'] = dict(trace['stages'])
+        entry['durations'] = stage_durations(trace)
+        with self.__lock:
+            self.__traces.append(entry)
+            self.__recorded += 1
+
+    def recent(self, device=None, limit=None):
+        """ Newest traces first, optionally of a single device. """
+        with self.__lock:
+            traces = list(self.__traces)
+        traces = [trace for trace in reversed(traces) if device is None or trace['device'] == device]
+        return traces[:limit] if limit is not None else traces
+
+    def summary(self):
+        """ Per device percentiles of every stage duration and of total latency. """
+        with self.__lock:
+            traces = list(self.__traces)
+        samples = dict()  # {device: {stage: [seconds]}}
+        for trace in traces:
+            device_samples = samples.setdefault(trace['device'], dict())
+            for stage, seconds in trace['durations'].items():
+                device_samples.setdefault(stage, []).append(seconds)
+
+        data = dict()
+        for device, stages in samples.items():
+            data[device] = dict()
+            for stage, values in stages.items():
+                ordered = sorted(values)
+                data[device][stage] = {
+                    'count': len(ordered),
+                    'p50': percentile(ordered, 0.50),
+                    'p90': percentile(ordered, 0.90),
+                    'p99': percentile(ordered, 0.99),
+                    'max': ordered[-1],
+                }
+        return data
+
+    def statistics(self):
+        with self.__lock:
+            data = dict()
+            data['buffered'] = len(self.__traces)
+            data['capacity'] = self.__traces.maxlen
+            data['recorded'] = self.__recorded
+            return data
@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+# unit tests load modules of the app package without running app/__init__.py -
+# it creates the flask app, binds the IPC server socket and starts background threads
+APP_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+if 'app' not in sys.modules:
+    package = types.ModuleType('app')
+    package.__path__ = [APP_DIRECTORY]
+    sys.modules['app'] = package
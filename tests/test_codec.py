@@ -0,0 +1,101 @@
+from collections import namedtuple
+
+import pytest
+
+from detector.ConfigRequests import ConfigurationRequest, StateChangeRequest
+from detector.DetectorStates import DetectorState
+from ipc_communication.Codec import JSON_CODEC, BINARY_CODEC, MESSAGE_DETECTION, HEADER
+
+Point = namedtuple('Point', 'x, y')
+
+DETECTION = {
+    'candidates': [['KR12345', 91.123456789], ['KR1234S', 80.5]],
+    'coordinates': [{'x': 10, 'y': 20}, {'x': 110, 'y': 20}, {'x': 110, 'y': 50}, {'x': 10, 'y': 50}],
+    'observations': 3,
+    'detector': 'cam1',
+    'detector_role': 'ENTRY',
+    'timestamp': 1700000000.123456,
+    'trace': {'id': 'ab12-7', 'stages': [['captured', 1700000000.0]]},
+}
+
+
+def json_round_trip(message):
+    return JSON_CODEC.loads(JSON_CODEC.dumps(message))
+
+
+def binary_round_trip(message):
+    return BINARY_CODEC.loads(BINARY_CODEC.dumps(message))
+
+
+def variant(**changes):
+    message = dict(DETECTION)
+    message.update(changes)
+    return {key: value for key, value in message.items() if value is not Ellipsis}
+
+
+@pytest.mark.parametrize('message', [
+    DETECTION,
+    variant(coordinates=None),
+    variant(coordinates=Ellipsis, observations=Ellipsis, timestamp=Ellipsis, detector_role=Ellipsis),
+    variant(detector_role=None, timestamp=0.0, observations=0),
+    variant(timestamp=1700000000, observations=70000),
+    variant(candidates=[]),
+    variant(candidates=[('KR12345', 90)]),
+    variant(coordinates=[{'x': 1.5, 'y': 2}]),
+])
+def test_detection_decodes_as_json_does(message):
+    assert binary_round_trip(message) == json_round_trip(message)
+
+
+def test_detection_uses_fixed_layout():
+    data = BINARY_CODEC.dumps(DETECTION)
+    assert HEADER.unpack_from(data, 0)[1] == MESSAGE_DETECTION
+    assert len(data) < len(JSON_CODEC.dumps(DETECTION))
+
+
+def test_confidence_keeps_full_precision():
+    confidence = binary_round_trip(DETECTION)['candidates'][0][1]
+    assert confidence == DETECTION['candidates'][0][1]
+
+
+@pytest.mark.parametrize('message', [
+    {'type': 'metrics', 'counters': {'frames': 10}, 'values': [1, 2.5, None, True, 'text', 2 ** 40, -2 ** 70]},
+    ['list', {'nested': ('tuple', 1)}],
+    {1: 'int', 2.5: 'float', True: 'bool', None: 'none'},
+    {'point': Point(1, 2)},
+    'text',
+    None,
+])
+def test_generic_message_decodes_as_json_does(message):
+    assert binary_round_trip(message) == json_round_trip(message)
+
+
+def test_registered_control_messages_round_trip():
+    request = ConfigurationRequest(video_source='rtsp://camera', save_images=True, detection_region={'roi': None})
+    decoded = binary_round_trip(request)
+    assert isinstance(decoded, ConfigurationRequest)
+    assert decoded.device_specific_config == request.device_specific_config
+
+    decoded = binary_round_trip(StateChangeRequest(DetectorState.OFF))
+    assert decoded.target_state() == DetectorState.OFF
+
+
+def test_registered_message_nested_in_other_value_is_sent_as_fields():
+    message = {'message_id': 7, 'commands': [StateChangeRequest(DetectorState.OFF)]}
+    assert binary_round_trip(message) == json_round_trip(message) == \
+        {'message_id': 7, 'commands': [{'target_state': 'OFF'}]}
+
+
+def test_both_codecs_reject_the_same_values():
+    for codec in (JSON_CODEC, BINARY_CODEC):
+        with pytest.raises(TypeError):
+            codec.dumps({'value': object()})
+        with pytest.raises(TypeError):
+            codec.dumps({(1, 2): 'tuple key'})
+
+
+def test_unsupported_version_is_rejected():
+    data = bytearray(BINARY_CODEC.dumps(DETECTION))
+    data[0] = 1
+    with pytest.raises(ValueError):
+        BINARY_CODEC.loads(bytes(data))
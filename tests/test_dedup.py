@@ -0,0 +1,75 @@
+import time
+from threading import Thread
+
+from app.dedup import DetectionDeduplicator
+
+
+def test_repeated_detection_of_lane_is_duplicate():
+    deduplicator = DetectionDeduplicator(window=10.0)
+    first, duplicate = deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')
+    assert not duplicate
+
+    group, duplicate = deduplicator.register('ENTRY', [['KR12345', 85.0], ['KR1234S', 95.0]], 'cam2')
+    assert duplicate and group is first
+    assert group.merged_candidates() == [['KR1234S', 95.0], ['KR12345', 90.0]]
+    assert group.detectors == {'cam1', 'cam2'}
+
+
+def test_confusable_spelling_joins_the_same_group():
+    deduplicator = DetectionDeduplicator(window=10.0)
+    deduplicator.register('ENTRY', [['KRO81', 90.0]], 'cam1')
+    assert deduplicator.register('ENTRY', [['KR0B1', 90.0]], 'cam2')[1]
+
+
+def test_other_role_is_not_duplicate():
+    deduplicator = DetectionDeduplicator(window=10.0)
+    deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')
+    assert not deduplicator.register('EXIT', [['KR12345', 90.0]], 'cam2')[1]
+
+
+def test_group_expires_after_window():
+    deduplicator = DetectionDeduplicator(window=0.05)
+    deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')
+    time.sleep(0.1)
+    assert not deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')[1]
+
+
+def test_oldest_group_is_evicted_above_max_entries():
+    deduplicator = DetectionDeduplicator(window=10.0, max_entries=2)
+    for plate in ('AAA', 'BBB', 'CCC'):
+        deduplicator.register('ENTRY', [[plate, 90.0]], 'cam1')
+
+    assert deduplicator.statistics()['evicted'] == 1
+    assert not deduplicator.register('ENTRY', [['AAA', 90.0]], 'cam1')[1]
+    assert deduplicator.register('ENTRY', [['CCC', 90.0]], 'cam1')[1]
+
+
+def test_duplicate_waits_for_decision_of_first_detection():
+    deduplicator = DetectionDeduplicator(window=10.0)
+    first, _ = deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')
+    group, _ = deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam2')
+    results = []
+    waiter = Thread(target=lambda: results.append(deduplicator.wait(group)))
+    waiter.start()
+    time.sleep(0.05)
+    assert not results
+
+    deduplicator.complete(first, True)
+    waiter.join(1.0)
+    assert results == [True]
+
+
+def test_group_without_decision_is_forgotten():
+    deduplicator = DetectionDeduplicator(window=10.0)
+    group, _ = deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')
+    deduplicator.complete(group, None)
+
+    assert deduplicator.wait(group) is None
+    # backend was not asked successfully - next detection asks again
+    assert not deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')[1]
+
+
+def test_wait_gives_up_after_timeout():
+    deduplicator = DetectionDeduplicator(window=10.0, wait_timeout=0.05)
+    group, _ = deduplicator.register('ENTRY', [['KR12345', 90.0]], 'cam1')
+    assert deduplicator.wait(group) is None
@@ -0,0 +1,62 @@
+from threading import Thread, Event
+
+from metrics.DetectorMetrics import DetectorMetrics, MetricsCollector, metrics_report
+from metrics.Exposition import PrometheusWriter
+
+WRITES = 20000
+
+
+def test_writes_of_all_threads_are_merged():
+    metrics = DetectorMetrics()
+
+    def write(stage):
+        for _ in range(WRITES):
+            metrics.increment('frames')
+            metrics.record(stage, 0.003)
+            metrics.record('shared', 0.2)
+
+    threads = [Thread(target=write, args=(stage,)) for stage in ('read', 'recognize', 'decision')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = metrics.snapshot(dropped=2)
+    assert snapshot['counters'] == {'frames': 3 * WRITES, 'dropped': 2}
+    assert snapshot['stages']['read']['count'] == WRITES
+    assert snapshot['stages']['shared']['count'] == 3 * WRITES
+    assert snapshot['stages']['shared']['buckets']['0.25'] == 3 * WRITES
+
+
+def test_snapshot_taken_during_writes_is_consistent():
+    metrics = DetectorMetrics()
+    stop = Event()
+
+    def write():
+        while not stop.is_set():
+            metrics.record('recognize', 0.01)
+
+    writer = Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(200):
+            histogram = metrics.snapshot()['stages'].get('recognize')
+            if histogram is not None:
+                assert histogram['count'] == histogram['buckets']['inf']
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_collector_exposes_reports_of_detectors():
+    metrics = DetectorMetrics()
+    metrics.increment('detections', 3)
+    metrics.record('recognize', 0.05)
+    collector = MetricsCollector()
+    collector.update(metrics_report('cam1', 'ENTRY', metrics.snapshot()))
+
+    writer = PrometheusWriter()
+    collector.write(writer)
+    text = writer.text()
+    assert 'alpr_detector_detections_total{detector="cam1",role="ENTRY"} 3' in text
+    assert 'alpr_detector_stage_seconds_count{detector="cam1",role="ENTRY",stage="recognize"} 1' in text
@@ -0,0 +1,53 @@
+import re
+from threading import Thread
+
+from app.event_stream import EventBroadcaster, EVENT_DETECTION
+
+EVENTS_PER_THREAD = 2000
+
+
+def event_ids(frames):
+    return [int(re.match(r'id: (\d+)', frame).group(1)) for frame in frames]
+
+
+def test_concurrently_published_events_reach_client_in_id_order():
+    broadcaster = EventBroadcaster(queue_size=8 * EVENTS_PER_THREAD)
+    subscription = broadcaster.subscribe()
+
+    def publish():
+        for index in range(EVENTS_PER_THREAD):
+            broadcaster.publish(EVENT_DETECTION, {'index': index})
+
+    threads = [Thread(target=publish) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert event_ids(subscription.take(timeout=0)) == list(range(1, 4 * EVENTS_PER_THREAD + 1))
+
+
+def test_reconnecting_client_resumes_after_last_event_id():
+    broadcaster = EventBroadcaster(history=10)
+    for index in range(5):
+        broadcaster.publish(EVENT_DETECTION, {'index': index})
+
+    assert event_ids(broadcaster.subscribe(last_event_id=3).take(timeout=0)) == [4, 5]
+    assert broadcaster.subscribe().take(timeout=0) == []
+
+
+def test_slow_client_loses_oldest_events():
+    broadcaster = EventBroadcaster(queue_size=2)
+    subscription = broadcaster.subscribe()
+    for index in range(5):
+        broadcaster.publish(EVENT_DETECTION, {'index': index})
+
+    assert event_ids(subscription.take(timeout=0)) == [4, 5]
+    assert broadcaster.statistics()['dropped'] == 3
+
+
+def test_clients_above_limit_are_rejected():
+    broadcaster = EventBroadcaster(max_clients=1)
+    assert broadcaster.subscribe() is not None
+    assert broadcaster.subscribe() is None
+    assert broadcaster.statistics()['rejected_clients'] == 1
@@ -0,0 +1,80 @@
+import time
+
+from detector.FrameGrabber import FrameGrabber, CapturedFrame
+from detector.FrameSampler import FrameSampler, SamplingConfiguration
+
+
+def frame(sequence, timestamp=None):
+    return CapturedFrame(sequence, timestamp if timestamp is not None else sequence / 25.0, None, None)
+
+
+def processed(sampler, sequences):
+    return [sequence for sequence in sequences if sampler.should_process(frame(sequence))]
+
+
+def test_every_nth_frame_is_processed():
+    sampler = FrameSampler(3)
+    assert processed(sampler, range(1, 11)) == [1, 4, 7, 10]
+
+
+def test_frames_of_new_stream_are_not_skipped():
+    sampler = FrameSampler(3)
+    assert processed(sampler, range(100, 104)) == [100, 103]
+    # replaced grabber counts frames from the beginning again
+    assert processed(sampler, range(1, 5)) == [1, 4]
+
+
+def test_reset_forgets_position_in_stream():
+    sampler = FrameSampler(5)
+    assert processed(sampler, [1, 2]) == [1]
+    sampler.reset()
+    assert processed(sampler, [3]) == [3]
+
+
+def test_frame_skip_follows_source_fps_and_recognition_latency():
+    sampler = FrameSampler(1, SamplingConfiguration(target_cpu_share=0.5, max_lag=None, max_frame_skip=30))
+    for sequence in range(1, 11):
+        sampler.should_process(frame(sequence))
+    # 25 fps with 0.1 s recognition needs every 5th frame to stay within half of a core
+    sampler.record_recognition(0.1, now=0.0)
+    assert sampler.frame_skip() == 5
+
+
+def test_active_lane_is_sampled_with_min_frame_skip():
+    sampler = FrameSampler(1, SamplingConfiguration(target_cpu_share=0.5, max_lag=None, min_frame_skip=2,
+                                                    active_hold=2.0))
+    for sequence in range(1, 11):
+        sampler.should_process(frame(sequence))
+    sampler.mark_active(now=10.0)
+    sampler.record_recognition(0.1, now=11.0)
+    assert sampler.frame_skip() == 2
+    sampler.record_recognition(0.1, now=13.0)
+    assert sampler.frame_skip() == 5
+
+
+class FakeCapture:
+    def __init__(self, frames):
+        self.__frames = frames
+
+    def read(self, image=None):
+        if self.__frames == 0:
+            return False, None
+        self.__frames -= 1
+        time.sleep(0.001)
+        return True, object()
+
+
+def test_stopped_grabber_is_not_failed():
+    grabber = FrameGrabber(FakeCapture(-1))
+    grabber.start()
+    assert grabber.latest(timeout=1.0) is not None
+    grabber.stop()
+    assert not grabber.is_running()
+    assert not grabber.has_failed()
+
+
+def test_grabber_fails_when_source_cannot_be_read():
+    grabber = FrameGrabber(FakeCapture(0))
+    grabber.start()
+    assert grabber.latest(timeout=1.0) is None
+    assert grabber.has_failed()
@@ -0,0 +1,69 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+from app.gate_client import GateClient
+
+
+@pytest.fixture
+def backend():
+    responses = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            status, body = responses.pop(0) if len(responses) > 1 else responses[0]
+            data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.server_port, responses
+    server.shutdown()
+    server.server_close()
+
+
+def create_client(url):
+    return GateClient(url, 'tests', retries=1, backoff=0.0)
+
+
+@pytest.mark.parametrize('status, body, expected', [
+    (200, {'validation': True}, True),
+    (200, {'validation': False}, False),
+    (200, {'validation': 'yes'}, None),
+    (200, {}, None),
+    (200, 'not json', None),
+    (400, {'validation': False}, None),
+    (404, 'not found', None),
+    (500, {'validation': False}, None),
+])
+def test_only_explicit_decision_is_returned(backend, status, body, expected):
+    url, responses = backend
+    responses.append((status, body))
+    assert create_client(url).validate('ENTRY', '{}') is expected
+
+
+def test_transient_failure_is_retried(backend):
+    url, responses = backend
+    responses.extend([(503, ''), (200, {'validation': True})])
+    client = create_client(url)
+    assert client.validate('EXIT', '{}') is True
+    assert client.statistics()['retried'] == 1
+
+
+def test_response_without_decision_is_counted_as_unexpected(backend):
+    url, responses = backend
+    responses.append((403, 'forbidden'))
+    client = create_client(url)
+    client.validate('ENTRY', '{}')
+    statistics = client.statistics()
+    assert (statistics['unexpected'], statistics['rejected']) == (1, 0)
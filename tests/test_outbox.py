@@ -0,0 +1,165 @@
+import sqlite3
+import time
+from threading import Thread, Event
+
+from app.outbox import Outbox
+
+
+def create_outbox(tmp_path, sender, **kwargs):
+    return Outbox(str(tmp_path / 'outbox.db'), sender=sender, **kwargs)
+
+
+def test_send_delivers_older_entries_of_lane_first(tmp_path):
+    delivered = []
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: delivered.append(payload) or True)
+    outbox.append('cam1/KR12345', 'ENTRY', 'older')
+    entry_id = outbox.append('cam1/KR12345', 'ENTRY', 'live', reserve=True)
+
+    assert outbox.send('cam1/KR12345', entry_id) is True
+    assert delivered == ['older', 'live']
+    assert outbox.statistics()['pending'] == 0
+
+
+def test_send_passes_sender_arguments_to_own_entry_only(tmp_path):
+    calls = []
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: calls.append((payload, kwargs)) or True)
+    outbox.append('lane', 'ENTRY', 'older')
+    entry_id = outbox.append('lane', 'ENTRY', 'live', reserve=True)
+
+    outbox.send('lane', entry_id, trace_id='ab-1')
+    assert calls == [('older', {}), ('live', {'trace_id': 'ab-1'})]
+
+
+def test_concurrent_sends_of_same_lane_wait_for_each_other(tmp_path):
+    def slow_sender(role, payload, **kwargs):
+        time.sleep(0.05)
+        return True
+
+    outbox = create_outbox(tmp_path, slow_sender)
+    entry_ids = [outbox.append('lane', 'ENTRY', str(index), reserve=True) for index in range(4)]
+    results = dict()
+
+    def send(entry_id):
+        results[entry_id] = outbox.send('lane', entry_id, timeout=5.0)
+
+    threads = [Thread(target=send, args=(entry_id,)) for entry_id in entry_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {entry_id: True for entry_id in entry_ids}
+    assert outbox.statistics()['pending'] == 0
+
+
+def test_lanes_do_not_wait_for_each_other(tmp_path):
+    release = Event()
+
+    def sender(role, payload, **kwargs):
+        if 'blocked' == payload:
+            release.wait(5.0)
+        return True
+
+    outbox = create_outbox(tmp_path, sender)
+    blocked_id = outbox.append('cam1/AAA', 'ENTRY', 'blocked', reserve=True)
+    blocked = Thread(target=outbox.send, args=('cam1/AAA', blocked_id))
+    blocked.start()
+    time.sleep(0.05)
+
+    entry_id = outbox.append('cam1/BBB', 'ENTRY', 'other', reserve=True)
+    assert outbox.send('cam1/BBB', entry_id, timeout=0.1) is True
+    release.set()
+    blocked.join()
+
+
+def test_busy_lane_leaves_entry_for_drainer(tmp_path):
+    release = Event()
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: release.wait(5.0))
+    first_id = outbox.append('lane', 'ENTRY', 'first', reserve=True)
+    first = Thread(target=outbox.send, args=('lane', first_id))
+    first.start()
+    time.sleep(0.05)
+
+    second_id = outbox.append('lane', 'ENTRY', 'second', reserve=True)
+    assert outbox.send('lane', second_id, timeout=0.05) is None
+    assert outbox.statistics()['busy_lanes'] == 1
+    release.set()
+    first.join()
+    assert outbox.statistics()['pending'] == 1
+
+
+def test_failed_delivery_returns_none_and_keeps_entry(tmp_path):
+    available = [False]
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: True if available[0] else None)
+    entry_id = outbox.append('lane', 'ENTRY', 'payload', reserve=True)
+
+    assert outbox.send('lane', entry_id) is None
+    assert outbox.statistics()['failed_attempts'] == 1
+
+    available[0] = True
+    assert outbox.drain_once() is True
+    assert outbox.statistics()['pending'] == 0
+
+
+def test_rejection_is_a_delivery(tmp_path):
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: False)
+    entry_id = outbox.append('lane', 'ENTRY', 'payload', reserve=True)
+    assert outbox.send('lane', entry_id) is False
+    assert outbox.statistics()['delivered'] == 1
+
+
+def test_result_of_entry_delivered_by_drainer_is_kept_for_sender(tmp_path):
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: 'payload' == payload)
+    entry_id = outbox.append('lane', 'ENTRY', 'payload', reserve=True)
+
+    outbox.drain_once()
+    assert outbox.send('lane', entry_id) is True
+
+
+def test_sender_receives_role_of_entry(tmp_path):
+    roles = []
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: roles.append(role) or True)
+    outbox.append_many([('cam1/AAA', 'ENTRY', 'a'), ('cam2/AAA', 'EXIT', 'b')])
+    outbox.drain_once()
+    assert sorted(roles) == ['ENTRY', 'EXIT']
+
+
+def test_oldest_entries_dropped_above_max_rows(tmp_path):
+    outbox = create_outbox(tmp_path, lambda role, payload, **kwargs: True, max_rows=3)
+    for index in range(5):
+        outbox.append('lane', 'ENTRY', str(index))
+    statistics = outbox.statistics()
+    assert statistics['pending'] == 3
+    assert statistics['dropped'] == 2
+
+
+def test_outbox_of_first_schema_is_migrated(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, lane TEXT NOT NULL, created REAL NOT NULL,
+                             attempts INTEGER NOT NULL DEFAULT 0, payload TEXT NOT NULL);
+        INSERT INTO outbox (lane, created, payload) VALUES ('EXIT', 0, 'old');
+    ''')
+    connection.close()
+
+    roles = []
+    outbox = Outbox(path, sender=lambda role, payload, **kwargs: roles.append(role) or True)
+    assert outbox.drain_once() is True
+    assert roles == ['EXIT']
+
+
+def test_pending_count_follows_rows_when_delivered_entry_was_dropped(tmp_path):
+    outbox = None
+
+    def sender(role, payload, **kwargs):
+        if 'first' == payload:
+            # outbox over its limit drops the entry being delivered
+            outbox.append('other', 'ENTRY', 'second')
+        return True
+
+    outbox = create_outbox(tmp_path, sender, max_rows=1)
+    entry_id = outbox.append('lane', 'ENTRY', 'first', reserve=True)
+    assert outbox.send('lane', entry_id) is True
+    assert outbox.statistics()['pending'] == 1
+    assert outbox.drain_once() is True
+    assert outbox.statistics()['pending'] == 0
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from app.permit_cache import PermitCache, MODE_TRUST
+from app.plate_index import PlateIndex, canonical, bounded_distance
+
+
+def test_exact_plate_is_decided_from_cache():
+    cache = PermitCache()
+    cache.store('ENTRY', 'KR12345', True)
+    cache.store('ENTRY', 'KR99999', False)
+
+    assert cache.lookup('ENTRY', ['KR12345']) is True
+    assert cache.lookup('ENTRY', ['KR99999', 'KR12345']) is True
+    assert cache.lookup('ENTRY', ['KR99999']) is False
+    assert cache.lookup('EXIT', ['KR12345']) is None
+
+
+def test_near_match_is_never_decided_from_cache():
+    cache = PermitCache(mode=MODE_TRUST, fuzzy_distance=1)
+    cache.store('ENTRY', 'KR12345', True)
+
+    # one edit and confusable characters away from the permitted plate
+    assert cache.lookup('ENTRY', ['KR12346']) is None
+    assert cache.lookup('ENTRY', ['KRI2345']) is None
+    assert cache.statistics()['misses'] == 2
+
+
+def test_near_match_is_resolved_to_permitted_spelling():
+    cache = PermitCache(fuzzy_distance=1)
+    cache.store('ENTRY', 'KR12345', True)
+
+    match = cache.resolve('ENTRY', [['KRI2345', 90.0], ['KR1Z345', 80.0]])
+    assert match.plate == 'KR12345'
+    assert match.candidate == 'KRI2345'
+    assert cache.resolve('ENTRY', [['WA00000', 90.0]]) is None
+    assert cache.statistics()['fuzzy_hits'] == 1
+
+
+def test_denied_plates_are_not_resolved():
+    cache = PermitCache(fuzzy_distance=1)
+    cache.store('ENTRY', 'KR12345', False)
+    assert cache.resolve('ENTRY', [['KR12345', 90.0]]) is None
+
+
+def test_entries_expire_after_ttl():
+    cache = PermitCache(ttl=0.05, fuzzy_distance=0)
+    cache.store('ENTRY', 'KR12345', True)
+    assert cache.lookup('ENTRY', ['KR12345']) is True
+    time.sleep(0.1)
+    assert cache.lookup('ENTRY', ['KR12345']) is None
+    assert cache.resolve('ENTRY', [['KR12345', 90.0]]) is None
+    assert cache.statistics()['expired'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PermitCache(max_entries=2)
+    cache.store('ENTRY', 'A', True)
+    cache.store('ENTRY', 'B', True)
+    cache.lookup('ENTRY', ['A'])
+    cache.store('ENTRY', 'C', True)
+
+    assert cache.lookup('ENTRY', ['B']) is None
+    assert cache.lookup('ENTRY', ['A']) is True
+    assert cache.statistics()['evicted'] == 1
+
+
+def test_confirm_counts_disagreements():
+    cache = PermitCache()
+    cache.confirm('ENTRY', 'KR12345', True, False)
+    cache.confirm('ENTRY', 'KR12345', None, None)
+    assert cache.lookup('ENTRY', ['KR12345']) is False
+    assert cache.statistics()['disagreements'] == 1
+
+
+def test_apply_changes_removes_entries_without_decision():
+    cache = PermitCache()
+    cache.store('ENTRY', 'KR12345', True)
+    assert cache.apply_changes([{'role': 'ENTRY', 'plate': 'KR12345', 'permitted': None},
+                                {'role': 'EXIT', 'plate': 'KR12345', 'permitted': 1}]) == 2
+    assert cache.lookup('ENTRY', ['KR12345']) is None
+    assert cache.lookup('EXIT', ['KR12345']) is True
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        PermitCache(mode='unknown')
+
+
+def test_canonical_form_merges_confusable_characters():
+    assert canonical('kr 0B-1') == canonical('KRO81')
+
+
+@pytest.mark.parametrize('first, second, distance', [
+    ('KR12345', 'KR12345', 0),
+    ('KR12345', 'KR12346', 1),
+    ('KR12345', 'KR21345', 1),
+    ('KR12345', 'KR1234', 1),
+    ('KR12345', 'WA99999', 3),
+])
+def test_bounded_distance(first, second, distance):
+    assert bounded_distance(first, second, 2) == min(distance, 3)
+
+
+def test_index_prefers_closest_plate_and_forgets_removed_ones():
+    index = PlateIndex(max_distance=1)
+    index.add('KR12345')
+    index.add('KR12346')
+    assert index.match([['KR12346', 90.0]]).distance == 0
+    index.remove('KR12346')
+    match = index.match([['KR12346', 90.0]])
+    assert (match.plate, match.distance) == ('KR12345', 1)
+    assert 'KR12346' not in index
@@ -0,0 +1,73 @@
+import asyncio
+import socket
+
+import zmq
+import zmq.asyncio
+
+from ipc_communication.AioServer import AioServer
+from ipc_communication.Codec import JSON_CODEC
+from ipc_communication.Server import AsyncServer
+
+ADDRESS = 'tcp://127.0.0.1'
+TIMEOUT_MS = 2000
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def request(context, port, *frames):
+    client = context.socket(zmq.REQ)
+    client.setsockopt(zmq.LINGER, 0)
+    client.setsockopt(zmq.RCVTIMEO, TIMEOUT_MS)
+    client.connect(ADDRESS + ':' + str(port))
+    try:
+        replies = []
+        for frame in frames:
+            client.send(frame)
+            replies.append(JSON_CODEC.loads(client.recv()))
+        return replies
+    finally:
+        client.close()
+
+
+def test_server_answers_malformed_message_and_keeps_serving():
+    for workers in (None, 2):
+        port = free_port()
+        server = AsyncServer(lambda message: message['value'] * 2, ADDRESS, port, workers=workers)
+        server.run()
+        context = zmq.Context()
+        try:
+            replies = request(context, port, b'{not json', JSON_CODEC.dumps({'value': 21}))
+            assert replies == [None, 42]
+            assert server.statistics()['malformed'] == 1
+        finally:
+            server.stop()
+            context.term()
+
+
+def test_aio_server_answers_malformed_message_and_serves_sockets_bound_later():
+    first_port, second_port = free_port(), free_port()
+
+    async def scenario():
+        context = zmq.asyncio.Context()
+        server = AioServer(lambda message: message['value'] * 2, ADDRESS, first_port, context=context)
+        server.run()
+        await asyncio.sleep(0.05)
+        server.bind(ADDRESS, second_port)
+        loop = asyncio.get_running_loop()
+        client_context = zmq.Context()
+        try:
+            first = await loop.run_in_executor(None, request, client_context, first_port, b'\xff',
+                                               JSON_CODEC.dumps({'value': 1}))
+            second = await loop.run_in_executor(None, request, client_context, second_port,
+                                                JSON_CODEC.dumps({'value': 2}))
+            return first, second, server.statistics()['malformed']
+        finally:
+            await server.stop()
+            client_context.term()
+            context.term()
+
+    assert asyncio.run(scenario()) == ([None, 2], [4], 1)